@@ -1,16 +1,104 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.utils import timezone
 
+from . import search
 from .models import (
-    Author, Blog,
+    Author, Blog, Task,
 )
+from .pagination import WindowedPaginator
+from .signals import changed_in_bulk
+
+# Rows written per UPDATE by the bulk actions
+BULK_BATCH_SIZE = 500
 
 
 # Register your models here.
 
+def batches(queryset, fields):
+    """Yield lists of at most BULK_BATCH_SIZE rows of queryset, by primary key"""
+    last_pk = None
+    queryset = queryset.order_by('pk').only('pk', *fields)
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch[:BULK_BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+class BlogChangeList(ChangeList):
+    """Load only the columns the changelist shows
+
+    The change and delete views need whole rows, so the columns are trimmed
+    here rather than in BlogAdmin.get_queryset.
+    """
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).only('slug', *self.model_admin.list_display)
+
+
 class BlogAdmin(admin.ModelAdmin):
+    """Changelist for large tables
+
+    Rows load without their text, the count of a filtered list is not
+    followed by a second COUNT(*) of the whole table, and the count of the
+    whole table comes from the PostgreSQL statistics past
+    BLOGS_ESTIMATED_COUNT_THRESHOLD posts. Searches go through the search
+    index, and the actions write with batched UPDATEs instead of saving
+    each post.
+    """
     list_display = ('id', 'title', 'created_datetime', 'updated_datetime')
     list_display_links = ('id', 'title')
+    # Range filters on the indexed created_datetime
+    date_hierarchy = 'created_datetime'
+    search_fields = ('title', 'text')
+    show_full_result_count = False
+    paginator = WindowedPaginator
+    actions = ['touch', 'refresh_text_fields']
+
+    def get_changelist(self, request, **kwargs):
+        return BlogChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        keyword = search.normalize_keyword(search_term)
+        if not keyword:
+            return queryset, False
+        return search.filter_blogs(queryset, keyword), False
+
+    def touch(self, request, queryset):
+        """Set updated_datetime to now, which refreshes caches, feeds and ETags"""
+        now = timezone.now()
+        slugs = []
+        for batch in batches(queryset, ['slug']):
+            Blog.objects.filter(pk__in=[blog.pk for blog in batch]).update(updated_datetime=now)
+            slugs.extend(blog.slug for blog in batch)
+        changed_in_bulk(slugs)
+        self.message_user(request, '%d posts marked as updated.' % len(slugs), messages.SUCCESS)
+    touch.short_description = 'Mark the selected posts as updated'
+
+    def refresh_text_fields(self, request, queryset):
+        """Recompute the excerpt and counts shown on list pages"""
+        now = timezone.now()
+        slugs = []
+        for batch in batches(queryset, ['slug', 'text']):
+            for blog in batch:
+                blog.update_text_fields()
+                blog.updated_datetime = now
+            Blog.objects.bulk_update(batch, ['excerpt', 'char_count', 'word_count', 'updated_datetime'])
+            slugs.extend(blog.slug for blog in batch)
+        changed_in_bulk(slugs)
+        self.message_user(request, 'Refreshed %d posts.' % len(slugs), messages.SUCCESS)
+    refresh_text_fields.short_description = 'Refresh the excerpts and counts of the selected posts'
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'key', 'status', 'attempts', 'run_at')
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
 
 
 admin.site.register(Author)
-admin.site.register(Blog, BlogAdmin)
\ No newline at end of file
+admin.site.register(Blog, BlogAdmin)
+admin.site.register(Task, TaskAdmin)
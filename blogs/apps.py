@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BlogsConfig(AppConfig):
     name = 'blogs'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
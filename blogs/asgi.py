@@ -0,0 +1,166 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class ASGIHandler:
+    """ASGI application serving Django from a bounded thread pool
+
+    Django 2.2 has no ASGI support and its views, ORM and templates are
+    synchronous, so each request runs through the regular WSGI handler in one
+    of BLOGS_ASGI_THREADS threads. The event loop reads request bodies and
+    writes responses: a slow client holds a coroutine, not a thread or a
+    database connection. The pool size also caps the database connections
+    opened by one worker process.
+
+    Streaming responses are produced in their thread (querysets may not move
+    between threads) and handed to the loop through a queue of
+    BLOGS_ASGI_BUFFER chunks, which blocks the thread when the client falls
+    behind.
+    """
+
+    def __init__(self, wsgi_application=None, executor=None):
+        self.wsgi_application = wsgi_application or WSGIHandler()
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=settings.BLOGS_ASGI_THREADS, thread_name_prefix='blogs-asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type %r' % scope['type'])
+        try:
+            body = await self.read_body(receive)
+        except ClientDisconnected:
+            return
+        try:
+            await self.respond(self.get_environ(scope, body), receive, send)
+        finally:
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                raise ClientDisconnected
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def get_environ(self, scope, body):
+        path = scope['path']
+        script_name = scope.get('root_path', '')
+        if script_name and path.startswith(script_name):
+            path = path[len(script_name):]
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            # WSGI carries the raw bytes of the path decoded as latin-1.
+            'SCRIPT_NAME': script_name.encode().decode('latin-1'),
+            'PATH_INFO': path.encode().decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+            'REMOTE_ADDR': client[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            key = name if name in ('CONTENT_LENGTH', 'CONTENT_TYPE') else 'HTTP_' + name
+            if key in environ:
+                # Repeated headers are one comma-separated list, except cookies.
+                value = '%s%s%s' % (environ[key], '; ' if key == 'HTTP_COOKIE' else ',', value)
+            environ[key] = value
+        return environ
+
+    async def watch_disconnect(self, receive, disconnected):
+        """Set disconnected when the client goes away mid-response"""
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    async def respond(self, environ, receive, send):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(settings.BLOGS_ASGI_BUFFER)
+        disconnected = threading.Event()
+        watcher = asyncio.ensure_future(self.watch_disconnect(receive, disconnected))
+        worker = loop.run_in_executor(self.executor, self.run_application, environ, loop, queue, disconnected)
+        message = await queue.get()
+        try:
+            while message is not None:
+                # Drain what the thread queued before it saw the disconnect.
+                if not disconnected.is_set():
+                    await send(message)
+                message = await queue.get()
+        except BaseException:
+            disconnected.set()
+            # Let the thread finish and close the response.
+            while message is not None:
+                message = await queue.get()
+            raise
+        finally:
+            watcher.cancel()
+            await worker
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b''})
+
+    def run_application(self, environ, loop, queue, disconnected):
+        """Run in a pool thread: call Django and queue the ASGI messages"""
+        def put(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            put({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            })
+
+        try:
+            response = self.wsgi_application(environ, start_response)
+            try:
+                for chunk in response:
+                    if disconnected.is_set():
+                        break
+                    if chunk:
+                        put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                # Sends request_finished, which closes this thread's connections.
+                response.close()
+        finally:
+            put(None)
@@ -0,0 +1,232 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from wsgiref.util import setup_testing_defaults
+
+import factory
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, transaction
+from django.test import Client
+from django.utils.http import urlencode
+
+from .cache import invalidate_lists, search_cache
+from .factories import BlogFactory
+from .instrumentation import RequestMetrics
+from .middleware import invalidate_pages
+from .models import Blog
+
+HIRAGANA = 'あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん'
+KATAKANA = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲン'
+LATIN_WORDS = (
+    'django', 'python', 'blog', 'search', 'index', 'cache', 'query', 'server',
+    'nginx', 'docker', 'postgres', 'template', 'view', 'model', 'form', 'api',
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rollback():
+    """Run a block in a transaction that is always rolled back
+
+    Benchmarks seed thousands of posts; this keeps them out of the database.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+@contextmanager
+def throwaway_database():
+    """Point the default connection at a new test database, dropped afterwards
+
+    Pages and search results cached from it are dropped too, so that they
+    are never served from the real database.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        invalidate_pages()
+        invalidate_lists()
+        search_cache.invalidate()
+
+
+def generate_text(rng, length):
+    """Return Japanese-looking text of about length characters"""
+    words = []
+    size = 0
+    while size < length:
+        kind = rng.random()
+        if kind < 0.45:
+            word = ''.join(rng.choice(HIRAGANA) for _ in range(rng.randint(1, 4)))
+        elif kind < 0.8:
+            word = ''.join(rng.choice(KATAKANA) for _ in range(rng.randint(2, 6)))
+        else:
+            word = rng.choice(LATIN_WORDS) + ' '
+        words.append(word)
+        size += len(word)
+        if rng.random() < 0.05:
+            words.append('。\n')
+    return ''.join(words)[:length]
+
+
+def seed_blogs(count, text_length=800, batch_size=1000, seed=0):
+    """Bulk insert count posts; save() and signals do not run for bulk_create"""
+    rng = random.Random(seed)
+    offset = Blog.objects.count()
+    for start in range(0, count, batch_size):
+        blogs = [
+            Blog(
+                title=generate_text(rng, rng.randint(10, 40)),
+                slug='benchmark-%d' % (offset + i),
+                text=generate_text(rng, text_length),
+            )
+            for i in range(start, min(start + batch_size, count))
+        ]
+        for blog in blogs:
+            blog.update_text_fields()
+        Blog.objects.bulk_create(blogs)
+    return Blog.objects.order_by('-pk')[:count]
+
+
+def measure(func, repeat=5):
+    """Call func repeat times and return the timings in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+    }
+
+
+def text_length(rng):
+    """Draw a post length in characters; most posts run 1,000 to 4,000"""
+    return int(min(max(rng.lognormvariate(7.6, 0.6), 200), 20000))
+
+
+def seed_with_factory(count, seed=0):
+    """Create count posts one by one, running save() and the Blog signals"""
+    rng = random.Random(seed)
+    return BlogFactory.create_batch(
+        count,
+        title=factory.LazyFunction(lambda: generate_text(rng, rng.randint(10, 40))),
+        slug=factory.Sequence(lambda n: 'benchmark-%d' % n),
+        text=factory.LazyFunction(lambda: generate_text(rng, text_length(rng))),
+    )
+
+
+def percentiles(timings):
+    """Return p50/p95/p99 of timings (milliseconds)"""
+    if len(timings) < 2:
+        value = timings[0] if timings else 0.0
+        return {'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+class ClientHarness:
+    """Send requests through django.test.Client"""
+    name = 'client'
+
+    def __init__(self):
+        self.client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+    def get(self, path, params, headers):
+        response = self.client.get(path, params, **headers)
+        b''.join(response)
+        return response.status_code
+
+
+class WSGIHarness:
+    """Call the WSGI application the way gunicorn does, middleware included"""
+    name = 'wsgi'
+
+    def __init__(self):
+        self.application = get_wsgi_application()
+
+    def get(self, path, params, headers):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(params),
+            'HTTP_HOST': settings.ALLOWED_HOSTS[0],
+            **headers,
+        }
+        setup_testing_defaults(environ)
+        status = []
+        body = self.application(environ, lambda code, headers, exc_info=None: status.append(code))
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return int(status[0].split()[0])
+
+
+HARNESSES = {harness.name: harness for harness in (ClientHarness, WSGIHarness)}
+
+
+def run_scenario(harness, requests, count):
+    """Send count requests cycling through requests (path, params, headers)
+
+    Queries are counted on a separate first request so that counting them
+    does not slow down the timed ones. The request_started signal empties
+    connection.queries, hence an execute wrapper.
+    """
+    path, params, headers = requests[0]
+    queries = RequestMetrics()
+    with connection.execute_wrapper(queries):
+        status = harness.get(path, params, headers)
+    if status != 200:
+        raise RuntimeError('GET %s returned %d' % (path, status))
+
+    timings = []
+    start = time.perf_counter()
+    for index in range(count):
+        path, params, headers = requests[index % len(requests)]
+        request_start = time.perf_counter()
+        harness.get(path, params, headers)
+        timings.append((time.perf_counter() - request_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    result = {'%s_ms' % name: value for name, value in percentiles(timings).items()}
+    result['throughput_rps'] = count / elapsed
+    result['queries'] = queries.queries
+    return result
+
+
+def compare(results, baseline, threshold):
+    """List the scenarios slower or running more queries than the baseline"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if result[metric] > expected[metric] * (1 + threshold):
+                regressions.append('%s: %s %.2f > %.2f (+%d%%)' % (
+                    name, metric, result[metric], expected[metric],
+                    (result[metric] / expected[metric] - 1) * 100,
+                ))
+        if result['queries'] > expected['queries']:
+            regressions.append('%s: %d queries > %d' % (name, result['queries'], expected['queries']))
+    return regressions
@@ -0,0 +1,136 @@
+import hashlib
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class RenderCache:
+    """Rendered fragments of a post, stored in the 'blogs' cache
+
+    Each entry records the updated_datetime of the post it was rendered from
+    and is only served while that still matches, so a stale entry is never
+    returned even if an invalidation was missed.
+    """
+    parts = ('text', 'page', 'api')
+
+    def __init__(self, alias='blogs'):
+        self.alias = alias
+        self.stats = Counter()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, slug, part):
+        return 'render:%s:%s' % (slug, part)
+
+    def version(self, blog):
+        return blog.updated_datetime.isoformat()
+
+    def get(self, blog, part):
+        entry = self.cache.get(self.make_key(blog.slug, part))
+        if entry is not None and entry[0] == self.version(blog):
+            self.stats['hits'] += 1
+            return entry[1]
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, blog, part, value):
+        self.cache.set(self.make_key(blog.slug, part), (self.version(blog), value))
+
+    def get_many(self, blogs, part):
+        """Map the slug of each blog to its current cached value, if any"""
+        keys = {self.make_key(blog.slug, part): blog for blog in blogs}
+        found = {}
+        for key, entry in self.cache.get_many(list(keys)).items():
+            blog = keys[key]
+            if entry[0] == self.version(blog):
+                found[blog.slug] = entry[1]
+        self.stats['hits'] += len(found)
+        self.stats['misses'] += len(keys) - len(found)
+        return found
+
+    def set_many(self, values, part):
+        """Store (blog, value) pairs with one cache round trip"""
+        self.cache.set_many({
+            self.make_key(blog.slug, part): (self.version(blog), value) for blog, value in values
+        })
+
+    def get_or_set(self, blog, part, render):
+        value = self.get(blog, part)
+        if value is None:
+            value = render()
+            self.set(blog, part, value)
+        return value
+
+    def invalidate(self, slug):
+        self.cache.delete_many([self.make_key(slug, part) for part in self.parts])
+
+
+render_cache = RenderCache()
+
+
+class SearchResultCache:
+    """Ordered IDs of the posts matching each keyword, in the 'blogs' cache
+
+    Entries live for BLOGS_SEARCH_CACHE_TIMEOUT seconds; the least recently
+    used go first when the cache is full (locmem culls in LRU order, Redis
+    with maxmemory-policy allkeys-lru). Any post write changes the
+    generation stored next to them, which discards every entry at once.
+    """
+    generation_key = 'search:generation'
+
+    def __init__(self, alias='blogs'):
+        self.alias = alias
+        self.stats = Counter()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, keyword, ranked):
+        digest = hashlib.md5(keyword.encode()).hexdigest()
+        return 'search:%s:%s' % ('ranked' if ranked else 'date', digest)
+
+    def get_or_set(self, keyword, ranked, search):
+        key = self.make_key(keyword, ranked)
+        values = self.cache.get_many([key, self.generation_key])
+        generation = values.get(self.generation_key)
+        entry = values.get(key)
+        if entry is not None and entry[0] == generation:
+            self.stats['hits'] += 1
+            return entry[1]
+        self.stats['misses'] += 1
+        ids = search()
+        self.cache.set(key, (generation, ids), settings.BLOGS_SEARCH_CACHE_TIMEOUT)
+        return ids
+
+    def invalidate(self):
+        self.cache.set(self.generation_key, uuid.uuid4().hex, None)
+
+
+search_cache = SearchResultCache()
+
+LIST_GENERATION_KEY = 'lists:generation'
+
+
+def list_generation():
+    """Token that invalidate_lists() changes, hashed into the ETags of lists
+
+    A missing token is replaced by a new one, so that no ETag handed out
+    before it was lost matches again. Without a working cache every request
+    gets a new token, and lists are never answered with 304.
+    """
+    cache = caches['blogs']
+    generation = cache.get(LIST_GENERATION_KEY)
+    if generation is None:
+        cache.add(LIST_GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(LIST_GENERATION_KEY)
+    return generation or uuid.uuid4().hex
+
+
+def invalidate_lists():
+    """Change the ETag of every list, which deletes alone would not"""
+    caches['blogs'].set(LIST_GENERATION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,158 @@
+import pickle
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of redis.Redis used by RedisCache
+
+    Clients created from the same URL share their data, like connections to
+    one Redis database would.
+    """
+    _databases = {}
+    _lock = threading.Lock()
+
+    def __init__(self, url='redis://local/0'):
+        with self._lock:
+            self._data = self._databases.setdefault(url, {})
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(url)
+
+    def _alive(self, name):
+        # Callers hold _lock: expiring a key races a concurrent set() of it.
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(name, None)
+            return None
+        return entry
+
+    def get(self, name):
+        with self._lock:
+            entry = self._alive(name)
+            return None if entry is None else entry[0]
+
+    def mget(self, keys):
+        return [self.get(name) for name in keys]
+
+    def set(self, name, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._alive(name) is not None:
+                return None
+            expires = None if ex is None else time.monotonic() + ex
+            self._data[name] = (bytes(value), expires)
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def exists(self, *names):
+        with self._lock:
+            return sum(self._alive(name) is not None for name in names)
+
+    def expire(self, name, time_):
+        with self._lock:
+            entry = self._alive(name)
+            if entry is None:
+                return False
+            self._data[name] = (entry[0], time.monotonic() + time_)
+            return True
+
+    def persist(self, name):
+        with self._lock:
+            entry = self._alive(name)
+            if entry is None:
+                return False
+            self._data[name] = (entry[0], None)
+            return True
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            return True
+
+
+class RedisCache(BaseCache):
+    """Cache backend for any client exposing the redis-py API
+
+    OPTIONS['CLIENT_CLASS'] is the dotted path of the client and defaults to
+    redis.Redis; blogs.cache_backends.LocalRedis needs no server. clear()
+    flushes the whole Redis database, so give the cache a database of its own.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        client_class = import_string(options.get('CLIENT_CLASS', 'redis.Redis'))
+        self._client = client_class.from_url(server)
+
+    def _expiry(self, timeout):
+        """Return the relative timeout in seconds Redis expects"""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(int(timeout), 0)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            return False
+        return bool(self._client.set(
+            self._key(key, version), pickle.dumps(value), ex=expiry, nx=True,
+        ))
+
+    def get(self, key, default=None, version=None):
+        value = self._client.get(self._key(key, version))
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._client.mget([self._key(key, version) for key in keys])
+        return {
+            key: pickle.loads(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            self.delete(key, version=version)
+            return
+        self._client.set(self._key(key, version), pickle.dumps(value), ex=expiry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        key = self._key(key, version)
+        if expiry is None:
+            return bool(self._client.persist(key)) or bool(self._client.exists(key))
+        return bool(self._client.expire(key, expiry))
+
+    def delete(self, key, version=None):
+        return bool(self._client.delete(self._key(key, version)))
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def has_key(self, key, version=None):
+        return bool(self._client.exists(self._key(key, version)))
+
+    def clear(self):
+        self._client.flushdb()
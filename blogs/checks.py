@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_search_ranking(app_configs, **kwargs):
+    if settings.BLOGS_SEARCH_RANKED and settings.BLOGS_PAGINATION == 'cursor':
+        return [Warning(
+            'BLOGS_SEARCH_RANKED has no effect with BLOGS_PAGINATION = cursor.',
+            hint='Cursor pages are ordered by (created_datetime, id); use page numbers to rank searches.',
+            id='blogs.W001',
+        )]
+    return []
@@ -0,0 +1,62 @@
+import gzip
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+# Quality 5 compresses about as fast as gzip -6 and smaller.
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES_RE = re.compile(r'^(text/|application/(json|x-ndjson|javascript|xml))')
+
+
+def compress_gzip(content):
+    return gzip.compress(content, GZIP_LEVEL, mtime=0)
+
+
+def compress_brotli(content):
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+# In order of preference when the client accepts several equally.
+ENCODINGS = {'br': compress_brotli, 'gzip': compress_gzip}
+
+
+def available_encodings():
+    return [name for name in ENCODINGS if name != 'br' or brotli is not None]
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def negotiate(request, encodings=None):
+    """Return the best of encodings the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    best = None
+    for name in encodings or available_encodings():
+        q = accepted.get(name, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[0]):
+            best = (q, name)
+    return best[1] if best else None
+
+
+def compress(encoding, content):
+    return ENCODINGS[encoding](content)
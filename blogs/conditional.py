@@ -0,0 +1,134 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .cache import list_generation
+from .models import Blog
+from .sitemaps import sitemaps
+
+
+def make_etag(request, *parts, vary_accept=False):
+    """Hash the page address and the data it was built from into an ETag"""
+    parts = [settings.BLOGS_ETAG_SALT, request.get_full_path(), *parts]
+    if vary_accept:
+        parts.append(request.META.get('HTTP_ACCEPT', ''))
+    return hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def list_validators(request, vary_accept=False, **kwargs):
+    """ETag of any list of posts, from one indexed MAX and the list generation
+
+    The newest updated_datetime moves on every insert or edit, and deletes
+    change the generation kept in the 'blogs' cache, so together they change
+    whenever a list can. That cache must be shared by every process serving
+    or deleting posts (see BLOGS_CACHE_URL). There is no Last-Modified:
+    deletes do not move it, and a client sending only If-Modified-Since
+    would keep showing a deleted post.
+    """
+    last_modified = Blog.objects.aggregate(last_modified=Max('updated_datetime'))['last_modified']
+    return make_etag(request, last_modified, list_generation(), vary_accept=vary_accept), None
+
+
+def detail_validators(request, slug, vary_accept=False, **kwargs):
+    rows = Blog.objects.filter(slug=slug).order_by().values_list(
+        'updated_datetime', flat=True
+    )[:1]
+    if not rows:
+        # Let the view answer 404.
+        return None, None
+    last_modified = rows[0]
+    return make_etag(request, last_modified, vary_accept=vary_accept), last_modified
+
+
+def sitemap_index_validators(request, vary_accept=False, **kwargs):
+    """The index only lists the sitemap files, whose number follows the highest key"""
+    num_pages = [site().paginator.num_pages for site in sitemaps.values()]
+    return make_etag(request, *num_pages, vary_accept=vary_accept), None
+
+
+def sitemap_validators(request, section, vary_accept=False, **kwargs):
+    """ETag of one sitemap file, from its range of keys only
+
+    No Last-Modified, as for lists of posts: deletes do not move it.
+    """
+    try:
+        paginator = sitemaps[section]().paginator
+        number = int(request.GET.get('p', 1))
+    except (KeyError, ValueError):
+        # Let the view answer 404.
+        return None, None
+    state = paginator.object_list.filter(pk__range=paginator.key_range(number)).aggregate(
+        last_modified=Max('updated_datetime'), count=Count('pk'),
+    )
+    return make_etag(request, state['last_modified'], state['count'], vary_accept=vary_accept), None
+
+
+def conditional_view(validators, vary_accept=False):
+    """Answer conditional GETs with 304 before the view renders anything
+
+    validators(request, **kwargs) returns (etag, last_modified) and runs once
+    per request. Responses, 304s included, get a public Cache-Control so
+    nginx and browsers may keep them for BLOGS_CACHE_MAX_AGE seconds. When
+    last_modified is None, a Last-Modified set by the view itself (feeds and
+    sitemaps do) is dropped, so clients revalidate with the ETag.
+    """
+    def decorator(view):
+        def get_validators(request, *args, **kwargs):
+            if not hasattr(request, '_blogs_validators'):
+                request._blogs_validators = validators(
+                    request, vary_accept=vary_accept, **kwargs
+                )
+            return request._blogs_validators
+
+        conditional = condition(
+            etag_func=lambda request, *args, **kwargs: get_validators(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: get_validators(request, *args, **kwargs)[1],
+        )(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if getattr(request, '_blogs_validators', (None, None))[1] is None:
+                del response['Last-Modified']
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                patch_cache_control(response, public=True, max_age=settings.BLOGS_CACHE_MAX_AGE)
+                if vary_accept:
+                    patch_vary_headers(response, ['Accept'])
+            return response
+        return wrapped
+    return decorator
+
+
+def cached_content(view):
+    """Keep the 200 responses of view in the 'blogs' cache, per ETag
+
+    Goes inside conditional_view, whose validators make the ETag: an entry
+    is only served while the data it was rendered from is unchanged, so it
+    needs no invalidation and changed data re-renders only its own pages.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        etag = request._blogs_validators[0]
+        if request.method != 'GET' or etag is None:
+            return view(request, *args, **kwargs)
+        cache = caches['blogs']
+        key = 'content:%s' % hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        entry = cache.get(key)
+        if entry is not None and entry[0] == etag:
+            response = HttpResponse(entry[1])
+            for name, value in entry[2]:
+                response[name] = value
+            return response
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (etag, response.content, list(response.items())))
+        return response
+    return wrapped
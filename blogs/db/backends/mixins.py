@@ -0,0 +1,61 @@
+from django.db.backends.base.base import NO_DB_ALIAS
+
+from ..pool import get_pool, pool_key
+
+
+class PooledDatabaseWrapperMixin:
+    """Borrow connections from a per-process pool instead of opening them
+
+    Closing the connection, which Django does at the end of every request
+    when CONN_MAX_AGE is 0, hands it back to the pool. The pool is set up by
+    the POOL dictionary of the database settings, see blogs.db.pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_key = pool_key(self.alias, self.settings_dict)
+        self.connection_pool = None
+
+    @property
+    def pool(self):
+        """The pool of the configured database, None for any other
+
+        create_test_db() and throwaway databases repoint the wrapper, and
+        PostgreSQL's nodb connection targets the 'postgres' database: they
+        connect directly, so that no pooled connection reaches the wrong
+        database or stays open on one about to be dropped.
+        """
+        if self.alias == NO_DB_ALIAS or pool_key(self.alias, self.settings_dict) != self.pool_key:
+            return None
+        return get_pool(self.pool_key, self.settings_dict.get('POOL') or {})
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        # Closing returns the connection to the pool it came from.
+        self.connection_pool = self.pool
+        if self.connection_pool is None:
+            return connect(conn_params)
+        return self.connection_pool.acquire(lambda: connect(conn_params), self.is_connection_usable)
+
+    def is_connection_usable(self, connection):
+        try:
+            connection.cursor().execute('SELECT 1')
+        except self.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.connection_pool is None:
+            return super()._close()
+        if self.in_atomic_block:
+            # Django keeps using this connection until the block exits.
+            self.connection_pool.discard(self.connection)
+            return
+        try:
+            self.connection.rollback()
+        except self.Database.Error:
+            self.connection_pool.discard(self.connection)
+        else:
+            self.connection_pool.release(self.connection)
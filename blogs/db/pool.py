@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import Counter, deque
+
+from django.db.utils import OperationalError
+
+DEFAULTS = {
+    'MAX_SIZE': 10,
+    # Seconds an unused connection is kept open
+    'IDLE_TIMEOUT': 300,
+    # Seconds a thread waits for a connection when all are in use
+    'TIMEOUT': 10,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Database connections shared by the threads of one worker process
+
+    Connections are handed out most recently used first, so that the
+    surplus stays unused and is closed after IDLE_TIMEOUT seconds. A reused
+    connection must pass check(connection) or it is replaced. When MAX_SIZE
+    connections are in use, acquire() waits up to TIMEOUT seconds for one
+    to come back; stats counts those waits.
+    """
+
+    def __init__(self, max_size, idle_timeout, timeout, clock=time.monotonic):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.clock = clock
+        self.idle = deque()
+        self.size = 0
+        self.waiting = 0
+        self.stats = Counter()
+        self.condition = threading.Condition()
+
+    def acquire(self, connect, check):
+        while True:
+            connection = self.take()
+            if connection is None:
+                return self.create(connect)
+            if check(connection):
+                self.stats['reused'] += 1
+                return connection
+            self.discard(connection)
+
+    def take(self):
+        """Return an idle connection, or None after reserving room for a new one"""
+        with self.condition:
+            self.close_expired()
+            start = None
+            while not self.idle and self.size >= self.max_size:
+                now = self.clock()
+                if start is None:
+                    start = now
+                    self.stats['waits'] += 1
+                remaining = start + self.timeout - now
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout('No database connection available after %ss' % self.timeout)
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            if start is not None:
+                self.stats['wait_seconds'] += self.clock() - start
+            if self.idle:
+                return self.idle.pop()[0]
+            self.size += 1
+            return None
+
+    def create(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        self.stats['created'] += 1
+        return connection
+
+    def release(self, connection):
+        with self.condition:
+            self.idle.append((connection, self.clock()))
+            self.condition.notify()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.stats['closed'] += 1
+            self.condition.notify()
+
+    def close_expired(self, deadline=None):
+        """Close the connections idle since before deadline; call with the lock held"""
+        if deadline is None:
+            deadline = self.clock() - self.idle_timeout
+        while self.idle and self.idle[0][1] <= deadline:
+            connection, _ = self.idle.popleft()
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self.size -= 1
+            self.stats['closed'] += 1
+
+    def close_idle(self):
+        with self.condition:
+            self.close_expired(deadline=float('inf'))
+
+
+def pool_key(alias, settings_dict):
+    """Connections are only shared by wrappers of the same alias and database"""
+    return (alias,) + tuple(settings_dict.get(name) or '' for name in ('NAME', 'HOST', 'PORT', 'USER'))
+
+
+def get_pool(key, options):
+    with _pools_lock:
+        if key not in _pools:
+            options = dict(DEFAULTS, **options)
+            _pools[key] = ConnectionPool(options['MAX_SIZE'], options['IDLE_TIMEOUT'], options['TIMEOUT'])
+        return _pools[key]
+
+
+def render_metrics():
+    """Pool gauges and counters in the Prometheus text format"""
+    metrics = (
+        ('blogs_db_pool_connections', 'gauge', 'Open connections by state'),
+        ('blogs_db_pool_waiting', 'gauge', 'Threads waiting for a connection'),
+        ('blogs_db_pool_waits_total', 'counter', 'Times a thread had to wait for a connection'),
+        ('blogs_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection'),
+        ('blogs_db_pool_timeouts_total', 'counter', 'Waits that ended without a connection'),
+        ('blogs_db_pool_created_total', 'counter', 'Connections opened'),
+        ('blogs_db_pool_reused_total', 'counter', 'Connections handed out again'),
+        ('blogs_db_pool_closed_total', 'counter', 'Connections closed, idle or broken'),
+    )
+    with _pools_lock:
+        pools = sorted(_pools.items())
+    lines = []
+    for name, kind, help_text in metrics:
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, kind))
+        for (alias, database, *_), pool in pools:
+            labels = 'alias="%s",database="%s"' % (alias, database)
+            with pool.condition:
+                if name == 'blogs_db_pool_connections':
+                    lines.append('%s{%s,state="idle"} %d' % (name, labels, len(pool.idle)))
+                    lines.append('%s{%s,state="in_use"} %d' % (name, labels, pool.size - len(pool.idle)))
+                elif name == 'blogs_db_pool_waiting':
+                    lines.append('%s{%s} %d' % (name, labels, pool.waiting))
+                else:
+                    key = name[len('blogs_db_pool_'):-len('_total')]
+                    lines.append('%s{%s} %s' % (name, labels, pool.stats[key]))
+    return '\n'.join(lines) + '\n'
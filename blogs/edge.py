@@ -0,0 +1,214 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+
+from .models import Blog
+from .pagination import InvalidCursor, KeysetPaginator
+from .sitemaps import sitemaps
+from .views import BlogList
+
+LIST_KEY = 'list'
+API_KEY = 'api'
+POST_KEY_PREFIX = 'post-'
+# Purges only: the list pages where a post is or was, by its keyset cursor
+POSITION_KEY_PREFIX = 'list-at-'
+
+# Surrogate keys of the responses of each URL name, formatted with its kwargs
+SURROGATE_KEYS = {
+    'blogs:index': [LIST_KEY],
+    'blogs:detail': [POST_KEY_PREFIX + '{slug}'],
+    'blogs:api_index': [LIST_KEY, API_KEY],
+    'blogs:api_detail': [POST_KEY_PREFIX + '{slug}', API_KEY],
+    'blogs:rss_feed': [LIST_KEY],
+    'blogs:atom_feed': [LIST_KEY],
+    'blogs:sitemap_index': [LIST_KEY],
+    'blogs:sitemap': [LIST_KEY],
+}
+
+# The page number parameter of the lists whose numbered pages key_paths()
+# lists. A purge reaches those and the pages without a query string; any
+# other (searches, cursors, ?format=...) only gets the short browser lifetime.
+PAGE_PARAMS = {
+    'blogs:index': 'page',
+    'blogs:api_index': 'page',
+    'blogs:sitemap': 'p',
+}
+
+
+def post_key(slug):
+    return POST_KEY_PREFIX + slug
+
+
+def position_key(blog):
+    """Purge key of the list pages showing blog, valid after its deletion too"""
+    return POSITION_KEY_PREFIX + KeysetPaginator(Blog.objects.all(), 1).encode_cursor(blog, reverse=False)
+
+
+def surrogate_keys(match):
+    """The keys of the responses of a resolved URL, [] if the edge skips it"""
+    return [key.format(**match.kwargs) for key in SURROGATE_KEYS.get(match.view_name, [])]
+
+
+def is_purgeable(request, match):
+    query = request.META.get('QUERY_STRING', '')
+    if not query:
+        return True
+    param = PAGE_PARAMS.get(match.view_name)
+    return param is not None and re.fullmatch(r'%s=[1-9][0-9]*' % param, query) is not None
+
+
+def page_paths(path, pages, param='page'):
+    paths = ['%s?%s=%d' % (path, param, page) for page in sorted(pages)]
+    if 1 in pages:
+        paths.append(path)
+    return paths
+
+
+def list_pages(count, per_page, positions, head):
+    """Numbers of the pages of a list to purge
+
+    The head pages and the last one change with every post added or
+    deleted, as does the one past the end when a deletion shrank the list.
+    A deletion also shifts the pages after the post's own; those are left
+    to expire.
+    """
+    num_pages = Paginator(range(count), per_page).num_pages
+    pages = {position // per_page + 1 for position in positions}
+    if head:
+        pages.update(range(1, min(settings.BLOGS_EDGE_PURGE_PAGES, num_pages) + 1))
+        pages.update((num_pages, num_pages + 1))
+    return pages
+
+
+def key_paths(keys):
+    """The paths of the pages tagged with any of keys, for URL based purges
+
+    LIST_KEY reaches the first BLOGS_EDGE_PURGE_PAGES pages and the end of
+    each list, and position keys the pages of their posts; API_KEY, purged
+    by hand after a serializer change, reaches every page of the API.
+    """
+    paths = set()
+    keys = set(keys)
+    keyset = KeysetPaginator(Blog.objects.all(), 1)
+    cursors = []
+    for key in keys:
+        if key.startswith(POST_KEY_PREFIX):
+            slug = key[len(POST_KEY_PREFIX):]
+            paths.update((reverse('blogs:detail', args=[slug]), reverse('blogs:api_detail', args=[slug])))
+        elif key.startswith(POSITION_KEY_PREFIX):
+            try:
+                cursors.append(keyset.decode_cursor(key[len(POSITION_KEY_PREFIX):])[0])
+            except InvalidCursor:
+                continue
+    if not (keys & {LIST_KEY, API_KEY} or cursors):
+        return paths
+
+    count = Blog.objects.count()
+    # The posts before each one in the lists, found on the ordering's index
+    positions = [Blog.objects.filter(keyset.position_filter(values, reverse=True)).count() for values in cursors]
+    if API_KEY in keys:
+        num_pages = Paginator(range(count), api_settings.PAGE_SIZE).num_pages
+        api_pages = range(1, num_pages + 2)
+    else:
+        api_pages = list_pages(count, api_settings.PAGE_SIZE, positions, LIST_KEY in keys)
+    paths.update(page_paths(reverse('blogs:api_index'), api_pages))
+    paths.update(page_paths(reverse('blogs:index'), list_pages(
+        count, BlogList.paginate_by, positions, LIST_KEY in keys,
+    )))
+    for section, sitemap in sitemaps.items():
+        paginator = sitemap().paginator
+        # Sitemap pages hold fixed ranges of primary keys: nothing shifts.
+        pages = {(pk - 1) // paginator.per_page + 1 for created_datetime, pk in cursors}
+        if LIST_KEY in keys:
+            pages.update((paginator.num_pages, paginator.num_pages + 1))
+        paths.update(page_paths(reverse('blogs:sitemap', args=[section]), pages, param='p'))
+    if LIST_KEY in keys:
+        paths.update((reverse('blogs:rss_feed'), reverse('blogs:atom_feed'), reverse('blogs:sitemap_index')))
+    if API_KEY in keys:
+        slugs = Blog.objects.values_list('slug', flat=True).iterator()
+        paths.update(reverse('blogs:api_detail', args=[slug]) for slug in slugs)
+    return paths
+
+
+class Purger:
+    """Invalidates the edge's copies of the responses tagged with keys"""
+
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class LocalPurger(Purger):
+    """In-process stand-in recording the keys and paths it was asked to purge
+
+    All instances share the record, like the edge they stand for.
+    """
+    purged_keys = []
+    purged_paths = set()
+
+    def purge(self, keys):
+        self.purged_keys.extend(keys)
+        self.purged_paths.update(key_paths(keys))
+
+    @classmethod
+    def reset(cls):
+        del cls.purged_keys[:]
+        cls.purged_paths.clear()
+
+
+class NginxCachePurger(Purger):
+    """Delete the files nginx's proxy_cache keeps for the pages of keys
+
+    Open source nginx has no purge API, but its cache is files named after
+    the md5 of proxy_cache_key: Django shares BLOGS_EDGE_CACHE_DIR with it
+    and removes the files of every variant of every page. nginx takes a
+    missing file for a miss. FORMATS and ENCODINGS mirror the $blogs_format
+    and $blogs_encoding maps of nginx/nginx.conf.
+    """
+    FORMATS = ('html', 'json', 'ndjson')
+    ENCODINGS = ('identity', 'gzip', 'br')
+
+    def __init__(self, cache_dir=None, origins=None, levels=None):
+        self.cache_dir = cache_dir or settings.BLOGS_EDGE_CACHE_DIR
+        self.origins = origins or settings.BLOGS_EDGE_ORIGINS
+        self.levels = [int(level) for level in (levels or settings.BLOGS_EDGE_CACHE_LEVELS).split(':')]
+
+    def cache_keys(self, path):
+        for origin in self.origins:
+            for file_format in self.FORMATS:
+                for encoding in self.ENCODINGS:
+                    # proxy_cache_key "$scheme://$host$request_uri|$blogs_format|$blogs_encoding"
+                    yield '%s%s|%s|%s' % (origin, path, file_format, encoding)
+
+    def cache_file(self, cache_key):
+        """Where nginx stores cache_key, e.g. levels 1:2 give c/29/...029c"""
+        name = hashlib.md5(cache_key.encode()).hexdigest()
+        directories = []
+        end = len(name)
+        for level in self.levels:
+            directories.append(name[end - level:end])
+            end -= level
+        return os.path.join(self.cache_dir, *directories, name)
+
+    def purge(self, keys):
+        removed = 0
+        for path in key_paths(keys):
+            for cache_key in self.cache_keys(path):
+                try:
+                    os.remove(self.cache_file(cache_key))
+                except FileNotFoundError:
+                    continue
+                removed += 1
+        return removed
+
+
+def get_purger():
+    """The BLOGS_EDGE_PURGER instance, None when edge caching is off"""
+    if not settings.BLOGS_EDGE_PURGER:
+        return None
+    return import_string(settings.BLOGS_EDGE_PURGER)()
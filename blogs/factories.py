@@ -0,0 +1,16 @@
+import factory
+from django.utils import timezone
+
+from .models import Blog
+
+
+class BlogFactory(factory.django.DjangoModelFactory):
+    """Create data for the Blog model used for tests"""
+    title = 'Example blog'
+    slug = 'example-blog'
+    text = 'This is an example blog.'
+    created_datetime = timezone.now()
+    updated_datetime = timezone.now()
+
+    class Meta:
+        model = Blog
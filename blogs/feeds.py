@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import Blog
+
+
+class LatestBlogsFeed(Feed):
+    """RSS feed of the newest posts, from their excerpts"""
+    title = 'ブログ'
+    description = '新着記事'
+    link = reverse_lazy('blogs:index')
+
+    def items(self):
+        return Blog.objects.only(
+            'title', 'slug', 'excerpt', 'created_datetime', 'updated_datetime',
+        )[:settings.BLOGS_FEED_SIZE]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.excerpt
+
+    def item_link(self, item):
+        return reverse('blogs:detail', args=[item.slug])
+
+    def item_pubdate(self, item):
+        return item.created_datetime
+
+    def item_updateddate(self, item):
+        return item.updated_datetime
+
+
+class LatestBlogsAtomFeed(LatestBlogsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestBlogsFeed.description
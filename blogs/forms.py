@@ -1,7 +1,6 @@
 from django import forms
-from django.db.models import Q
 
-from .models import Blog
+from . import search
 
 
 class BlogSearchForm(forms.Form):
@@ -14,12 +13,15 @@ class BlogSearchForm(forms.Form):
         required=False,
     )
 
-    def filter_blogs(self, blogs):
+    def clean_keyword(self):
+        return search.normalize_keyword(self.cleaned_data['keyword'])
+
+    def filter_blogs(self, blogs, ranked=False, cached=False):
         if self.is_valid():
             keyword = self.cleaned_data.get('keyword')
+            if keyword and cached:
+                return search.cached_results(blogs, keyword, ranked=ranked)
             if keyword:
-                blogs = blogs.filter(
-                    Q(title__icontains=keyword) | Q(text__icontains=keyword)
-                )
+                blogs = search.filter_blogs(blogs, keyword, ranked=ranked)
 
-        return blogs
\ No newline at end of file
+        return blogs
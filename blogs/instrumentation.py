@@ -0,0 +1,136 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Histograms exported by the metrics endpoint: name, help, buckets
+METRICS = {
+    'total': ('blogs_request_duration_seconds', 'Time spent handling the request', SECONDS_BUCKETS),
+    'db': ('blogs_db_duration_seconds', 'Time spent executing SQL', SECONDS_BUCKETS),
+    'render': ('blogs_render_duration_seconds', 'Time spent rendering the template response', SECONDS_BUCKETS),
+    'serialize': ('blogs_serializer_duration_seconds', 'Time spent in API serializers', SECONDS_BUCKETS),
+    'compress': ('blogs_compress_duration_seconds', 'Time spent compressing the response', SECONDS_BUCKETS),
+    'queries': ('blogs_db_queries', 'SQL queries executed per request', QUERY_BUCKETS),
+}
+
+_current = contextvars.ContextVar('blogs_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters of the request being handled, collected by the middleware"""
+
+    def __init__(self):
+        self.queries = 0
+        self.timings = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their duration"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.timings['db'] += time.perf_counter() - start
+
+    def server_timing(self):
+        """Format the timings for the Server-Timing header, in milliseconds"""
+        entries = []
+        for name, seconds in self.timings.items():
+            entry = '%s;dur=%.1f' % (name, seconds * 1000)
+            if name == 'db':
+                entry += ';desc="%d queries"' % self.queries
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request, if any"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - start
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms per URL name, kept in the memory of each worker process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(dict)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def observe(self, url_name, metrics, total):
+        values = dict(metrics.timings, total=total, queries=metrics.queries)
+        with self.lock:
+            histograms = self.histograms[url_name]
+            for key, value in values.items():
+                if key not in METRICS:
+                    continue
+                if key not in histograms:
+                    histograms[key] = Histogram(METRICS[key][2])
+                histograms[key].observe(value)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for key, (name, help_text, buckets) in METRICS.items():
+                lines.append('# HELP %s %s' % (name, help_text))
+                lines.append('# TYPE %s histogram' % name)
+                for url_name, histograms in sorted(self.histograms.items()):
+                    histogram = histograms.get(key)
+                    if histogram is None:
+                        continue
+                    label = 'url_name="%s"' % url_name
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append('%s_bucket{%s,le="%s"} %d' % (name, label, bound, cumulative))
+                    lines.append('%s_sum{%s} %s' % (name, label, histogram.sum))
+                    lines.append('%s_count{%s} %d' % (name, label, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,77 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from blogs.benchmarks import HARNESSES, compare, run_scenario, seed_with_factory, throwaway_database
+
+JSON = {'HTTP_ACCEPT': 'application/json'}
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, throughput and queries of the blog pages and API on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500, help='Number of posts seeded')
+        parser.add_argument('--requests', type=int, default=200, help='Requests sent per scenario')
+        parser.add_argument(
+            '--harness', choices=sorted(HARNESSES), nargs='+', default=sorted(HARNESSES),
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', metavar='PATH', help='Fail if the results regress from this JSON file')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed latency increase over the baseline (0.2 = 20%%)',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        # Seeding writes thousands of rows: keep them out of the real database.
+        with throwaway_database():
+            start = time.perf_counter()
+            blogs = seed_with_factory(options['posts'], seed=options['seed'])
+            self.stdout.write('Seeded %d posts in %.2fs' % (len(blogs), time.perf_counter() - start))
+            results = self.run(options, self.get_scenarios(blogs))
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Regressions from %s:\n  %s' % (options['baseline'], '\n  '.join(regressions)))
+            self.stdout.write(self.style.SUCCESS('No regression from %s' % options['baseline']))
+
+    def get_scenarios(self, blogs):
+        """Return {name: [(path, params, headers), ...]}, cycled through by run_scenario"""
+        details = [reverse('blogs:detail', args=[blog.slug]) for blog in blogs[:50]]
+        api_details = [reverse('blogs:api_detail', args=[blog.slug]) for blog in blogs[:50]]
+        keywords = [blog.title[:2] for blog in blogs[:10]]
+        return {
+            'index': [(reverse('blogs:index'), {}, {})],
+            'index_keyword': [(reverse('blogs:index'), {'keyword': keyword}, {}) for keyword in keywords],
+            'detail': [(path, {}, {}) for path in details],
+            'api_index': [(reverse('blogs:api_index'), {}, JSON)],
+            'api_detail': [(path, {}, JSON) for path in api_details],
+        }
+
+    def run(self, options, scenarios):
+        results = {}
+        self.stdout.write('%-22s %9s %9s %9s %10s %8s' % ('scenario', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries'))
+        for harness_name in options['harness']:
+            harness = HARNESSES[harness_name]()
+            for scenario, requests in scenarios.items():
+                name = '%s:%s' % (harness_name, scenario)
+                result = results[name] = run_scenario(harness, requests, options['requests'])
+                self.stdout.write('%-22s %9.2f %9.2f %9.2f %10.0f %8d' % (
+                    name, result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                    result['throughput_rps'], result['queries'],
+                ))
+        return results
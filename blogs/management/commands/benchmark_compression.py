@@ -0,0 +1,72 @@
+import copy
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from blogs import compression
+from blogs.benchmarks import measure, seed_with_factory, summarize, throwaway_database
+
+LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        ('blogs.template_loaders.MinifyingLoader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]),
+]
+
+
+def templates_setting(minify):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    if minify:
+        templates[0]['APP_DIRS'] = False
+        templates[0]['OPTIONS']['loaders'] = LOADERS
+    else:
+        templates[0]['APP_DIRS'] = True
+        templates[0]['OPTIONS'].pop('loaders', None)
+    return templates
+
+
+class Command(BaseCommand):
+    help = 'Measure the bytes saved and the CPU spent by template minification and compression'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100, help='Number of posts seeded')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        encodings = compression.available_encodings()
+        if 'br' not in encodings:
+            self.stderr.write('brotli is not installed: measuring gzip only')
+        with throwaway_database(), override_settings(BLOGS_COMPRESS=False, BLOGS_PAGE_CACHE_TIMEOUT=0):
+            blogs = seed_with_factory(options['posts'])
+            pages = {
+                'index': (reverse('blogs:index'), 'text/html'),
+                'detail': (reverse('blogs:detail', args=[blogs[0].slug]), 'text/html'),
+                'api_index': (reverse('blogs:api_index'), 'application/json'),
+                'api_detail': (reverse('blogs:api_detail', args=[blogs[0].slug]), 'application/json'),
+            }
+            self.stdout.write('%-11s %8s %14s' % ('page', 'bytes', 'minified') + ''.join(
+                ' %14s %9s' % (encoding, 'ms') for encoding in encodings
+            ))
+            for name, (path, accept) in pages.items():
+                raw, minified = (self.render(path, accept, minify) for minify in (False, True))
+                line = '%-11s %8d %8d %4.0f%%' % (name, len(raw), len(minified), self.saving(raw, minified))
+                for encoding in encodings:
+                    compressed = compression.compress(encoding, minified)
+                    timings = measure(lambda: compression.compress(encoding, minified), options['repeat'])
+                    line += ' %8d %4.0f%% %9.3f' % (
+                        len(compressed), self.saving(raw, compressed), summarize(timings)['median'],
+                    )
+                self.stdout.write(line)
+
+    def render(self, path, accept, minify):
+        with override_settings(TEMPLATES=templates_setting(minify)):
+            response = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0]).get(path, HTTP_ACCEPT=accept)
+        return response.content
+
+    def saving(self, before, after):
+        return (1 - len(after) / len(before)) * 100 if before else 0
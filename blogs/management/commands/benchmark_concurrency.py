@@ -0,0 +1,84 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from blogs.asgi import ASGIHandler
+from blogs.benchmarks import WSGIHarness, percentiles, seed_with_factory, throwaway_database
+
+
+class Command(BaseCommand):
+    help = 'Compare sync (WSGI) and ASGI serving of the blog pages under many slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200, help='Number of posts seeded')
+        parser.add_argument('--clients', type=int, default=100, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=3, help='Requests sent by each client')
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Sync workers, and threads of the ASGI handler',
+        )
+        parser.add_argument(
+            '--delay', type=float, default=0.1,
+            help='Seconds each client takes to read a response',
+        )
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            blogs = seed_with_factory(options['posts'])
+            paths = [reverse('blogs:index')] + [reverse('blogs:detail', args=[blog.slug]) for blog in blogs[:20]]
+            self.stdout.write('%-6s %9s %9s %9s %10s' % ('mode', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'))
+            for mode in ('sync', 'asgi'):
+                with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                    client = getattr(self, '%s_client' % mode)(executor, options['delay'])
+                    elapsed, timings = asyncio.run(self.run(client, paths, options))
+                cuts = percentiles(timings)
+                self.stdout.write('%-6s %9.1f %9.1f %9.1f %10.0f' % (
+                    mode, cuts['p50'], cuts['p95'], cuts['p99'], len(timings) / elapsed,
+                ))
+
+    async def run(self, client, paths, options):
+        timings = []
+
+        async def session(number):
+            for index in range(options['requests']):
+                start = time.perf_counter()
+                await client(paths[(number + index) % len(paths)])
+                timings.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session(number) for number in range(options['clients'])))
+        return time.perf_counter() - start, timings
+
+    def sync_client(self, executor, delay):
+        """A sync worker is busy until the slow client has read the response"""
+        harness = WSGIHarness()
+
+        def serve(path):
+            harness.get(path, {}, {})
+            time.sleep(delay)
+
+        async def client(path):
+            await asyncio.get_running_loop().run_in_executor(executor, serve, path)
+        return client
+
+    def asgi_client(self, executor, delay):
+        """The event loop waits for the slow client; the thread is already free"""
+        handler = ASGIHandler(executor=executor)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                await asyncio.sleep(delay)
+
+        async def client(path):
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+                'headers': [(b'host', b'localhost')],
+            }
+            await handler(scope, receive, send)
+        return client
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from blogs.benchmarks import measure, summarize
+
+POOLED_ENGINES = {
+    'postgresql': 'blogs.db.backends.postgresql',
+    'sqlite': 'blogs.db.backends.sqlite3',
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request cost of opening, keeping and pooling database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        default = connections[DEFAULT_DB_ALIAS]
+        settings_dict = dict(default.settings_dict, TEST={})
+        modes = {
+            'new connection': dict(settings_dict, CONN_MAX_AGE=0),
+            'persistent': dict(settings_dict, CONN_MAX_AGE=None),
+            'pooled': dict(settings_dict, CONN_MAX_AGE=0, ENGINE=POOLED_ENGINES[default.vendor]),
+        }
+        self.stdout.write('%-15s %9s %9s %9s' % ('mode', 'min ms', 'median', 'max ms'))
+        for mode, mode_settings in modes.items():
+            alias = 'benchmark_%s' % mode.replace(' ', '_')
+            connections.databases[alias] = mode_settings
+            connection = connections[alias]
+
+            def request():
+                # What the handler does around every request, health checks included
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                request_finished.send(sender=self.__class__)
+
+            try:
+                request()
+                timings = summarize(measure(request, options['requests']))
+            finally:
+                connection.close()
+                if mode == 'pooled':
+                    connection.pool.close_idle()
+                del connections[alias]
+                del connections.databases[alias]
+            self.stdout.write('%-15s %9.3f %9.3f %9.3f' % (mode, timings['min'], timings['median'], timings['max']))
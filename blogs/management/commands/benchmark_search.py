@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blogs import search
+from blogs.benchmarks import measure, rollback, seed_blogs, summarize
+from blogs.models import Blog
+
+
+class Command(BaseCommand):
+    help = 'Compare keyword search latency of the icontains scan and the index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, nargs='+', default=[10000, 100000],
+            help='Archive sizes to measure',
+        )
+        parser.add_argument(
+            '--keywords', nargs='+', default=['django', 'ブログ', 'キャッシュ', 'search index'],
+        )
+        parser.add_argument('--text-length', type=int, default=800)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for count in options['posts']:
+            with rollback():
+                blogs = list(seed_blogs(count, text_length=options['text_length']))
+                for start in range(0, len(blogs), 500):
+                    search.index_blogs(blogs[start:start + 500])
+                self.stdout.write('%d posts' % count)
+                for keyword in options['keywords']:
+                    self.report(keyword, options['repeat'])
+
+    def report(self, keyword, repeat):
+        def scan():
+            list(Blog.objects.filter(
+                Q(title__icontains=keyword) | Q(text__icontains=keyword)
+            )[:10])
+
+        def indexed():
+            list(search.filter_blogs(Blog.objects.all(), keyword)[:10])
+
+        baseline = summarize(measure(scan, repeat))
+        current = summarize(measure(indexed, repeat))
+        self.stdout.write(
+            '  %-14s icontains %8.2fms  index %8.2fms  (median, x%.1f)' % (
+                keyword, baseline['median'], current['median'],
+                baseline['median'] / max(current['median'], 0.001),
+            )
+        )
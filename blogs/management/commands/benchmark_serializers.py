@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from blogs.benchmarks import measure, rollback, seed_blogs, summarize
+from blogs.models import Blog
+from blogs.serializers import (
+    BlogListSerializer, BlogRetrieveSerializer,
+    FastBlogListSerializer, FastBlogRetrieveSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the ModelSerializers and their fast .values() path'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--objects', type=int, nargs='+', default=[1000, 10000],
+            help='Number of posts serialized per run',
+        )
+        parser.add_argument('--text-length', type=int, default=800)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        pairs = [
+            ('list', BlogListSerializer, FastBlogListSerializer),
+            ('retrieve', BlogRetrieveSerializer, FastBlogRetrieveSerializer),
+        ]
+        renderer = JSONRenderer()
+        for count in options['objects']:
+            with rollback():
+                seed_blogs(count, text_length=options['text_length'])
+                self.stdout.write('%d posts' % count)
+                for name, model_serializer, fast_serializer in pairs:
+                    def slow():
+                        return renderer.render(
+                            model_serializer(Blog.objects.all(), many=True).data
+                        )
+
+                    def fast():
+                        rows = Blog.objects.values(*fast_serializer.get_field_names())
+                        return renderer.render(fast_serializer(rows, many=True).data)
+
+                    if slow() != fast():
+                        self.stderr.write('  %s: outputs differ' % name)
+                    before = summarize(measure(slow, options['repeat']))['median']
+                    after = summarize(measure(fast, options['repeat']))['median']
+                    self.stdout.write(
+                        '  %-9s ModelSerializer %10.0f rows/s  fast %10.0f rows/s  (x%.1f)' % (
+                            name, count / before * 1000, count / after * 1000, before / after,
+                        )
+                    )
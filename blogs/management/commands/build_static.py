@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from rest_framework.settings import api_settings
+
+from blogs.models import Blog
+from blogs.views import BlogList
+
+MANIFEST = 'manifest.json'
+FORMATS = {'html': 'text/html', 'json': 'application/json'}
+
+
+def init_worker():
+    # Forked workers inherit the loaded apps; spawned ones start from scratch.
+    if not apps.ready:
+        django.setup()
+
+
+def render_pages(root, pages, base_url, compress):
+    """Render (path, page, format) entries into files under root"""
+    url = urlsplit(base_url)
+    client = Client(HTTP_HOST=url.netloc)
+    for path, page, file_format in pages:
+        response = client.get(
+            path, {'page': page} if page else {},
+            secure=url.scheme == 'https', HTTP_ACCEPT=FORMATS[file_format],
+        )
+        if response.status_code != 200:
+            raise CommandError('GET %s returned %d' % (path, response.status_code))
+        write_file(os.path.join(root, page_file(path, page, file_format)), response.content, compress)
+    return len(pages)
+
+
+def page_file(path, page, file_format):
+    """Where nginx looks for a page, see nginx/nginx.conf"""
+    if page:
+        path += 'page/%d/' % page
+    return '%sindex.%s' % (path.lstrip('/'), file_format)
+
+
+def write_file(filename, content, compress):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    replace(filename, content)
+    if compress:
+        replace(filename + '.gz', gzip.compress(content, 9, mtime=0))
+    elif os.path.exists(filename + '.gz'):
+        os.remove(filename + '.gz')
+
+
+def remove_file(root, name):
+    """Delete a page and its .gz, then the directories it leaves empty"""
+    filename = os.path.join(root, name)
+    for path in (filename, filename + '.gz'):
+        if os.path.exists(path):
+            os.remove(path)
+    directory = os.path.dirname(filename)
+    while directory != os.path.normpath(root) and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+
+def discard_pages(root, slugs):
+    """Delete the built pages of slugs and the list pages, which now show stale data
+
+    nginx passes their requests on to Django until the next build, which
+    renders them again: the manifest still records the old versions.
+    """
+    if not os.path.isdir(root):
+        return
+    for slug in slugs:
+        remove_file(root, page_file(reverse('blogs:detail', args=[slug]), None, 'html'))
+        remove_file(root, page_file(reverse('blogs:api_detail', args=[slug]), None, 'json'))
+    for path in (reverse('blogs:index'), reverse('blogs:api_index')):
+        directory = os.path.join(root, path.lstrip('/'), 'page')
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.isdigit():
+                    shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def replace(filename, content):
+    """Write next to the target and rename, so nginx never reads a partial file"""
+    temporary = '%s.%d.tmp' % (filename, os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(content)
+    os.replace(temporary, filename)
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the blog pages and API snapshots into a directory served by nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default=settings.BLOGS_STATIC_BUILD_ROOT)
+        parser.add_argument(
+            '--base-url', default='http://%s' % settings.ALLOWED_HOSTS[0],
+            help='Scheme and host of the site, used in the absolute links of the API',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Rendering processes; 0 renders in this process',
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Render everything, e.g. after a template change, instead of changed posts only',
+        )
+        parser.add_argument('--no-gzip', dest='compress', action='store_false', help='Skip the .gz siblings')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        root = options['output']
+        manifest = self.read_manifest(root)
+        versions = {
+            slug: updated_datetime.isoformat()
+            for slug, updated_datetime in Blog.objects.order_by().values_list('slug', 'updated_datetime')
+        }
+        built = manifest.get('posts', {})
+        removed = [slug for slug in built if slug not in versions]
+        if options['full']:
+            built = manifest = {}
+        changed = [slug for slug, version in versions.items() if built.get(slug) != version]
+
+        pages = []
+        for slug in changed:
+            pages.append((reverse('blogs:detail', args=[slug]), None, 'html'))
+            pages.append((reverse('blogs:api_detail', args=[slug]), None, 'json'))
+        # Every list page shows excerpts and dates, so any change rebuilds them all.
+        lists = hashlib.md5(json.dumps(sorted(versions.items())).encode()).hexdigest()
+        if lists != manifest.get('lists'):
+            if settings.BLOGS_PAGINATION == 'page':
+                pages.extend(self.list_pages(root, len(versions)))
+            else:
+                lists = None
+                self.stderr.write('Cursor pagination has no fixed pages: list pages are not built')
+
+        self.render(root, pages, options)
+        for slug in removed:
+            remove_file(root, page_file(reverse('blogs:detail', args=[slug]), None, 'html'))
+            remove_file(root, page_file(reverse('blogs:api_detail', args=[slug]), None, 'json'))
+        os.makedirs(root, exist_ok=True)
+        replace(os.path.join(root, MANIFEST), json.dumps({'posts': versions, 'lists': lists}).encode())
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rendered %d pages (%d changed posts, %d removed) in %.2fs' % (
+                len(pages), len(changed), len(removed), time.perf_counter() - start,
+            )
+        ))
+
+    def read_manifest(self, root):
+        try:
+            with open(os.path.join(root, MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def list_pages(self, root, count):
+        pages = []
+        for path, per_page, file_format in (
+            (reverse('blogs:index'), BlogList.paginate_by, 'html'),
+            (reverse('blogs:api_index'), api_settings.PAGE_SIZE, 'json'),
+        ):
+            num_pages = Paginator(range(count), per_page).num_pages
+            pages.extend((path, page, file_format) for page in range(1, num_pages + 1))
+            # Drop the pages past the end of a shrunk list.
+            directory = os.path.join(root, path.lstrip('/'), 'page')
+            if os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    if name.isdigit() and int(name) > num_pages:
+                        shutil.rmtree(os.path.join(directory, name))
+        return pages
+
+    def render(self, root, pages, options):
+        if options['workers'] < 1 or len(pages) < 2:
+            render_pages(root, pages, options['base_url'], options['compress'])
+            return
+        size = -(-len(pages) // (options['workers'] * 4))
+        # Children must open their own connections, not share the parent's.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            futures = [
+                executor.submit(render_pages, root, pages[i:i + size], options['base_url'], options['compress'])
+                for i in range(0, len(pages), size)
+            ]
+            for future in futures:
+                future.result()
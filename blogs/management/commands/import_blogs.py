@@ -0,0 +1,172 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blogs import search
+from blogs.cache import render_cache
+from blogs.models import Blog
+from blogs.signals import changed_in_bulk
+
+DATETIME_FIELDS = ('created_datetime', 'updated_datetime')
+
+
+class Command(BaseCommand):
+    help = 'Import posts from JSONL or CSV, creating or updating them by slug'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin")
+        parser.add_argument(
+            '--format', choices=['jsonl', 'csv'],
+            help='Input format; guessed from the file extension by default',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Posts written per transaction',
+        )
+        parser.add_argument(
+            '--on-conflict', choices=['update', 'skip', 'error'], default='update',
+            help='What to do with posts whose slug already exists',
+        )
+
+    def handle(self, *args, **options):
+        input_format = options['format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8', newline='')
+        start = time.perf_counter()
+        totals = {'created': 0, 'updated': 0, 'skipped': 0}
+        updated_slugs = []
+        try:
+            records = self.read(stream, input_format)
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                counts, slugs = self.write(batch, options['on_conflict'])
+                for key, value in counts.items():
+                    totals[key] += value
+                updated_slugs.extend(slugs)
+                if options['verbosity'] >= 2:
+                    self.stdout.write('  %d posts imported' % (totals['created'] + totals['updated']))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            changed_in_bulk(updated_slugs)
+
+        elapsed = time.perf_counter() - start
+        count = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            'Created %(created)d, updated %(updated)d, skipped %(skipped)d posts' % totals
+            + ' in %.2fs (%.0f posts/s)' % (elapsed, count / elapsed if elapsed else 0)
+        ))
+
+    def read(self, stream, input_format):
+        if input_format == 'csv':
+            rows = enumerate(csv.DictReader(stream), start=2)
+        else:
+            rows = (
+                (number, self.parse_json(number, line))
+                for number, line in enumerate(stream, start=1) if line.strip()
+            )
+        for number, row in rows:
+            yield self.clean(number, row)
+
+    def parse_json(self, number, line):
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise CommandError('Line %d: %s' % (number, e))
+        if not isinstance(row, dict):
+            raise CommandError('Line %d: expected a JSON object' % number)
+        return row
+
+    def clean(self, number, row):
+        record = {
+            'title': (row.get('title') or '').strip(),
+            'slug': (row.get('slug') or '').strip(),
+            'text': row.get('text') or '',
+        }
+        if not record['title']:
+            raise CommandError('Line %d: title is required' % number)
+        try:
+            validate_slug(record['slug'])
+        except ValidationError:
+            raise CommandError('Line %d: invalid slug %r' % (number, record['slug']))
+        for field in DATETIME_FIELDS:
+            if row.get(field):
+                value = parse_datetime(row[field])
+                if value is None:
+                    raise CommandError('Line %d: invalid %s' % (number, field))
+                if timezone.is_naive(value):
+                    value = timezone.make_aware(value)
+                record[field] = value
+        # The lengths and formats of the model fields, checked up front: a
+        # database error would abort the import in the middle of a batch.
+        try:
+            Blog(**record).clean_fields()
+        except ValidationError as e:
+            raise CommandError('Line %d: %s' % (number, '; '.join(
+                '%s: %s' % (field, ' '.join(messages)) for field, messages in e.message_dict.items()
+            )))
+        return record
+
+    @transaction.atomic
+    def write(self, records, on_conflict):
+        # A slug repeated within the batch keeps its last record.
+        records = {record['slug']: record for record in records}
+        existing = Blog.objects.in_bulk(list(records), field_name='slug')
+        if existing and on_conflict == 'error':
+            raise CommandError('Posts already exist: %s' % ', '.join(sorted(existing)))
+
+        created = []
+        updated = []
+        for slug, record in records.items():
+            blog = existing.get(slug)
+            if blog is None:
+                blog = Blog(**record)
+                created.append(blog)
+            elif on_conflict == 'update':
+                for field, value in record.items():
+                    setattr(blog, field, value)
+                if 'updated_datetime' not in record:
+                    blog.updated_datetime = timezone.now()
+                updated.append(blog)
+            else:
+                continue
+            blog.update_text_fields()
+
+        Blog.objects.bulk_create(created)
+        if created:
+            # bulk_create sets auto_now(_add) fields itself and SQLite does not
+            # return primary keys: fetch them, then apply imported datetimes.
+            pks = dict(Blog.objects.filter(
+                slug__in=[blog.slug for blog in created]
+            ).values_list('slug', 'pk'))
+            for blog in created:
+                blog.pk = pks[blog.slug]
+            dated = [blog for blog in created if set(DATETIME_FIELDS) & set(records[blog.slug])]
+            for blog in dated:
+                for field in DATETIME_FIELDS:
+                    if field in records[blog.slug]:
+                        setattr(blog, field, records[blog.slug][field])
+            Blog.objects.bulk_update(dated, DATETIME_FIELDS)
+        Blog.objects.bulk_update(updated, [
+            'title', 'text', 'excerpt', 'char_count', 'word_count', *DATETIME_FIELDS,
+        ])
+
+        # bulk operations send no signals, so refresh derived data here.
+        search.index_blogs(created + updated)
+        for blog in updated:
+            render_cache.invalidate(blog.slug)
+        return {
+            'created': len(created),
+            'updated': len(updated),
+            'skipped': len(records) - len(created) - len(updated),
+        }, [blog.slug for blog in updated]
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from blogs.benchmarks import seed_with_factory, throwaway_database
+from blogs.profiling import profile_templates
+
+
+class Command(BaseCommand):
+    help = 'Report the time spent per template, include and tag while rendering a page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100, help='Number of posts seeded')
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--path', help='Page profiled, the blog index by default')
+        parser.add_argument('--limit', type=int, default=25, help='Rows shown, by own time')
+
+    def handle(self, *args, **options):
+        with throwaway_database(), override_settings(BLOGS_PAGE_CACHE_TIMEOUT=0):
+            seed_with_factory(options['posts'])
+            path = options['path'] or reverse('blogs:index')
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            # Leave loading and compiling the templates out of the profile.
+            self.get(client, path)
+            with profile_templates() as profile:
+                for _ in range(options['requests']):
+                    self.get(client, path)
+
+        requests = options['requests']
+        self.stdout.write('Rendering %s: %.3f ms per request' % (path, profile.render_time() * 1000 / requests))
+        self.stdout.write('%-8s %-32s %-40s %8s %10s %10s' % (
+            'kind', 'template', 'name', 'calls', 'total ms', 'own ms',
+        ))
+        entries = sorted(profile.entries.items(), key=lambda item: item[1].own, reverse=True)
+        for (kind, template_name, label), entry in entries[:options['limit']]:
+            self.stdout.write('%-8s %-32s %-40s %8d %10.3f %10.3f' % (
+                kind, template_name or '-', label[:40], entry.calls // requests,
+                entry.total * 1000 / requests, entry.own * 1000 / requests,
+            ))
+
+    def get(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError('GET %s returned %d' % (path, response.status_code))
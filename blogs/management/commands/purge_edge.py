@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blogs import edge
+
+
+class Command(BaseCommand):
+    help = 'Purge pages from the edge cache by surrogate key, e.g. api after a serializer change'
+
+    def add_arguments(self, parser):
+        parser.add_argument('keys', nargs='+', help="Surrogate keys: 'list', 'api' or 'post-<slug>'")
+
+    def handle(self, *args, **options):
+        purger = edge.get_purger()
+        if purger is None:
+            raise CommandError('BLOGS_EDGE_PURGER is not set')
+        purger.purge(options['keys'])
+        self.stdout.write('Purged %s' % ' '.join(options['keys']))
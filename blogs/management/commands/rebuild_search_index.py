@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blogs import search
+from blogs.models import Blog, BlogSearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Build the search documents of every post (backfill after bulk writes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts indexed per query',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete every search document before indexing',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['clear']:
+            BlogSearchDocument.objects.all().delete()
+
+        batch_size = options['batch_size']
+        queryset = Blog.objects.order_by('pk').only('pk', 'title', 'text')
+        batch = []
+        total = 0
+        for blog in queryset.iterator(chunk_size=batch_size):
+            batch.append(blog)
+            if len(batch) >= batch_size:
+                total += search.index_blogs(batch)
+                batch = []
+        if batch:
+            total += search.index_blogs(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Indexed %d posts in %.2fs' % (total, time.perf_counter() - start)
+        ))
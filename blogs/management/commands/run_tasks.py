@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from blogs.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run the background tasks queued in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=10, help='Tasks claimed at a time')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when no task is due')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due')
+
+    def handle(self, *args, **options):
+        worker = Worker(batch_size=options['batch'])
+        total = 0
+        try:
+            while True:
+                # Like a request boundary: drop connections past CONN_MAX_AGE or broken.
+                close_old_connections()
+                count = worker.run_pending()
+                total += count
+                if not count:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('Ran %d tasks' % total)
@@ -0,0 +1,324 @@
+import hashlib
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import parse_http_date_safe, urlencode
+from django.utils.text import compress_sequence
+
+from . import compression, edge, instrumentation, queries, routers, search
+
+GENERATION_KEY = 'pages:generation'
+
+
+def invalidate_pages():
+    """Mark every cached page stale; each is rebuilt on its next request"""
+    caches['blogs'].set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+class AnonymousPageCacheMiddleware:
+    """Short-lived cache of whole pages for anonymous visitors
+
+    Place it before SessionMiddleware: a hit is answered without running the
+    rest of the middleware stack. Requests carrying a session cookie (logged
+    in users, admin) are never cached or served from the cache.
+
+    Pages are keyed on the BLOGS_PAGE_CACHE_QUERY_PARAMS, the keyword
+    normalized like a search; a request with any other parameter is not
+    cached, as the page links carry its parameters along.
+
+    Entries are fresh for BLOGS_PAGE_CACHE_TIMEOUT seconds and may be served
+    stale for BLOGS_PAGE_CACHE_STALE more. Only the request that takes the
+    lock rebuilds a stale or missing page; the others serve the stale copy
+    or wait for the new one, so an expiry does not stampede the database.
+    Entries from before invalidate_pages() are never served, stale or not.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @property
+    def cache(self):
+        return caches['blogs']
+
+    def is_cacheable_request(self, request):
+        if not settings.BLOGS_PAGE_CACHE_TIMEOUT or request.method != 'GET':
+            return False
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        if any(
+            name not in settings.BLOGS_PAGE_CACHE_QUERY_PARAMS or len(values) > 1
+            for name, values in request.GET.lists()
+        ):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        # Lets outer middleware label cache hits, which skip URL resolution.
+        request.resolver_match = match
+        return match.view_name in settings.BLOGS_PAGE_CACHE_URL_NAMES
+
+    def is_cacheable_response(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+            and 'no-store' not in response.get('Cache-Control', '')
+        )
+
+    def make_key(self, request):
+        params = []
+        for name in sorted(settings.BLOGS_PAGE_CACHE_QUERY_PARAMS):
+            value = request.GET.get(name, '')
+            value = search.normalize_keyword(value) if name == 'keyword' else value.strip()
+            if value:
+                params.append((name, value))
+        address = '%s?%s' % (request.path_info, urlencode(params))
+        if settings.BLOGS_COMPRESS:
+            # CompressionMiddleware runs inside this one: keep a copy per encoding.
+            address += '|%s' % compression.negotiate(request)
+        return 'pages:%s' % hashlib.md5(address.encode()).hexdigest()
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        key = self.make_key(request)
+        values = self.cache.get_many([key, GENERATION_KEY])
+        entry = values.get(key)
+        generation = values.get(GENERATION_KEY)
+        if entry is not None and entry[0] == generation:
+            expires, response = entry[1:]
+            if expires > time.time():
+                return self.serve(request, response, 'HIT')
+            locked = self.lock(key)
+            if not locked:
+                return self.serve(request, response, 'STALE')
+        else:
+            # Missing, or from before invalidate_pages(): wait, never serve it.
+            locked = self.lock(key)
+            if not locked:
+                response = self.wait(key, generation)
+                if response is not None:
+                    return self.serve(request, response, 'HIT')
+
+        try:
+            response = self.get_response(request)
+            if self.is_cacheable_response(response):
+                self.cache.set(
+                    key,
+                    (generation, time.time() + settings.BLOGS_PAGE_CACHE_TIMEOUT, response),
+                    settings.BLOGS_PAGE_CACHE_TIMEOUT + settings.BLOGS_PAGE_CACHE_STALE,
+                )
+            elif response.status_code != 304:
+                # Do not keep serving a page that has gone away.
+                self.cache.delete(key)
+        finally:
+            if locked:
+                self.cache.delete(self.lock_key(key))
+        response['X-Page-Cache'] = 'MISS'
+        return response
+
+    def lock_key(self, key):
+        return key + ':lock'
+
+    def lock(self, key):
+        return self.cache.add(self.lock_key(key), 1, settings.BLOGS_PAGE_CACHE_LOCK_TIMEOUT)
+
+    def wait(self, key, generation):
+        """Wait for the request holding the lock to store the page"""
+        deadline = time.monotonic() + settings.BLOGS_PAGE_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] == generation:
+                return entry[2]
+            if not self.cache.has_key(self.lock_key(key)):
+                break
+        return None
+
+    def serve(self, request, response, state):
+        response['X-Page-Cache'] = state
+        last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+        return get_conditional_response(
+            request, etag=response.get('ETag'), last_modified=last_modified, response=response,
+        )
+
+
+class InstrumentationMiddleware:
+    """Measure SQL, template rendering and serializers of every request
+
+    Timings go out in a Server-Timing header and into per URL name histograms
+    served by the metrics view. Put it first in MIDDLEWARE so that the total
+    covers the other middleware. When BLOGS_INSTRUMENTATION is off it removes
+    itself from the stack at startup and costs nothing.
+    """
+
+    def __init__(self, get_response):
+        if not settings.BLOGS_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with instrumentation.collect() as metrics, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        metrics.timings['total'] = total
+
+        match = getattr(request, 'resolver_match', None)
+        instrumentation.registry.observe(match.view_name if match else '<unresolved>', metrics, total)
+        response['Server-Timing'] = metrics.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = instrumentation.current()
+        start = time.perf_counter()
+
+        def rendered(response):
+            metrics.timings['render'] += time.perf_counter() - start
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class RepeatedQueryMiddleware:
+    """Flag requests that run the same query shape again and again (N+1)
+
+    For development and tests: BLOGS_QUERY_CHECK 'warn' logs each flagged
+    request with the stack that repeated the query, 'raise' fails it with
+    RepeatedQueries. Off by default, when it removes itself at startup.
+    """
+
+    def __init__(self, get_response):
+        if settings.BLOGS_QUERY_CHECK not in ('warn', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with queries.detect_repeated_queries() as detector:
+            response = self.get_response(request)
+        if detector.repeated:
+            message = '%s %s\n%s' % (request.method, request.path, detector.report())
+            if settings.BLOGS_QUERY_CHECK == 'raise':
+                raise queries.RepeatedQueries(message)
+            queries.logger.warning(message)
+        return response
+
+
+class EdgeCacheMiddleware:
+    """Tag the responses the edge may cache with their surrogate keys
+
+    Public responses of the URL names in BLOGS_EDGE_MAX_AGE get a
+    Surrogate-Key header and may stay at the edge (nginx's proxy_cache) for
+    that many seconds, through s-maxage and X-Accel-Expires, which nginx
+    reads and does not pass on. Browsers keep BLOGS_CACHE_MAX_AGE, as they
+    cannot be purged. Off unless BLOGS_EDGE_PURGER is set: long lifetimes
+    are only safe when changes purge them.
+    """
+
+    def __init__(self, get_response):
+        if not settings.BLOGS_EDGE_PURGER:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if (
+            match is None
+            or match.view_name not in settings.BLOGS_EDGE_MAX_AGE
+            or request.method not in ('GET', 'HEAD')
+            or response.status_code not in (200, 304)
+            or 'public' not in response.get('Cache-Control', '')
+        ):
+            return response
+        response['Surrogate-Key'] = ' '.join(edge.surrogate_keys(match))
+        if edge.is_purgeable(request, match):
+            max_age = settings.BLOGS_EDGE_MAX_AGE[match.view_name]
+        else:
+            max_age = settings.BLOGS_CACHE_MAX_AGE
+        patch_cache_control(response, s_maxage=max_age)
+        response['X-Accel-Expires'] = str(max_age)
+        return response
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, whichever the client prefers
+
+    Brotli needs the optional brotli package. Responses smaller than
+    BLOGS_COMPRESS_MIN_SIZE bytes are not worth the CPU and go out as they
+    are. Put it right after AnonymousPageCacheMiddleware so that cached pages
+    are stored compressed, one copy per encoding, and hits cost no CPU.
+    """
+
+    def __init__(self, get_response):
+        if not settings.BLOGS_COMPRESS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.has_header('Content-Encoding')
+            or not compression.COMPRESSIBLE_TYPES_RE.match(response.get('Content-Type', ''))
+            or not response.streaming and len(response.content) < settings.BLOGS_COMPRESS_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        # Stream gzip only; brotli would need a streaming compressor.
+        encoding = compression.negotiate(request, ['gzip'] if response.streaming else None)
+        if encoding is None:
+            return response
+
+        with instrumentation.timer('compress'):
+            if response.streaming:
+                response.streaming_content = compress_sequence(response.streaming_content)
+                del response['Content-Length']
+            else:
+                content = compression.compress(encoding, response.content)
+                if len(content) >= len(response.content):
+                    return response
+                response.content = content
+                response['Content-Length'] = str(len(content))
+
+        # The body is no longer byte for byte the one the ETag was made for.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Keep a client reading from the primary for a while after it wrote
+
+    ReplicaRouter pins the request that writes a post. A cookie carries the
+    pin to the client's next requests for BLOGS_REPLICA_PIN_SECONDS, e.g.
+    the redirect after an admin save, so that it does not read a replica
+    that has not caught up yet.
+    """
+    cookie_name = 'blogs_primary'
+
+    def __init__(self, get_response):
+        if not settings.BLOGS_DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.pinning(self.cookie_name in request.COOKIES) as pinning:
+            response = self.get_response(request)
+        if pinning.wrote:
+            response.set_cookie(
+                self.cookie_name, '1', max_age=settings.BLOGS_REPLICA_PIN_SECONDS, httponly=True,
+            )
+        return response
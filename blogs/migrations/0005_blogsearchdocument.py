@@ -0,0 +1,70 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE blogs_blogsearchdocument_fts USING fts5("
+    "title_tokens, text_tokens, "
+    "content='blogs_blogsearchdocument', content_rowid='blog_id')",
+    "CREATE TRIGGER blogs_blogsearchdocument_ai AFTER INSERT ON blogs_blogsearchdocument BEGIN "
+    "INSERT INTO blogs_blogsearchdocument_fts(rowid, title_tokens, text_tokens) "
+    "VALUES (new.blog_id, new.title_tokens, new.text_tokens); END",
+    "CREATE TRIGGER blogs_blogsearchdocument_ad AFTER DELETE ON blogs_blogsearchdocument BEGIN "
+    "INSERT INTO blogs_blogsearchdocument_fts(blogs_blogsearchdocument_fts, rowid, title_tokens, text_tokens) "
+    "VALUES ('delete', old.blog_id, old.title_tokens, old.text_tokens); END",
+    "CREATE TRIGGER blogs_blogsearchdocument_au AFTER UPDATE ON blogs_blogsearchdocument BEGIN "
+    "INSERT INTO blogs_blogsearchdocument_fts(blogs_blogsearchdocument_fts, rowid, title_tokens, text_tokens) "
+    "VALUES ('delete', old.blog_id, old.title_tokens, old.text_tokens); "
+    "INSERT INTO blogs_blogsearchdocument_fts(rowid, title_tokens, text_tokens) "
+    "VALUES (new.blog_id, new.title_tokens, new.text_tokens); END",
+]
+
+GIN_SQL = [
+    "CREATE INDEX blogs_blogsearchdocument_vector ON blogs_blogsearchdocument USING gin (("
+    "setweight(to_tsvector('simple'::regconfig, title_tokens), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, text_tokens), 'B')))",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': FTS_SQL, 'postgresql': GIN_SQL}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS blogs_blogsearchdocument_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS blogs_blogsearchdocument_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0004_auto_20200619_1407'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogSearchDocument',
+            fields=[
+                ('blog', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blogs.Blog')),
+                ('title_tokens', models.TextField(blank=True)),
+                ('text_tokens', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='blog',
+            options={'ordering': ('-created_datetime',)},
+        ),
+        migrations.AlterField(
+            model_name='blog',
+            name='slug',
+            field=models.SlugField(unique=True, verbose_name='スラッグ'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0005_blogsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='blog',
+            options={'ordering': ('-created_datetime', '-id')},
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['-created_datetime', '-id'], name='blogs_blog_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:34
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+BATCH_SIZE = 500
+
+
+def backfill_text_fields(apps, schema_editor):
+    # Mirrors Blog.update_text_fields(), which historical models do not have.
+    Blog = apps.get_model('blogs', 'Blog')
+    last_pk = 0
+    while True:
+        batch = list(
+            Blog.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'text')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for blog in batch:
+            blog.excerpt = Truncator(blog.text).chars(100)
+            blog.char_count = len(blog.text)
+            blog.word_count = len(blog.text.split())
+        Blog.objects.bulk_update(batch, ['excerpt', 'char_count', 'word_count'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0006_blog_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='char_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='文字数'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='抜粋'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='単語数'),
+        ),
+        migrations.RunPython(backfill_text_fields, migrations.RunPython.noop),
+    ]
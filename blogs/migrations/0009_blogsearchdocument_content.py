@@ -0,0 +1,60 @@
+import unicodedata
+from importlib import import_module
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+TRIGGERS = ('blogs_blogsearchdocument_ai', 'blogs_blogsearchdocument_ad', 'blogs_blogsearchdocument_au')
+
+
+def restore_fts_triggers(apps, schema_editor):
+    # SQLite adds and removes columns by rebuilding the table, which drops
+    # the triggers that keep the FTS table of migration 0005 in sync.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in TRIGGERS:
+        schema_editor.execute('DROP TRIGGER IF EXISTS %s' % trigger)
+    for statement in import_module('blogs.migrations.0005_blogsearchdocument').FTS_SQL[1:]:
+        schema_editor.execute(statement)
+    schema_editor.execute(
+        "INSERT INTO blogs_blogsearchdocument_fts(blogs_blogsearchdocument_fts) VALUES ('rebuild')"
+    )
+
+
+def normalize(text):
+    # Mirrors blogs.search.normalize(), which may change after this migration.
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def backfill_content(apps, schema_editor):
+    BlogSearchDocument = apps.get_model('blogs', 'BlogSearchDocument')
+    last_pk = 0
+    while True:
+        batch = list(
+            BlogSearchDocument.objects.filter(pk__gt=last_pk).order_by('pk')
+            .select_related('blog').only('pk', 'blog__title', 'blog__text')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for document in batch:
+            document.content = '%s\n%s' % (normalize(document.blog.title), normalize(document.blog.text))
+        BlogSearchDocument.objects.bulk_update(batch, ['content'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0008_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='blogsearchdocument',
+            name='content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_content, migrations.RunPython.noop),
+    ]
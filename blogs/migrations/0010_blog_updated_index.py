@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0009_blogsearchdocument_content'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['updated_datetime'], name='blogs_blog_updated_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 100
 
 
 # Create your models here.
@@ -12,11 +15,95 @@ class Blog(models.Model):
     title = models.CharField('タイトル', max_length=150)
     slug = models.SlugField('スラッグ', unique=True)
     text = models.TextField('本文', blank=True)
+    excerpt = models.CharField('抜粋', max_length=EXCERPT_LENGTH, blank=True, editable=False)
+    char_count = models.PositiveIntegerField('文字数', default=0, editable=False)
+    word_count = models.PositiveIntegerField('単語数', default=0, editable=False)
     created_datetime = models.DateTimeField('作成日', auto_now_add=True)
     updated_datetime = models.DateTimeField('更新日', auto_now=True)
 
     class Meta:
-        ordering = ('-created_datetime',)
+        ordering = ('-created_datetime', '-id')
+        indexes = [
+            # Backs keyset pagination on the ordering above
+            models.Index(fields=['-created_datetime', '-id'], name='blogs_blog_created_id_idx'),
+            # Backs the Max() in the ETags of lists
+            models.Index(fields=['updated_datetime'], name='blogs_blog_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        blog = super().from_db(db, field_names, values)
+        # The stored slug, whose URLs a rename leaves behind
+        if 'slug' in field_names:
+            blog.stored_slug = values[field_names.index('slug')]
+        return blog
+
+    def save(self, *args, **kwargs):
+        self.update_text_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt', 'char_count', 'word_count'}
+        super().save(*args, **kwargs)
+        self.stored_slug = self.slug
+
+    def update_text_fields(self):
+        """Derive the excerpt and counts shown on list pages from the text"""
+        self.excerpt = Truncator(self.text).chars(EXCERPT_LENGTH)
+        self.char_count = len(self.text)
+        self.word_count = len(self.text.split())
+
+
+class BlogSearchDocument(models.Model):
+    """Bigram tokens of a post, indexed by the database's full-text engine"""
+    blog = models.OneToOneField(
+        Blog, on_delete=models.CASCADE, primary_key=True,
+        related_name='search_document',
+    )
+    title_tokens = models.TextField(blank=True)
+    text_tokens = models.TextField(blank=True)
+    # Title and text normalized like search keywords, for the exact match
+    content = models.TextField(blank=True)
+
+    def __str__(self):
+        return str(self.blog_id)
+
+
+class Task(models.Model):
+    """Background work queued in the database, run by `manage.py run_tasks`
+
+    At most one task per (name, key) waits at a time, so repeated requests
+    for the same post, or for a rebuild of the whole site, collapse into one.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_datetime = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='blogs_task_status_run_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'key'], condition=models.Q(status='pending'), name='blogs_task_pending_uniq',
+            ),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return '%s(%s)' % (self.name, self.key)
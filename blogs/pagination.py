@@ -0,0 +1,307 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+ELLIPSIS = '…'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def estimated_count(queryset):
+    """Rows of the queryset from the PostgreSQL table statistics, or None
+
+    Only an unfiltered queryset has as many rows as its table. The estimate
+    is as fresh as the last ANALYZE (autovacuum keeps it close); None is
+    returned when the table was never analyzed.
+    """
+    query = queryset.query
+    if query.where or query.distinct or query.combinator or not query.can_filter():
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def positive_int(value, cutoff=None):
+    """Parse a strictly positive integer, capped at cutoff
+
+    Raises ValueError for anything else, e.g. '0', '-1' or 'ten'.
+    """
+    number = int(value)
+    if number <= 0:
+        raise ValueError('%r is not a positive integer' % value)
+    if cutoff:
+        return min(number, cutoff)
+    return number
+
+
+def elided_page_range(number, num_pages, on_each_side=2, on_ends=1):
+    """Page numbers to link from page number, with ELLIPSIS for the gaps
+
+    Keeps on_ends pages at each end and on_each_side pages around number,
+    like Paginator.get_elided_page_range of later Django versions.
+    """
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > on_each_side + on_ends + 2:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
+
+
+class WindowedPaginator(Paginator):
+    """Paginator linking a window of pages instead of all of them
+
+    With BLOGS_ESTIMATED_COUNT_THRESHOLD set, an unfiltered list of more
+    rows than that on PostgreSQL is counted from the table statistics
+    instead of by COUNT(*). The last page number is then approximate: a page
+    past the real end is a 404. A page past the estimated end, or a full last
+    page, may mean the estimate is short, so those count the rows after all.
+    """
+    ELLIPSIS = ELLIPSIS
+    on_each_side = 2
+    on_ends = 1
+    estimated = False
+
+    @cached_property
+    def count(self):
+        threshold = settings.BLOGS_ESTIMATED_COUNT_THRESHOLD
+        if threshold and isinstance(self.object_list, QuerySet):
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate > threshold:
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        try:
+            page = super().page(number)
+        except EmptyPage:
+            if not self.estimated:
+                raise
+            self.count_exactly()
+            return super().page(number)
+        if self.estimated and page.number > 1 and not page.object_list:
+            raise EmptyPage(_('That page contains no results'))
+        if self.estimated and page.number == self.num_pages and len(page.object_list) >= self.per_page:
+            self.count_exactly()
+            page = super().page(number)
+        return page
+
+    def count_exactly(self):
+        self.estimated = False
+        self.count = self.object_list.count()
+        self.__dict__.pop('num_pages', None)
+
+    def get_elided_page_range(self, number=1):
+        return elided_page_range(self.validate_number(number), self.num_pages, self.on_each_side, self.on_ends)
+
+
+class KeysetPage:
+    """Page of a KeysetPaginator, usable as page_obj in templates"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<KeysetPage of %d objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return self.paginator.encode_cursor(self.object_list[-1], reverse=False)
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return self.paginator.encode_cursor(self.object_list[0], reverse=True)
+
+
+class KeysetPaginator:
+    """Paginate on (created_datetime, id) without COUNT(*) or OFFSET
+
+    A cursor records the key of the last row shown and the direction to go,
+    so every page is a range scan of the composite index on Blog. Pages are
+    always in that order, whatever the ordering of object_list, e.g. a
+    search ranking.
+    """
+    keyset = True
+    ordering = ('-created_datetime', '-id')
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            created_datetime, pk = (obj[field] for field in self.fields)
+        else:
+            created_datetime, pk = (getattr(obj, field) for field in self.fields)
+        data = [created_datetime.isoformat(), pk, int(reverse)]
+        token = base64.urlsafe_b64encode(json.dumps(data).encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            created_datetime, pk, reverse = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+            created_datetime = parse_datetime(created_datetime)
+            pk = int(pk)
+        except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+            raise InvalidCursor('Invalid cursor')
+        if created_datetime is None:
+            raise InvalidCursor('Invalid cursor')
+        return (created_datetime, pk), bool(reverse)
+
+    def position_filter(self, values, reverse):
+        """Rows after values in the ordering, or before them if reverse"""
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            equal = dict(zip(self.fields[:index], values[:index]))
+            equal['%s__%s' % (self.fields[index], lookup)] = values[index]
+            condition |= Q(**equal)
+        return condition
+
+    def page(self, cursor=None):
+        queryset = self.object_list
+        reverse = False
+        if cursor:
+            values, reverse = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.position_filter(values, reverse))
+        if reverse:
+            queryset = queryset.order_by(*(
+                field[1:] if field.startswith('-') else '-' + field
+                for field in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=bool(rows), has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=bool(cursor))
+
+
+class BlogPageNumberPagination(PageNumberPagination):
+    """Numbered pages of PAGE_SIZE posts; clients may ask for up to 100"""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """DRF counterpart of KeysetPaginator with opaque ?cursor= tokens"""
+    cursor_query_param = 'cursor'
+    # None follows REST_FRAMEWORK['PAGE_SIZE'], read per request so that
+    # settings overridden after import apply.
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            return positive_int(
+                request.query_params[self.page_size_query_param],
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size or api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request))
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor as exc:
+            raise NotFound(str(exc))
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_link(self.page.next_cursor)),
+            ('previous', self.get_link(self.page.previous_cursor)),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,87 @@
+import time
+from contextlib import contextmanager
+
+from django.template.base import Node, Template, TextNode, VariableNode
+from django.template.loader_tags import IncludeNode
+
+
+class Entry:
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+
+
+class TemplateProfile:
+    """Time spent per template, include, tag and variable
+
+    total counts everything rendered inside an entry, own leaves out the
+    entries nested in it, so the own times add up to the whole render.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.stack = []
+
+    def measure(self, key, render, *args):
+        self.stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = Entry()
+            entry.calls += 1
+            entry.total += elapsed
+            entry.own += elapsed - nested
+
+    def render_time(self):
+        return sum(entry.own for entry in self.entries.values())
+
+
+def node_key(node):
+    """(kind, template, label) of a node, e.g. ('tag', 'blogs/index.html', 'for')"""
+    template_name = getattr(getattr(node, 'origin', None), 'template_name', None)
+    if isinstance(node, TextNode):
+        return 'text', template_name, ''
+    if isinstance(node, VariableNode):
+        return 'variable', template_name, '{{ %s }}' % node.token.contents
+    if isinstance(node, IncludeNode):
+        return 'include', template_name, node.token.contents
+    contents = node.token.contents if node.token else type(node).__name__
+    return 'tag', template_name, contents.split(None, 1)[0]
+
+
+@contextmanager
+def profile_templates():
+    """Profile the Django templates rendered in the block
+
+    This patches the template classes for the whole process and keeps one
+    stack, so it is for profiling a single thread (see `manage.py
+    profile_templates`), never for serving requests. Own times include the
+    profiler's overhead, which inflates cheap nodes rendered many times.
+    """
+    profile = TemplateProfile()
+    render_annotated = Node.render_annotated
+    template_render = Template._render
+
+    def profiled_render_annotated(node, context):
+        return profile.measure(node_key(node), render_annotated, node, context)
+
+    def profiled_template_render(template, context):
+        key = ('template', template.origin.template_name or template.name, '')
+        return profile.measure(key, template_render, template, context)
+
+    Node.render_annotated = profiled_render_annotated
+    Template._render = profiled_template_render
+    try:
+        yield profile
+    finally:
+        Node.render_annotated = render_annotated
+        Template._render = template_render
@@ -0,0 +1,101 @@
+import logging
+import os
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)')
+SPACE_RE = re.compile(r'\s+')
+STACK_DEPTH = 8
+
+
+class RepeatedQueries(Exception):
+    pass
+
+
+def normalize_sql(sql):
+    """Reduce sql to its shape: literals, placeholders and IN lists become ?
+
+    Queries that differ only by the row they fetch, e.g. the author of each
+    post of a page, then share one shape.
+    """
+    sql = LITERAL_RE.sub('?', sql.replace('%s', '?'))
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def project_stack():
+    """The innermost frames of the call stack that are code of this project"""
+    ignored = ('%ssite-packages%s' % (os.sep, os.sep), __file__)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(settings.BASE_DIR) and not any(part in frame.filename for part in ignored)
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class RepeatedQueryDetector:
+    """Database execute wrapper flagging a query shape run threshold times
+
+    A shape repeated within one request is the mark of an N+1: a query per
+    row of a list, where one query, select_related() or prefetch_related()
+    would do. The stack of the repetition that crossed the threshold is
+    kept to show where it comes from.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = normalize_sql(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == self.threshold:
+            self.stacks[shape] = project_stack()
+        return execute(sql, params, many, context)
+
+    @property
+    def repeated(self):
+        return {shape: self.counts[shape] for shape in self.stacks}
+
+    def report(self):
+        return '\n\n'.join(
+            'Query run %d times:\n    %s\nRepeated from:\n%s' % (self.counts[shape], shape, stack)
+            for shape, stack in self.stacks.items()
+        )
+
+
+@contextmanager
+def detect_repeated_queries(threshold=None):
+    """Watch the queries of every database connection in the block"""
+    detector = RepeatedQueryDetector(threshold or settings.BLOGS_QUERY_CHECK_THRESHOLD)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
+
+
+@contextmanager
+def query_budget(budget, threshold=None):
+    """Fail when the block runs more than budget queries or repeats a query
+
+    For tests: pins the query cost of a page, and catches N+1 patterns even
+    while the budget still holds.
+    """
+    with detect_repeated_queries(threshold) as detector:
+        yield detector
+    total = sum(detector.counts.values())
+    if total > budget:
+        raise AssertionError('%d queries run, over the budget of %d:\n    %s' % (
+            total, budget, '\n    '.join(detector.counts.elements()),
+        ))
+    if detector.repeated:
+        raise AssertionError(detector.report())
@@ -0,0 +1,21 @@
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Newline-delimited JSON, one serialized object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render_line(self, item):
+        return (json.dumps(item, cls=encoders.JSONEncoder, ensure_ascii=False) + '\n').encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = data.get('results', [data])
+        return b''.join(self.render_line(item) for item in data)
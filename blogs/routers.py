@@ -0,0 +1,154 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Replication delay in seconds, or NULL on a server that is not replaying.
+# The age of the last replayed transaction keeps growing while the primary
+# is idle, so a replica that has replayed all it received is not behind.
+LAG_QUERIES = {
+    'postgresql': (
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+    ),
+}
+
+_pinning = contextvars.ContextVar('blogs_replica_pinning', default=None)
+
+
+class Pinning:
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+@contextmanager
+def pinning(pinned=False):
+    """Scope the pinning to the primary to one request"""
+    token = _pinning.set(Pinning(pinned))
+    try:
+        yield _pinning.get()
+    finally:
+        _pinning.reset(token)
+
+
+def pin_to_primary():
+    """Send the following reads of the request (or command) to the primary"""
+    state = _pinning.get()
+    if state is None:
+        state = Pinning()
+        _pinning.set(state)
+    state.pinned = state.wrote = True
+
+
+def is_pinned():
+    state = _pinning.get()
+    return state is not None and state.pinned
+
+
+class Replica:
+
+    def __init__(self, alias, weight):
+        self.alias = alias
+        self.weight = weight
+        self.current_weight = 0
+        self.healthy = True
+        self.checked_at = None
+
+
+class ReplicaPool:
+    """Replicas chosen by smooth weighted round-robin, skipping unhealthy ones
+
+    With equal weights this is plain round-robin. Each replica is checked at
+    most every BLOGS_REPLICA_CHECK_INTERVAL seconds: it must answer a query
+    and, where the database can tell, lag less than BLOGS_REPLICA_MAX_LAG
+    seconds behind the primary.
+    """
+
+    def __init__(self, weights, clock=time.monotonic):
+        self.replicas = [Replica(alias, weight) for alias, weight in weights.items() if weight > 0]
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def __contains__(self, alias):
+        return any(replica.alias == alias for replica in self.replicas)
+
+    def choose(self):
+        """Return the alias of the next healthy replica, or None"""
+        candidates = [replica for replica in self.replicas if self.is_healthy(replica)]
+        if not candidates:
+            return None
+        with self.lock:
+            total = 0
+            for replica in candidates:
+                replica.current_weight += replica.weight
+                total += replica.weight
+            chosen = max(candidates, key=lambda replica: replica.current_weight)
+            chosen.current_weight -= total
+        return chosen.alias
+
+    def is_healthy(self, replica):
+        now = self.clock()
+        if replica.checked_at is None or now - replica.checked_at >= settings.BLOGS_REPLICA_CHECK_INTERVAL:
+            replica.checked_at = now
+            replica.healthy = self.check(replica.alias)
+        return replica.healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                query = LAG_QUERIES.get(connection.vendor, 'SELECT NULL')
+                cursor.execute(query)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            connection.close()
+            return False
+        return lag is None or float(lag) <= settings.BLOGS_REPLICA_MAX_LAG
+
+
+class ReplicaRouter:
+    """Read the models of BLOGS_REPLICA_MODELS from replicas, write to default
+
+    Reads stay on the primary inside a transaction and once the request has
+    written to one of those models (see ReplicaPinningMiddleware). When no
+    replica is healthy they fall back to the primary.
+    """
+
+    def __init__(self):
+        self.replicas = ReplicaPool(settings.BLOGS_DATABASE_REPLICAS)
+
+    def is_replicated(self, model):
+        return model._meta.label in settings.BLOGS_REPLICA_MODELS
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or not self.is_replicated(model):
+            return None
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.replicas.choose() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if not self.replicas or not self.is_replicated(model):
+            return None
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {obj1._state.db, obj2._state.db}
+        if databases <= {DEFAULT_DB_ALIAS, *(replica.alias for replica in self.replicas.replicas)}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in self.replicas:
+            return False
+        return None
@@ -0,0 +1,235 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .cache import search_cache
+from .models import Blog, BlogSearchDocument
+
+NGRAM_SIZE = 2
+WORD_RE = re.compile(r'\w+')
+
+DOCUMENT_TABLE = BlogSearchDocument._meta.db_table
+FTS_TABLE = DOCUMENT_TABLE + '_fts'
+BLOG_PK = '%s.%s' % (
+    connection.ops.quote_name(Blog._meta.db_table),
+    connection.ops.quote_name(Blog._meta.pk.column),
+)
+
+
+class RawSubquery(RawSQL):
+    """RawSQL for the right-hand side of __in, which adds the parentheses itself"""
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def normalize(text):
+    """Fold width and case so that full-width input matches half-width text"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def normalize_keyword(keyword):
+    """Normalize a search keyword and collapse its whitespace
+
+    Inputs differing only in width, case or spacing share one cache entry.
+    """
+    return ' '.join(normalize(keyword).split())
+
+
+def tokenize(text):
+    """Split text into the character bigrams stored in the search index
+
+    Japanese has no spaces between words, so every run of word characters
+    (Latin words included) is cut into overlapping bigrams. A keyword then
+    matches a post whenever all of its bigrams appear in the post.
+    """
+    tokens = []
+    for word in WORD_RE.findall(normalize(text)):
+        tokens.extend(
+            word[i:i + NGRAM_SIZE] for i in range(len(word) - NGRAM_SIZE + 1)
+        )
+    return tokens
+
+
+def query_tokens(keyword):
+    """Return the distinct bigrams of a keyword in their original order"""
+    return list(dict.fromkeys(tokenize(keyword)))
+
+
+def build_document(blog):
+    return BlogSearchDocument(
+        blog_id=blog.pk,
+        title_tokens=' '.join(tokenize(blog.title)),
+        text_tokens=' '.join(tokenize(blog.text)),
+        content='%s\n%s' % (normalize(blog.title), normalize(blog.text)),
+    )
+
+
+def index_blog(blog):
+    """Create or refresh the search document of a single post"""
+    document = build_document(blog)
+    BlogSearchDocument.objects.update_or_create(
+        blog_id=blog.pk,
+        defaults={
+            'title_tokens': document.title_tokens,
+            'text_tokens': document.text_tokens,
+            'content': document.content,
+        },
+    )
+
+
+def index_blogs(blogs):
+    """Replace the search documents of many posts with two queries"""
+    documents = [build_document(blog) for blog in blogs]
+    BlogSearchDocument.objects.filter(
+        blog_id__in=[document.blog_id for document in documents]
+    ).delete()
+    BlogSearchDocument.objects.bulk_create(documents)
+    return len(documents)
+
+
+class IcontainsSearchBackend:
+    """Sequential scan with LIKE, used when no index is available"""
+
+    def candidates(self, tokens):
+        return None
+
+    def rank(self, tokens):
+        return None
+
+
+class SQLiteSearchBackend(IcontainsSearchBackend):
+    """FTS5 table kept in sync with BlogSearchDocument by triggers"""
+
+    def match(self, tokens):
+        return ' '.join('"%s"' % token.replace('"', '""') for token in tokens)
+
+    def candidates(self, tokens):
+        return RawSubquery(
+            'SELECT rowid FROM {fts} WHERE {fts} MATCH %s'.format(fts=FTS_TABLE),
+            [self.match(tokens)],
+        )
+
+    def rank(self, tokens):
+        # bm25() is lower for better matches and titles weigh ten times more.
+        return RawSQL(
+            'SELECT -bm25({fts}, 10.0, 1.0) FROM {fts} '
+            'WHERE {fts} MATCH %s AND rowid = {pk}'.format(fts=FTS_TABLE, pk=BLOG_PK),
+            [self.match(tokens)],
+            output_field=FloatField(),
+        )
+
+
+class PostgresSearchBackend(IcontainsSearchBackend):
+    """tsvector built from the stored bigrams and backed by a GIN index"""
+
+    # Must stay identical to the expression of the index created in migration 0005.
+    VECTOR = (
+        "setweight(to_tsvector('simple'::regconfig, title_tokens), 'A') || "
+        "setweight(to_tsvector('simple'::regconfig, text_tokens), 'B')"
+    )
+    QUERY = "plainto_tsquery('simple'::regconfig, %s)"
+
+    def candidates(self, tokens):
+        return RawSubquery(
+            'SELECT blog_id FROM {table} WHERE ({vector}) @@ {query}'.format(
+                table=DOCUMENT_TABLE, vector=self.VECTOR, query=self.QUERY,
+            ),
+            [' '.join(tokens)],
+        )
+
+    def rank(self, tokens):
+        return RawSQL(
+            'SELECT ts_rank({vector}, {query}) FROM {table} WHERE blog_id = {pk}'.format(
+                table=DOCUMENT_TABLE, vector=self.VECTOR, query=self.QUERY, pk=BLOG_PK,
+            ),
+            [' '.join(tokens)],
+            output_field=FloatField(),
+        )
+
+
+BACKENDS = {
+    'icontains': IcontainsSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    """Return the backend named by BLOGS_SEARCH_BACKEND, or the database's own"""
+    name = settings.BLOGS_SEARCH_BACKEND
+    if name == 'auto':
+        name = connection.vendor
+    return BACKENDS.get(name, IcontainsSearchBackend)()
+
+
+def filter_blogs(blogs, keyword, ranked=False):
+    """Narrow blogs to the posts containing keyword in the title or text
+
+    Width and case do not matter: the index only yields candidates, then
+    the LIKE check runs on the normalized content of those few rows. Posts
+    are found through their search document, so one whose document is
+    missing or behind (queued reindexing, bulk updates) is not found until
+    it is reindexed. Without an index every row is scanned anyway, and the
+    raw title and text are checked too.
+    """
+    keyword = normalize_keyword(keyword)
+    backend = get_backend()
+    tokens = query_tokens(keyword)
+    candidates = backend.candidates(tokens) if tokens else None
+    condition = Q(search_document__content__contains=keyword)
+    if candidates is None:
+        condition |= Q(title__icontains=keyword) | Q(text__icontains=keyword)
+    else:
+        blogs = blogs.filter(pk__in=candidates)
+    blogs = blogs.filter(condition)
+    rank = backend.rank(tokens) if tokens else None
+    if ranked and rank is not None:
+        blogs = blogs.annotate(search_rank=rank).order_by(
+            '-search_rank', *Blog._meta.ordering
+        )
+    return blogs
+
+
+class SearchResults:
+    """The posts matching a keyword, from a cached list of their IDs
+
+    Paginator takes its length and slices it; a slice fetches only the posts
+    of that page by primary key, so neither the search nor a COUNT(*) runs.
+    """
+
+    def __init__(self, blogs, ids):
+        self.blogs = blogs
+        self.ids = ids
+        self.model = blogs.model
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1 or None][0]
+        ids = self.ids[index]
+        blogs = self.blogs.in_bulk(ids)
+        # A post deleted since the IDs were cached is skipped.
+        return [blogs[pk] for pk in ids if pk in blogs]
+
+
+def cached_results(blogs, keyword, ranked=False):
+    """Return SearchResults of filter_blogs(blogs, keyword, ranked)
+
+    The IDs are cached per normalized keyword, so blogs must be the whole
+    list of posts; it may defer fields or select related ones.
+    """
+    ids = search_cache.get_or_set(
+        keyword, ranked,
+        lambda: list(filter_blogs(blogs, keyword, ranked).values_list('pk', flat=True)),
+    )
+    return SearchResults(blogs, ids)
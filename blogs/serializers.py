@@ -1,17 +1,131 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
+from .instrumentation import timer
 from .models import Blog
 
+# Derived fields the list pages use; not part of the API
+DERIVED_FIELDS = ('excerpt', 'char_count', 'word_count')
 
-class BlogListSerializer(serializers.ModelSerializer):
+
+class TimedDataMixin:
+    """Count the time spent building .data towards the request's metrics"""
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class SparseFieldsetMixin:
+    """Keep only the fields listed in context['fields'] (from ?fields=)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class BlogListSerializer(TimedDataMixin, SparseFieldsetMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Blog
-        exclude = ('text',)
+        exclude = ('text', *DERIVED_FIELDS)
+        list_serializer_class = TimedListSerializer
 
 
-class BlogRetrieveSerializer(serializers.ModelSerializer):
+class BlogRetrieveSerializer(TimedDataMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Blog
-        fields = '__all__'
\ No newline at end of file
+        exclude = DERIVED_FIELDS
+        list_serializer_class = TimedListSerializer
+
+
+class FastModelSerializer:
+    """Read-only stand-in for a ModelSerializer that works on .values() rows
+
+    A ModelSerializer runs one Field object per attribute of every instance.
+    Rows from .values() are already plain Python values, so only datetimes
+    need converting and the output stays identical to model_serializer.
+    """
+    model_serializer = None
+    _field_kinds = None
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        fields = self.context.get('fields')
+        self.field_kinds = [
+            (name, kind, field) for name, kind, field in self.get_field_kinds()
+            if fields is None or name in fields
+        ]
+
+    @classmethod
+    def get_field_kinds(cls):
+        """Sort the fields of model_serializer by how their values are converted"""
+        if cls.__dict__.get('_field_kinds') is None:
+            kinds = []
+            for name, field in cls.model_serializer().fields.items():
+                if isinstance(field, serializers.DateTimeField) and (
+                    getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601
+                ):
+                    kinds.append((name, 'datetime', field))
+                elif isinstance(field, (serializers.CharField, serializers.IntegerField)):
+                    kinds.append((name, 'plain', field))
+                else:
+                    kinds.append((name, 'field', field))
+            cls._field_kinds = kinds
+        return cls._field_kinds
+
+    @classmethod
+    def get_field_names(cls, fields=None):
+        return [
+            name for name, kind, field in cls.get_field_kinds()
+            if fields is None or name in fields
+        ]
+
+    def format_datetime(self, value):
+        if self.timezone is not None:
+            value = value.astimezone(self.timezone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def to_representation(self, row):
+        ret = {}
+        for name, kind, field in self.field_kinds:
+            value = row[name]
+            if value is None or kind == 'plain':
+                ret[name] = value
+            elif kind == 'datetime':
+                ret[name] = self.format_datetime(value)
+            else:
+                ret[name] = field.to_representation(value)
+        return ret
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            if self.many:
+                return [self.to_representation(row) for row in self.instance]
+            return self.to_representation(self.instance)
+
+
+class FastBlogListSerializer(FastModelSerializer):
+    model_serializer = BlogListSerializer
+
+
+class FastBlogRetrieveSerializer(FastModelSerializer):
+    model_serializer = BlogRetrieveSerializer
@@ -0,0 +1,151 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import edge, search, tasks
+from .cache import invalidate_lists, render_cache, search_cache
+from .management.commands.build_static import discard_pages
+from .middleware import invalidate_pages
+from .models import Blog
+
+
+@receiver(post_save, sender=Blog)
+def index_blog(sender, instance, raw=False, **kwargs):
+    """Keep the search document in step with the post"""
+    if raw:
+        return
+    if settings.BLOGS_TASK_QUEUE:
+        tasks.enqueue('blogs.index_blog', instance.slug)
+        tasks.enqueue('blogs.render_blog', instance.slug)
+    else:
+        search.index_blog(instance)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def schedule_static_build(sender, raw=False, **kwargs):
+    """Rebuild the pre-rendered site once a burst of edits has settled"""
+    if not raw and settings.BLOGS_TASK_QUEUE and settings.BLOGS_STATIC_BUILD_DELAY:
+        tasks.enqueue('blogs.build_static', delay=settings.BLOGS_STATIC_BUILD_DELAY)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def discard_static_pages(sender, instance, raw=False, **kwargs):
+    """Stop nginx serving the pre-rendered pages the change made stale"""
+    if raw:
+        return
+    slugs = {instance.slug}
+    if getattr(instance, 'stored_slug', None):
+        slugs.add(instance.stored_slug)
+    schedule_discard(slugs)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_render_cache(sender, instance, **kwargs):
+    render_cache.invalidate(instance.slug)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_page_cache(sender, **kwargs):
+    invalidate_pages()
+
+
+@receiver(post_delete, sender=Blog)
+def invalidate_list_etags(sender, **kwargs):
+    # Saves move the newest updated_datetime, deletes do not.
+    invalidate_lists()
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_search_cache(sender, **kwargs):
+    search_cache.invalidate()
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def purge_edge_cache(sender, instance, raw=False, **kwargs):
+    if raw or not settings.BLOGS_EDGE_PURGER:
+        return
+    keys = [edge.post_key(instance.slug), edge.LIST_KEY, edge.position_key(instance)]
+    stored_slug = getattr(instance, 'stored_slug', None)
+    if stored_slug and stored_slug != instance.slug:
+        # Renamed: the pages under the old slug are still at the edge.
+        keys.append(edge.post_key(stored_slug))
+    schedule_purge(keys)
+
+
+def schedule_purge(keys):
+    """Purge keys from the edge once the current transaction commits
+
+    Purging earlier would let the edge fetch the old page again. The keys
+    of one transaction, e.g. an admin deleting many posts, are purged
+    together. With BLOGS_TASK_QUEUE a worker purges instead, one task per
+    key, so that a burst of saves purges each key once.
+    """
+    if not settings.BLOGS_EDGE_PURGER:
+        return
+    if settings.BLOGS_TASK_QUEUE:
+        for key in keys:
+            tasks.enqueue('blogs.purge_edge', key)
+        return
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'blogs_pending_purge', None)
+    if pending is not None and any(func is pending for sids, func in connection.run_on_commit):
+        pending.keys.update(dict.fromkeys(keys))
+        return
+    # None waits for this transaction: the last one committed or rolled back.
+    pending = connection.blogs_pending_purge = PendingPurge(keys)
+    transaction.on_commit(pending)
+
+
+class PendingPurge:
+    """on_commit callback purging the keys its transaction scheduled"""
+
+    def __init__(self, keys):
+        self.keys = dict.fromkeys(keys)
+
+    def __call__(self):
+        edge.get_purger().purge(list(self.keys))
+
+
+def schedule_discard(slugs):
+    # After the commit, or a build running meanwhile could render the old data.
+    transaction.on_commit(lambda: discard_pages(settings.BLOGS_STATIC_BUILD_ROOT, slugs))
+
+
+def changed_in_bulk(slugs=()):
+    """Do for posts changed by bulk writes what the receivers above do
+
+    Bulk writes send no signals. They must move updated_datetime, which
+    versions the rendered posts and the ETags, and leave the text, which
+    the search index follows, alone. slugs are those of the changed posts,
+    whose list pages past BLOGS_EDGE_PURGE_PAGES are left to expire.
+    """
+    invalidate_pages()
+    invalidate_lists()
+    search_cache.invalidate()
+    schedule_purge([edge.post_key(slug) for slug in slugs] + [edge.LIST_KEY])
+    schedule_discard(slugs)
+    if settings.BLOGS_TASK_QUEUE and settings.BLOGS_STATIC_BUILD_DELAY:
+        tasks.enqueue('blogs.build_static', delay=settings.BLOGS_STATIC_BUILD_DELAY)
+
+
+@receiver(request_started)
+def check_persistent_connections(sender, **kwargs):
+    """Reopen persistent connections that the server closed meanwhile"""
+    if not settings.BLOGS_DB_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict['CONN_MAX_AGE'] != 0
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
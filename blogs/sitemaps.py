@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger
+from django.db.models import Max
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+from .models import Blog
+
+
+class KeyRangePaginator:
+    """Pages of the rows whose primary keys fall in fixed ranges
+
+    Page n holds the keys from (n - 1) * per_page + 1 to n * per_page, so an
+    edit or a deletion changes the page of that post only and new posts the
+    last page only. Deleted rows leave a page short instead of shifting the
+    pages after it.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    @cached_property
+    def num_pages(self):
+        max_pk = self.object_list.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+        return max(1, -(-max_pk // self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1 or number > self.num_pages:
+            raise EmptyPage('That page contains no results')
+        return number
+
+    def key_range(self, number):
+        return (number - 1) * self.per_page + 1, number * self.per_page
+
+    def page(self, number):
+        number = self.validate_number(number)
+        return Page(self.object_list.filter(pk__range=self.key_range(number)), number, self)
+
+
+class BlogSitemap(Sitemap):
+    """Every post, BLOGS_SITEMAP_LIMIT primary keys per sitemap file"""
+
+    def items(self):
+        return Blog.objects.order_by('pk').values('slug', 'updated_datetime')
+
+    def location(self, item):
+        return reverse('blogs:detail', args=[item['slug']])
+
+    def lastmod(self, item):
+        return item['updated_datetime']
+
+    @property
+    def paginator(self):
+        return KeyRangePaginator(self.items(), settings.BLOGS_SITEMAP_LIMIT)
+
+
+sitemaps = {'blogs': BlogSitemap}
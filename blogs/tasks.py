@@ -0,0 +1,140 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import edge, search
+from .cache import search_cache
+from .middleware import invalidate_pages
+from .models import Blog, Task
+from .views import render_text
+
+logger = logging.getLogger(__name__)
+
+# Retry delays double from BLOGS_TASK_RETRY_DELAY up to this many seconds
+MAX_RETRY_DELAY = 3600
+
+registry = {}
+
+
+def task(name):
+    """Register a function of one key (a slug, or '') as the task name"""
+    def register(function):
+        registry[name] = function
+        return function
+    return register
+
+
+def enqueue(name, key='', delay=0):
+    """Queue the task name for key in delay seconds, unless one is waiting
+
+    A waiting task keeps its time, so a burst of saves runs it once, delay
+    seconds after the first of them. Call it inside the transaction of the
+    change: the task is only visible to workers once that commits.
+    """
+    if name not in registry:
+        raise ValueError('Unknown task %r' % name)
+    queued, created = Task.objects.get_or_create(
+        name=name, key=key, status=Task.PENDING,
+        defaults={'run_at': timezone.now() + timedelta(seconds=delay)},
+    )
+    return queued
+
+
+def retry_delay(attempts):
+    return min(settings.BLOGS_TASK_RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+class Worker:
+    """Claim due tasks and run them, retrying failures with backoff
+
+    Claims are conditional UPDATEs, so several workers (or processes) can
+    share the queue on any database. A task whose worker died is claimed
+    again once BLOGS_TASK_LOCK_TIMEOUT has passed.
+    """
+
+    def __init__(self, batch_size=10):
+        self.batch_size = batch_size
+
+    def claim(self):
+        now = timezone.now()
+        due = Task.objects.filter(
+            Q(status=Task.PENDING, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+        ).order_by('run_at').values_list('pk', 'status', 'attempts')[:self.batch_size]
+        locked_until = now + timedelta(seconds=settings.BLOGS_TASK_LOCK_TIMEOUT)
+        claimed = []
+        for pk, status, attempts in due:
+            updated = Task.objects.filter(pk=pk, status=status, attempts=attempts).update(
+                status=Task.RUNNING, attempts=F('attempts') + 1, locked_until=locked_until,
+            )
+            if updated:
+                claimed.append(pk)
+        return list(Task.objects.filter(pk__in=claimed).order_by('run_at'))
+
+    def run_pending(self):
+        """Run one batch of due tasks and return how many ran"""
+        tasks = self.claim()
+        for task in tasks:
+            self.run(task)
+        return len(tasks)
+
+    def run(self, task):
+        try:
+            registry[task.name](task.key)
+        except Exception:
+            self.failed(task, traceback.format_exc())
+        else:
+            task.delete()
+
+    def failed(self, task, error):
+        logger.warning('Task %s failed (attempt %d)\n%s', task, task.attempts, error)
+        task.last_error = error
+        task.locked_until = None
+        if task.attempts >= settings.BLOGS_TASK_MAX_ATTEMPTS:
+            task.status = Task.FAILED
+            task.save()
+            return
+        task.status = Task.PENDING
+        task.run_at = timezone.now() + timedelta(seconds=retry_delay(task.attempts))
+        try:
+            with transaction.atomic():
+                task.save()
+        except IntegrityError:
+            # The same work was queued again meanwhile and will run instead.
+            task.delete()
+
+
+@task('blogs.index_blog')
+def index_blog(slug):
+    blog = Blog.objects.filter(slug=slug).first()
+    if blog is None:
+        return
+    search.index_blog(blog)
+    # Searches cached since the save did not see the new document.
+    search_cache.invalidate()
+    invalidate_pages()
+
+
+@task('blogs.render_blog')
+def render_blog(slug):
+    """Render the post ahead of its first visitor"""
+    blog = Blog.objects.filter(slug=slug).first()
+    if blog is not None:
+        render_text(blog)
+
+
+@task('blogs.build_static')
+def build_static(key):
+    call_command('build_static')
+
+
+@task('blogs.purge_edge')
+def purge_edge(key):
+    purger = edge.get_purger()
+    if purger is not None:
+        purger.purge([key])
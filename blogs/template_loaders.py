@@ -0,0 +1,97 @@
+import os
+import re
+
+from django.conf import settings
+from django.template import Origin, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders import cached
+from django.template.loaders.base import Loader
+
+NEWLINE_SPACE_RE = re.compile(r'\s*\n\s*')
+PRESERVE_RE = re.compile(r'<(pre|textarea)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+
+def minify(source):
+    """Collapse every run of whitespace holding a newline into one newline
+
+    This drops indentation and blank lines. Browsers render the result
+    identically, except inside <pre> and <textarea>, which are kept as
+    they are. Multi-line {% blocktrans %} would no longer match its catalog
+    entry, so minified templates must not use it.
+    """
+    parts = []
+    position = 0
+    for match in PRESERVE_RE.finditer(source):
+        parts.append(NEWLINE_SPACE_RE.sub('\n', source[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(NEWLINE_SPACE_RE.sub('\n', source[position:]))
+    return ''.join(parts)
+
+
+class MinifyingOrigin(Origin):
+
+    def __init__(self, origin, loader):
+        super().__init__(origin.name, origin.template_name, loader)
+        self.source_loader = origin.loader
+
+
+class MinifyingLoader(Loader):
+    """Minify the templates found by other loaders when they are compiled
+
+    Wrapped in the cached loader, each template is minified once per process
+    and requests pay nothing. Only templates whose name starts with one of
+    BLOGS_MINIFY_TEMPLATE_PREFIXES are changed.
+    """
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            for origin in loader.get_template_sources(template_name):
+                yield MinifyingOrigin(origin, self)
+
+    def get_contents(self, origin):
+        contents = origin.source_loader.get_contents(origin)
+        if origin.template_name.startswith(tuple(settings.BLOGS_MINIFY_TEMPLATE_PREFIXES)):
+            contents = minify(contents)
+        return contents
+
+    def reset(self):
+        for loader in self.loaders:
+            loader.reset()
+
+
+def loader_dirs(loaders):
+    for loader in loaders:
+        if hasattr(loader, 'loaders'):
+            yield from loader_dirs(loader.loaders)
+        elif hasattr(loader, 'get_dirs'):
+            yield from loader.get_dirs()
+
+
+def warm_up(prefixes=None):
+    """Compile the templates under prefixes into the cached loaders
+
+    Called when a worker starts (config/wsgi.py, config/asgi.py) so that its
+    first requests do not pay for loading and compiling. Returns the names
+    compiled; does nothing for engines without the cached loader.
+    """
+    prefixes = tuple(settings.BLOGS_WARM_TEMPLATE_PREFIXES if prefixes is None else prefixes)
+    names = []
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        if not any(isinstance(loader, cached.Loader) for loader in engine.template_loaders):
+            continue
+        for directory in loader_dirs(engine.template_loaders):
+            for root, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    name = os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+                    if name.startswith(prefixes) and name not in names:
+                        engine.get_template(name)
+                        names.append(name)
+    return names
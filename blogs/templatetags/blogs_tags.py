@@ -1,11 +1,29 @@
+from urllib.parse import urlencode
+
 from django import template
 
 register = template.Library()
 
 
+@register.simple_tag(takes_context=True)
+def url_replace(context, request, field, value):
+    """Replace GET parameters to display the page number
+
+    The other parameters are encoded once per render of the template, not
+    once per link.
+    """
+    bases = context.render_context.setdefault('url_replace', {})
+    if field not in bases:
+        query = request.GET.copy()
+        query.pop(field, None)
+        bases[field] = query.urlencode() + '&' if query else ''
+    return bases[field] + urlencode({field: value})
+
+
 @register.simple_tag
-def url_replace(request, field, value):
-    """Replace GET parameters to display the page number"""
-    url_dict = request.GET.copy()
-    url_dict[field] = value
-    return url_dict.urlencode()
\ No newline at end of file
+def elided_page_range(page):
+    """Page numbers to link from page, e.g. {% elided_page_range page_obj as pages %}"""
+    paginator = page.paginator
+    if not hasattr(paginator, 'get_elided_page_range'):
+        return paginator.page_range
+    return paginator.get_elided_page_range(page.number)
@@ -1,26 +1,63 @@
-import factory
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.core.paginator import EmptyPage
+from django.core.signals import request_finished
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.template import Context, Template, engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from . import benchmarks, compression, edge, instrumentation, routers, search, tasks, urls
+from .asgi import ASGIHandler
+from .cache import LIST_GENERATION_KEY, render_cache
+from .cache_backends import LocalRedis, RedisCache
+from .db import pool
+from .db.pool import ConnectionPool, PoolTimeout
+from .factories import BlogFactory
 from .forms import BlogSearchForm
-from .models import Blog
+from .middleware import AnonymousPageCacheMiddleware, RepeatedQueryMiddleware
+from .models import Author, Blog, BlogSearchDocument, Task
+from .pagination import ELLIPSIS, WindowedPaginator, elided_page_range
+from .profiling import profile_templates
+from .queries import RepeatedQueries, detect_repeated_queries, normalize_sql, query_budget
+from .template_loaders import minify, warm_up
 
 
 # Create your tests here.
 
-class BlogFactory(factory.django.DjangoModelFactory):
-    """Create data for the Blog model used for tests"""
-    title = 'Example blog'
-    slug = 'example-blog'
-    text = 'This is an example blog.'
-    created_datetime = timezone.now()
-    updated_datetime = timezone.now()
+# Tests for the models
+
+class BlogTests(TestCase):
+
+    def test_text_fields(self):
+        blog = BlogFactory(text='あ' * 150)
+        self.assertEqual(blog.excerpt, 'あ' * 99 + '…')
+        self.assertEqual(blog.char_count, 150)
+        self.assertEqual(blog.word_count, 1)
 
-    class Meta:
-        model = Blog
+    def test_text_fields_with_update_fields(self):
+        blog = BlogFactory(text='Short text')
+        blog.text = 'Three words here'
+        blog.save(update_fields=['text'])
+        blog.refresh_from_db()
+        self.assertEqual(blog.excerpt, 'Three words here')
+        self.assertEqual(blog.word_count, 3)
 
 
 # Tests for the forms
@@ -60,6 +97,650 @@ class BlogSearchFormTests(TestCase):
         self.assertEqual(Blog.objects.count(), 2)
         self.assertEqual(blogs.count(), 2)
 
+    def test_normalize_keyword(self):
+        form = BlogSearchForm({'keyword': '  ＤＪａｎｇｏ　 Blog '})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['keyword'], 'django blog')
+
+
+# Tests for the search index
+
+class SearchTests(TestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('ブログ'), ['ブロ', 'ログ'])
+        self.assertEqual(search.tokenize('ＤＪango 記事'), ['dj', 'ja', 'an', 'ng', 'go', '記事'])
+        self.assertEqual(search.tokenize('a'), [])
+
+    def test_document_follows_blog(self):
+        blog = BlogFactory(title='最初の記事', text='本文')
+        self.assertEqual(blog.search_document.title_tokens, '最初 初の の記 記事')
+        blog.text = '新しい本文'
+        blog.save()
+        self.assertEqual(BlogSearchDocument.objects.get(pk=blog.pk).text_tokens, '新し しい い本 本文')
+        blog.delete()
+        self.assertEqual(BlogSearchDocument.objects.count(), 0)
+
+    def test_filter_japanese_blogs(self):
+        blog_1 = BlogFactory(title='Django入門', slug='blog-1', text='ブログを作ります。')
+        blog_2 = BlogFactory(title='日記', slug='blog-2', text='ログを見る')
+        blog_3 = BlogFactory(title='ブログの話', slug='blog-3', text='')
+        blogs = search.filter_blogs(Blog.objects.all(), 'ブログ')
+        self.assertQuerysetEqual(blogs, ['<Blog: ブログの話>', '<Blog: Django入門>'])
+
+    def test_rank_title_matches_first(self):
+        blog_1 = BlogFactory(title='ブログの話', slug='blog-1', text='')
+        blog_2 = BlogFactory(title='日記', slug='blog-2', text='ブログの本文')
+        blogs = search.filter_blogs(Blog.objects.all(), 'ブログ', ranked=True)
+        self.assertQuerysetEqual(blogs, ['<Blog: ブログの話>', '<Blog: 日記>'])
+
+    def test_single_character_keyword(self):
+        blog = BlogFactory(title='犬', text='')
+        self.assertEqual(search.filter_blogs(Blog.objects.all(), '犬').count(), 1)
+
+    def test_width_and_case_do_not_matter(self):
+        php = BlogFactory(title='ＰＨＰ入門', slug='php', text='')
+        kana = BlogFactory(title='ｶﾀｶﾅ', slug='kana', text='')
+        street = BlogFactory(title='Straße', slug='street', text='Ärger')
+        for keyword, blog in (
+            ('ＰＨＰ', php), ('PHP', php), ('php', php), ('カタカナ', kana),
+            ('STRASSE', street), ('ärger', street),
+        ):
+            self.assertEqual(list(search.filter_blogs(Blog.objects.all(), keyword)), [blog], keyword)
+
+    @override_settings(BLOGS_SEARCH_BACKEND='icontains')
+    def test_icontains_backend(self):
+        blog = BlogFactory(title='ブログ', text='')
+        Blog.objects.update(title='ブログの話')
+        self.assertEqual(search.filter_blogs(Blog.objects.all(), '話').count(), 1)
+        self.assertEqual(search.filter_blogs(Blog.objects.all(), 'の話').count(), 1)
+
+    @override_settings(BLOGS_SEARCH_BACKEND='sqlite')
+    def test_index_is_not_bypassed(self):
+        BlogFactory(title='ブログ', text='')
+        Blog.objects.update(title='ブログの話')
+        blogs = search.filter_blogs(Blog.objects.all(), 'の話')
+        self.assertNotIn('"blogs_blog"."title" LIKE', str(blogs.query))
+        self.assertEqual(blogs.count(), 0)
+
+
+@override_settings(BLOGS_SEARCH_CACHE_TIMEOUT=60)
+class SearchResultCacheTests(TestCase):
+
+    def setUp(self):
+        caches['blogs'].clear()
+        for number in range(15):
+            BlogFactory(title='Blog %d' % number, slug='blog-%d' % number)
+
+    def test_pages_share_cached_ids(self):
+        url = reverse('blogs:index')
+        # ETag aggregate, matching IDs, posts of the page
+        with self.assertNumQueries(3):
+            res = self.client.get(url, data={'keyword': 'BLOG'})
+        self.assertEqual(res.context['paginator'].count, 15)
+        self.assertEqual(res.context['blog_list'][0].title, 'Blog 14')
+        # Width, case and spacing variants hit the same entry.
+        with self.assertNumQueries(2):
+            res = self.client.get(url, data={'keyword': ' ｂｌｏｇ ', 'page': 2})
+        self.assertEqual([blog.title for blog in res.context['blog_list']], [
+            'Blog 4', 'Blog 3', 'Blog 2', 'Blog 1', 'Blog 0',
+        ])
+
+    def test_write_invalidates(self):
+        url = reverse('blogs:index')
+        self.client.get(url, data={'keyword': 'blog'})
+        Blog.objects.get(slug='blog-3').delete()
+        res = self.client.get(url, data={'keyword': 'blog', 'page': 2})
+        self.assertEqual(res.context['paginator'].count, 14)
+        BlogFactory(title='Another blog', slug='another-blog')
+        res = self.client.get(url, data={'keyword': 'blog'})
+        self.assertEqual(res.context['blog_list'][0].title, 'Another blog')
+
+
+# Tests for the database router
+
+class ReplicaPoolTests(SimpleTestCase):
+
+    def make_pool(self, weights, healthy):
+        now = [0]
+        pool = routers.ReplicaPool(weights, clock=lambda: now[0])
+        pool.check = lambda alias: healthy[alias]
+        return pool, now
+
+    def test_weighted_round_robin(self):
+        pool, now = self.make_pool({'replica_a': 2, 'replica_b': 1}, {'replica_a': True, 'replica_b': True})
+        self.assertEqual(
+            [pool.choose() for _ in range(6)],
+            ['replica_a', 'replica_b', 'replica_a', 'replica_a', 'replica_b', 'replica_a'],
+        )
+
+    @override_settings(BLOGS_REPLICA_CHECK_INTERVAL=10)
+    def test_unhealthy_replica_is_skipped(self):
+        healthy = {'replica_a': False, 'replica_b': True}
+        pool, now = self.make_pool({'replica_a': 1, 'replica_b': 1}, healthy)
+        self.assertEqual({pool.choose() for _ in range(4)}, {'replica_b'})
+        healthy['replica_a'] = True
+        self.assertEqual({pool.choose() for _ in range(4)}, {'replica_b'})
+        now[0] = 10
+        self.assertEqual({pool.choose() for _ in range(4)}, {'replica_a', 'replica_b'})
+        healthy['replica_b'] = False
+        now[0] = 20
+        self.assertEqual(pool.choose(), 'replica_a')
+        healthy['replica_a'] = False
+        now[0] = 30
+        self.assertIsNone(pool.choose())
+
+
+REPLICAS = {'replica_a': 1, 'replica_b': 1}
+
+
+@override_settings(BLOGS_DATABASE_REPLICAS=REPLICAS, DATABASE_ROUTERS=['blogs.routers.ReplicaRouter'])
+class ReplicaRouterTests(TransactionTestCase):
+    """SQLite files refreshed by sync_replicas stand in for the replicas"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        for alias in REPLICAS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(self.directory.name, alias + '.sqlite3'),
+            }
+
+    def tearDown(self):
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        self.directory.cleanup()
+
+    def test_reads_go_to_replicas(self):
+        blog = BlogFactory(slug='synced-blog')
+        call_command('sync_replicas', stdout=StringIO())
+        BlogFactory(slug='unsynced-blog')
+        with routers.pinning():
+            self.assertEqual(Blog.objects.count(), 1)
+            self.assertEqual(
+                {Blog.objects.get(slug='synced-blog')._state.db for _ in range(4)}, set(REPLICAS),
+            )
+            # Users are read from the primary, and so is everything in a transaction.
+            self.assertEqual(Author.objects.db, 'default')
+            with transaction.atomic():
+                self.assertEqual(Blog.objects.count(), 2)
+            # A write pins the rest of the request to the primary.
+            blog = Blog.objects.get(slug='synced-blog')
+            blog.title = 'Updated'
+            blog.save()
+            self.assertEqual(Blog.objects.count(), 2)
+
+    def test_pin_cookie(self):
+        blog = BlogFactory(slug='synced-blog')
+        call_command('sync_replicas', stdout=StringIO())
+        BlogFactory(slug='unsynced-blog')
+        with self.modify_settings(MIDDLEWARE={'append': 'blogs.middleware.ReplicaPinningMiddleware'}):
+            res = self.client.get(reverse('blogs:api_index'), HTTP_ACCEPT='application/json')
+            self.assertEqual(res.json()['count'], 1)
+            self.assertNotIn('blogs_primary', res.cookies)
+            self.client.cookies['blogs_primary'] = '1'
+            res = self.client.get(reverse('blogs:api_index'), HTTP_ACCEPT='application/json')
+            self.assertEqual(res.json()['count'], 2)
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.pool = ConnectionPool(max_size=2, idle_timeout=60, timeout=0, clock=lambda: self.now)
+
+    def test_reuse_and_limit(self):
+        connection_1 = self.pool.acquire(FakeConnection, lambda connection: True)
+        connection_2 = self.pool.acquire(FakeConnection, lambda connection: True)
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire(FakeConnection, lambda connection: True)
+        self.pool.release(connection_1)
+        self.assertIs(self.pool.acquire(FakeConnection, lambda connection: True), connection_1)
+        self.assertEqual(self.pool.stats['created'], 2)
+        self.assertEqual(self.pool.stats['reused'], 1)
+        self.assertEqual(self.pool.stats['timeouts'], 1)
+
+    def test_broken_and_idle_connections_are_closed(self):
+        connection_1 = self.pool.acquire(FakeConnection, lambda connection: True)
+        self.pool.release(connection_1)
+        connection_2 = self.pool.acquire(FakeConnection, lambda connection: False)
+        self.assertTrue(connection_1.closed)
+        self.pool.release(connection_2)
+        self.now = 60
+        connection_3 = self.pool.acquire(FakeConnection, lambda connection: True)
+        self.assertTrue(connection_2.closed)
+        self.assertIsNot(connection_3, connection_2)
+        self.assertEqual(self.pool.size, 1)
+        self.assertIn('blogs_db_pool_connections', pool.render_metrics())
+
+
+class PooledBackendTests(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        connections.databases['pooled'] = {
+            'ENGINE': 'blogs.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory.name, 'pooled.sqlite3'),
+            'POOL': {'MAX_SIZE': 1},
+        }
+
+    def tearDown(self):
+        connections['pooled'].close()
+        pool._pools.pop(connections['pooled'].pool_key).close_idle()
+        del connections['pooled']
+        del connections.databases['pooled']
+        self.directory.cleanup()
+
+    def test_connections_return_to_the_pool(self):
+        connection = connections['pooled']
+        connection.ensure_connection()
+        raw = connection.connection
+        # The end of a request closes connections with CONN_MAX_AGE = 0.
+        request_finished.send(sender=self.__class__)
+        self.assertIsNone(connection.connection)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(connection.connection, raw)
+        self.assertEqual(connection.pool.stats['created'], 1)
+        self.assertEqual(connection.pool.stats['reused'], 1)
+
+    def test_other_databases_bypass_the_pool(self):
+        connection = connections['pooled']
+        connection.ensure_connection()
+        connection.close()
+        # As create_test_db() does
+        connection.settings_dict['NAME'] = os.path.join(self.directory.name, 'other.sqlite3')
+        connection.ensure_connection()
+        self.assertIsNone(connection.pool)
+        self.assertIsNone(connection.connection_pool)
+        connection.close()
+        self.assertEqual(len(pool._pools[connection.pool_key].idle), 1)
+        self.assertEqual(pool._pools[connection.pool_key].stats['reused'], 0)
+
+
+# Tests for the admin
+
+class BlogAdminTests(TestCase):
+
+    def setUp(self):
+        user = Author.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        self.url = reverse('admin:blogs_blog_changelist')
+
+    def test_changelist_without_text(self):
+        BlogFactory(title='管理画面', text='本文は読まない')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(self.url)
+        self.assertContains(res, '管理画面')
+        self.assertFalse(any('"blogs_blog"."text"' in query['sql'] for query in queries))
+        # One COUNT(*) for the paginator, none for the full result count
+        self.assertEqual(sum('COUNT(*)' in query['sql'] for query in queries), 1)
+
+    def test_change_view_loads_whole_row(self):
+        blog = BlogFactory(title='管理画面', text='本文')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('admin:blogs_blog_change', args=[blog.pk]))
+        self.assertContains(res, '本文')
+        self.assertEqual(sum('FROM "blogs_blog"' in query['sql'] for query in queries), 1)
+
+    def test_search_uses_index(self):
+        BlogFactory(title='全文検索', slug='search-blog')
+        BlogFactory(title='別の記事', slug='other-blog')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(self.url, {'q': '全文'})
+        self.assertContains(res, '全文検索')
+        self.assertNotContains(res, '別の記事')
+        self.assertTrue(any(search.FTS_TABLE in query['sql'] for query in queries))
+
+    def test_search_ignores_width_and_case(self):
+        BlogFactory(title='ＰＨＰ入門', slug='php-blog')
+        self.assertContains(self.client.get(self.url, {'q': 'php'}), 'ＰＨＰ入門')
+
+    def test_date_hierarchy(self):
+        blog = BlogFactory()
+        res = self.client.get(self.url, {'created_datetime__year': blog.created_datetime.year})
+        self.assertContains(res, blog.title)
+
+    def test_touch_action(self):
+        blogs = [BlogFactory(slug='blog-%d' % number) for number in range(3)]
+        before = blogs[0].updated_datetime
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(self.url, {
+                'action': 'touch', '_selected_action': [blog.pk for blog in blogs[:2]],
+            })
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "blogs_blog"') for query in queries), 1)
+        self.assertGreater(Blog.objects.get(pk=blogs[0].pk).updated_datetime, before)
+        self.assertEqual(Blog.objects.get(pk=blogs[2].pk).updated_datetime, blogs[2].updated_datetime)
+
+    def test_refresh_text_fields_action(self):
+        blog = BlogFactory(text='古い本文')
+        Blog.objects.filter(pk=blog.pk).update(text='新しい 本文', excerpt='', word_count=0)
+        self.client.post(self.url, {'action': 'refresh_text_fields', '_selected_action': [blog.pk]})
+        blog.refresh_from_db()
+        self.assertEqual((blog.excerpt, blog.word_count), ('新しい 本文', 2))
+
+
+# Tests for the task queue
+
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        tasks.registry['tests.record'] = self.calls.append
+
+    def tearDown(self):
+        del tasks.registry['tests.record']
+        tasks.registry.pop('tests.fail', None)
+
+    def test_enqueue_deduplicates_per_key(self):
+        first = tasks.enqueue('tests.record', 'blog-1')
+        self.assertEqual(tasks.enqueue('tests.record', 'blog-1'), first)
+        tasks.enqueue('tests.record', 'blog-2')
+        self.assertEqual(Task.objects.count(), 2)
+        with self.assertRaises(ValueError):
+            tasks.enqueue('tests.unknown')
+
+    def test_worker_runs_due_tasks(self):
+        tasks.enqueue('tests.record', 'blog-1')
+        tasks.enqueue('tests.record', 'blog-2', delay=60)
+        self.assertEqual(tasks.Worker().run_pending(), 1)
+        self.assertEqual(self.calls, ['blog-1'])
+        self.assertEqual(list(Task.objects.values_list('key', flat=True)), ['blog-2'])
+
+    def test_enqueue_while_running(self):
+        tasks.enqueue('tests.record', 'blog-1')
+        running = tasks.Worker().claim()[0]
+        self.assertEqual(running.status, Task.RUNNING)
+        self.assertNotEqual(tasks.enqueue('tests.record', 'blog-1'), running)
+
+    @override_settings(BLOGS_TASK_RETRY_DELAY=10, BLOGS_TASK_MAX_ATTEMPTS=2)
+    def test_retry_with_backoff(self):
+        def fail(key):
+            raise RuntimeError('unavailable')
+        tasks.registry['tests.fail'] = fail
+        queued = tasks.enqueue('tests.fail', 'blog-1')
+        with self.assertLogs('blogs.tasks', 'WARNING'):
+            tasks.Worker().run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.PENDING, 1))
+        self.assertIn('RuntimeError: unavailable', queued.last_error)
+        self.assertGreater(queued.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(tasks.Worker().run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('blogs.tasks', 'WARNING'):
+            tasks.Worker().run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.FAILED, 2))
+        self.assertEqual(tasks.retry_delay(3), 40)
+
+    def test_reclaim_expired_lock(self):
+        tasks.enqueue('tests.record', 'blog-1')
+        tasks.Worker().claim()
+        self.assertEqual(tasks.Worker().run_pending(), 0)
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(tasks.Worker().run_pending(), 1)
+        self.assertEqual(self.calls, ['blog-1'])
+
+    @override_settings(BLOGS_TASK_QUEUE=True, BLOGS_STATIC_BUILD_DELAY=30)
+    def test_saves_are_coalesced(self):
+        blog = BlogFactory(slug='queued-blog', title='キュー')
+        for number in range(100):
+            blog.text = 'edit %d' % number
+            blog.save()
+        self.assertEqual(
+            sorted(Task.objects.values_list('name', 'key')),
+            [('blogs.build_static', ''), ('blogs.index_blog', 'queued-blog'), ('blogs.render_blog', 'queued-blog')],
+        )
+        self.assertFalse(BlogSearchDocument.objects.exists())
+        self.assertEqual(tasks.Worker().run_pending(), 2)
+        self.assertEqual(list(search.filter_blogs(Blog.objects.all(), 'キュー')), [blog])
+        self.assertEqual(Task.objects.get().name, 'blogs.build_static')
+
+
+# Tests for the management commands
+
+class ImportExportTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_import_jsonl(self):
+        blog = BlogFactory(title='Old title', slug='first-blog')
+        path = self.write_file('blogs.jsonl', '\n'.join([
+            json.dumps({'title': 'First blog', 'slug': 'first-blog', 'text': '更新した本文'}),
+            json.dumps({'title': 'Second blog', 'slug': 'second-blog', 'text': '新しい記事',
+                        'created_datetime': '2020-01-01T09:00:00+09:00'}),
+        ]))
+        out = StringIO()
+        call_command('import_blogs', path, batch_size=1, stdout=out)
+        self.assertIn('Created 1, updated 1, skipped 0 posts', out.getvalue())
+        self.assertEqual(Blog.objects.get(slug='first-blog').title, 'First blog')
+        second = Blog.objects.get(slug='second-blog')
+        self.assertEqual(second.created_datetime.year, 2020)
+        self.assertEqual(second.excerpt, '新しい記事')
+        self.assertEqual(search.filter_blogs(Blog.objects.all(), '本文').get(), Blog.objects.get(slug='first-blog'))
+
+    @override_settings(BLOGS_EDGE_PURGER='blogs.edge.LocalPurger', BLOGS_TASK_QUEUE=True)
+    def test_import_purges_updated_posts(self):
+        blog = BlogFactory(title='Old title', slug='first-blog')
+        Task.objects.all().delete()
+        path = self.write_file('blogs.jsonl', json.dumps({'title': 'First blog', 'slug': 'first-blog'}))
+        call_command('import_blogs', path, stdout=StringIO())
+        self.assertEqual(
+            set(Task.objects.filter(name='blogs.purge_edge').values_list('key', flat=True)),
+            {'post-first-blog', 'list'},
+        )
+
+    def test_import_csv_skip_conflicts(self):
+        blog = BlogFactory(title='Old title', slug='first-blog')
+        path = self.write_file('blogs.csv', 'title,slug,text\nFirst blog,first-blog,"Two\nlines"\n')
+        call_command('import_blogs', path, on_conflict='skip', stdout=StringIO())
+        self.assertEqual(Blog.objects.get(slug='first-blog').title, 'Old title')
+        with self.assertRaises(CommandError):
+            call_command('import_blogs', path, on_conflict='error', stdout=StringIO())
+
+    def test_import_invalid_slug(self):
+        path = self.write_file('blogs.jsonl', json.dumps({'title': 'Blog', 'slug': 'not a slug'}))
+        with self.assertRaisesMessage(CommandError, 'Line 1: invalid slug'):
+            call_command('import_blogs', path, stdout=StringIO())
+
+    def test_import_invalid_records(self):
+        for line, message in (
+            (json.dumps({'title': 'Blog', 'slug': 'a' * 51}), 'Line 2: slug: '),
+            (json.dumps({'title': 'B' * 151, 'slug': 'blog'}), 'Line 2: title: '),
+            (json.dumps(['Blog', 'blog']), 'Line 2: expected a JSON object'),
+        ):
+            path = self.write_file('blogs.jsonl', json.dumps({'title': 'First', 'slug': 'first'}) + '\n' + line)
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('import_blogs', path, stdout=StringIO())
+        self.assertFalse(Blog.objects.exists())
+
+    def test_export_roundtrip(self):
+        blog_1 = BlogFactory(title='First blog', slug='first-blog', text='本文\n二行目')
+        blog_2 = BlogFactory(title='Second blog', slug='second-blog')
+        for name in ('blogs.jsonl', 'blogs.csv'):
+            path = os.path.join(self.directory.name, name)
+            call_command('export_blogs', output=path, stderr=StringIO())
+            Blog.objects.all().delete()
+            call_command('import_blogs', path, stdout=StringIO())
+            self.assertEqual(
+                list(Blog.objects.order_by('slug').values_list('slug', 'text', 'created_datetime')),
+                [('first-blog', '本文\n二行目', blog_1.created_datetime),
+                 ('second-blog', blog_2.text, blog_2.created_datetime)],
+            )
+
+
+class BenchmarkTests(TestCase):
+
+    def test_run_scenario(self):
+        blog = BlogFactory()
+        result = benchmarks.run_scenario(
+            benchmarks.ClientHarness(), [(reverse('blogs:detail', args=[blog.slug]), {}, {})], 5,
+        )
+        self.assertEqual(set(result), {'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries'})
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(result['queries'], 0)
+
+    def test_compare(self):
+        baseline = {'wsgi:index': {'p50_ms': 10, 'p95_ms': 20, 'queries': 3}}
+        self.assertEqual(benchmarks.compare(
+            {'wsgi:index': {'p50_ms': 11, 'p95_ms': 23, 'queries': 3}}, baseline, 0.2,
+        ), [])
+        regressions = benchmarks.compare(
+            {'wsgi:index': {'p50_ms': 11, 'p95_ms': 30, 'queries': 4}}, baseline, 0.2,
+        )
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('p95_ms', regressions[0])
+        self.assertIn('4 queries > 3', regressions[1])
+
+
+class BuildStaticTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, **options):
+        out = StringIO()
+        call_command('build_static', output=self.root, workers=0, stdout=out, **options)
+        return out.getvalue()
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), 'rb') as f:
+            return f.read()
+
+    def test_build(self):
+        blog = BlogFactory(title='Static blog', slug='static-blog')
+        self.assertIn('Rendered 4 pages', self.build())
+        self.assertIn('Static blog', self.read('static-blog/index.html').decode())
+        self.assertEqual(gzip.decompress(self.read('static-blog/index.html.gz')), self.read('static-blog/index.html'))
+        self.assertEqual(json.loads(self.read('api/posts/static-blog/index.json'))['title'], 'Static blog')
+        self.assertEqual(json.loads(self.read('api/posts/page/1/index.json'))['count'], 1)
+        self.assertIn('Static blog', self.read('page/1/index.html').decode())
+
+    def test_incremental_build(self):
+        blog_1 = BlogFactory(slug='blog-1')
+        blog_2 = BlogFactory(slug='blog-2')
+        self.build()
+        self.assertIn('Rendered 0 pages', self.build())
+        blog_1.title = 'Updated blog'
+        blog_1.save()
+        # Its detail page and API snapshot, then the two list pages
+        self.assertIn('Rendered 4 pages (1 changed posts, 0 removed)', self.build())
+        blog_2.delete()
+        self.assertIn('Rendered 2 pages (0 changed posts, 1 removed)', self.build())
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'blog-2')))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'api/posts/blog-2')))
+        self.assertIn('Rendered 4 pages (1 changed posts, 0 removed)', self.build(full=True))
+
+
+class StaticBuildDiscardTests(TransactionTestCase):
+    """Built pages are discarded once the change commits"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        override = override_settings(BLOGS_STATIC_BUILD_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_change_discards_built_pages(self):
+        blog_1 = BlogFactory(slug='blog-1')
+        blog_2 = BlogFactory(slug='blog-2')
+        call_command('build_static', output=self.root, workers=0, stdout=StringIO())
+        blog_1.title = 'Updated blog'
+        blog_1.save()
+        for name in ('blog-1/index.html', 'api/posts/blog-1/index.json', 'page/1/index.html'):
+            self.assertFalse(os.path.exists(os.path.join(self.root, name)), name)
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'blog-2/index.html')))
+        out = StringIO()
+        call_command('build_static', output=self.root, workers=0, stdout=out)
+        self.assertIn('Rendered 4 pages (1 changed posts, 0 removed)', out.getvalue())
+        blog_2.delete()
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'blog-2/index.html')))
+
+
+# Tests for the templates
+
+class TemplateTests(TestCase):
+
+    def test_url_replace(self):
+        request = RequestFactory().get('/', {'page': '2', 'keyword': 'ブログ'})
+        template = Template(
+            "{% load blogs_tags %}{% url_replace request 'page' 3 %} {% url_replace request 'page' 4 %}"
+        )
+        self.assertEqual(
+            template.render(Context({'request': request})),
+            'keyword=%E3%83%96%E3%83%AD%E3%82%B0&amp;page=3 keyword=%E3%83%96%E3%83%AD%E3%82%B0&amp;page=4',
+        )
+        request = RequestFactory().get('/')
+        self.assertEqual(template.render(Context({'request': request})), 'page=3 page=4')
+
+    @override_settings(TEMPLATES=[dict(
+        settings.TEMPLATES[0], APP_DIRS=False,
+        OPTIONS=dict(settings.TEMPLATES[0]['OPTIONS'], loaders=[
+            ('django.template.loaders.cached.Loader', ['django.template.loaders.filesystem.Loader']),
+        ]),
+    )])
+    def test_warm_up(self):
+        names = warm_up()
+        self.assertIn('blogs/index.html', names)
+        self.assertIn('blogs/includes/paginator.html', names)
+        cache = engines['django'].engine.template_loaders[0].get_template_cache
+        self.assertIn('blogs/index.html', cache)
+
+    @override_settings(TEMPLATES=[dict(
+        settings.TEMPLATES[0], APP_DIRS=True,
+        OPTIONS=dict(
+            {key: value for key, value in settings.TEMPLATES[0]['OPTIONS'].items() if key != 'loaders'},
+            debug=True,
+        ),
+    )])
+    def test_warm_up_without_cached_loader(self):
+        self.assertEqual(warm_up(), [])
+
+    def test_profile_templates(self):
+        for number in range(15):
+            BlogFactory(slug='blog-%d' % number)
+        with profile_templates() as profile:
+            self.client.get(reverse('blogs:index'))
+        self.assertIn(('template', 'blogs/index.html', ''), profile.entries)
+        self.assertIn(('template', 'blogs/includes/paginator.html', ''), profile.entries)
+        include = profile.entries['include', 'blogs/index.html', "include 'blogs/includes/paginator.html'"]
+        self.assertEqual(include.calls, 1)
+        url_replace = profile.entries['tag', 'blogs/includes/paginator.html', 'url_replace']
+        self.assertGreater(url_replace.calls, 1)
+        self.assertLessEqual(url_replace.own, url_replace.total)
+        index = profile.entries['template', 'blogs/index.html', '']
+        self.assertAlmostEqual(profile.render_time(), index.total)
+
 
 # Tests for the views
 
@@ -77,6 +758,13 @@ class BlogListTests(TestCase):
         )
         self.assertIsNotNone(res.context['search_form'])
 
+    def test_get_blog_list_without_text(self):
+        blog = BlogFactory(text='This text is summarized.')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('blogs:index'))
+        self.assertContains(res, 'This text is summarized.')
+        self.assertFalse(any('"blogs_blog"."text"' in query['sql'] for query in queries))
+
     def test_get_empty_blog_list(self):
         res = self.client.get(reverse('blogs:index'))
         self.assertTemplateUsed(res, 'blogs/index.html')
@@ -168,6 +856,104 @@ class BlogListTests(TestCase):
         res = self.client.get(reverse('blogs:index'), data={'page': 'string'})
         self.assertEqual(res.status_code, 404)
 
+    def test_windowed_page_links(self):
+        for number in range(200):
+            BlogFactory(slug='blog-%d' % number)
+        res = self.client.get(reverse('blogs:index'), data={'page': 10})
+        # Previous, 1, 8 to 12, 20 and next
+        self.assertContains(res, 'href="?page=', count=9)
+        self.assertContains(res, '<span class="page-link">%s</span>' % ELLIPSIS, count=2)
+        for number in (1, 8, 12, 20):
+            self.assertContains(res, 'href="?page=%d"' % number)
+        self.assertNotContains(res, 'href="?page=7"')
+        self.assertNotContains(res, 'href="?page=13"')
+
+
+class WindowedPaginatorTests(TestCase):
+
+    def test_elided_page_range(self):
+        self.assertEqual(elided_page_range(1, 6), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(elided_page_range(1, 20), [1, 2, 3, ELLIPSIS, 20])
+        self.assertEqual(elided_page_range(5, 20), [1, 2, 3, 4, 5, 6, 7, ELLIPSIS, 20])
+        self.assertEqual(elided_page_range(10, 20), [1, ELLIPSIS, 8, 9, 10, 11, 12, ELLIPSIS, 20])
+        self.assertEqual(elided_page_range(20, 20), [1, ELLIPSIS, 18, 19, 20])
+        self.assertEqual(
+            elided_page_range(10, 20, on_each_side=1, on_ends=2), [1, 2, ELLIPSIS, 9, 10, 11, ELLIPSIS, 19, 20],
+        )
+
+    @override_settings(BLOGS_ESTIMATED_COUNT_THRESHOLD=1)
+    def test_exact_count_without_statistics(self):
+        for number in range(3):
+            BlogFactory(slug='blog-%d' % number)
+        paginator = WindowedPaginator(Blog.objects.all(), 2)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.estimated)
+
+    @override_settings(BLOGS_ESTIMATED_COUNT_THRESHOLD=10)
+    def test_page_past_estimated_end(self):
+        for number in range(3):
+            BlogFactory(slug='blog-%d' % number)
+        paginator = WindowedPaginator(Blog.objects.all(), 2)
+        paginator.estimated = True
+        paginator.count = 40
+        self.assertEqual(len(paginator.page(2)), 1)
+        with self.assertRaises(EmptyPage):
+            paginator.page(3)
+
+    def test_estimate_short_of_the_rows(self):
+        for number in range(5):
+            BlogFactory(slug='blog-%d' % number)
+        paginator = WindowedPaginator(Blog.objects.all(), 2)
+        paginator.estimated = True
+        paginator.count = 2
+        # The last estimated page is full: there may be more.
+        self.assertTrue(paginator.page(1).has_next())
+        self.assertEqual((paginator.count, paginator.num_pages), (5, 3))
+        self.assertFalse(paginator.estimated)
+
+        paginator = WindowedPaginator(Blog.objects.all(), 2)
+        paginator.estimated = True
+        paginator.count = 2
+        self.assertEqual(len(paginator.page(3)), 1)
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+
+@override_settings(BLOGS_PAGINATION='cursor')
+class BlogListCursorTests(TestCase):
+
+    def setUp(self):
+        for i in range(1, 12):
+            BlogFactory(title='Blog %d' % i, slug='blog-%d' % i)
+
+    def test_get_cursor_pages(self):
+        res_page_1 = self.client.get(reverse('blogs:index'))
+        self.assertEqual(len(res_page_1.context['blog_list']), 10)
+        self.assertFalse(res_page_1.context['page_obj'].has_previous())
+        next_cursor = res_page_1.context['page_obj'].next_cursor
+        self.assertContains(res_page_1, 'cursor=%s' % next_cursor)
+
+        res_page_2 = self.client.get(reverse('blogs:index'), data={'cursor': next_cursor})
+        self.assertQuerysetEqual(res_page_2.context['blog_list'], ['<Blog: Blog 1>'])
+        self.assertFalse(res_page_2.context['page_obj'].has_next())
+
+        previous_cursor = res_page_2.context['page_obj'].previous_cursor
+        res_back = self.client.get(reverse('blogs:index'), data={'cursor': previous_cursor})
+        self.assertEqual(
+            list(res_back.context['blog_list']), list(res_page_1.context['blog_list'])
+        )
+        self.assertFalse(res_back.context['page_obj'].has_previous())
+        self.assertTrue(res_back.context['page_obj'].has_next())
+
+    def test_get_invalid_cursor(self):
+        res = self.client.get(reverse('blogs:index'), data={'cursor': 'string'})
+        self.assertEqual(res.status_code, 404)
+
+    def test_ranking_is_flagged(self):
+        self.assertEqual(checks.run_checks(), [])
+        with override_settings(BLOGS_SEARCH_RANKED=True):
+            self.assertEqual([error.id for error in checks.run_checks()], ['blogs.W001'])
+
 
 class BlogDetailTests(TestCase):
 
@@ -182,6 +968,580 @@ class BlogDetailTests(TestCase):
         self.assertEqual(res.status_code, 404)
 
 
+class BlogDetailCacheTests(TestCase):
+
+    def setUp(self):
+        caches['blogs'].clear()
+        render_cache.stats.clear()
+
+    def test_text_is_cached(self):
+        blog = BlogFactory(slug='sample-blog', text='See https://example.com')
+        url = reverse('blogs:detail', kwargs={'slug': 'sample-blog'})
+        res = self.client.get(url)
+        self.assertContains(res, '<a href="https://example.com"')
+        # One query for the ETag, one for the post without its text
+        with self.assertNumQueries(2):
+            res = self.client.get(url)
+        self.assertContains(res, '<a href="https://example.com"')
+        self.assertEqual(render_cache.stats, {'hits': 1, 'misses': 1})
+
+    def test_save_invalidates_cache(self):
+        blog = BlogFactory(slug='sample-blog', text='Old text')
+        url = reverse('blogs:detail', kwargs={'slug': 'sample-blog'})
+        self.client.get(url)
+        blog.text = 'New text'
+        blog.save()
+        self.assertIsNone(caches['blogs'].get(render_cache.make_key('sample-blog', 'text')))
+        self.assertContains(self.client.get(url), 'New text')
+
+    @override_settings(BLOGS_RENDER_CACHE_PAGES=True)
+    def test_page_is_cached(self):
+        blog = BlogFactory(title='Sample blog', slug='sample-blog')
+        url = reverse('blogs:detail', kwargs={'slug': 'sample-blog'})
+        res = self.client.get(url)
+        res_cached = self.client.get(url)
+        self.assertEqual(res_cached.content, res.content)
+        self.assertIsNone(res_cached.context)
+
+    def test_redis_backend(self):
+        cache = RedisCache('redis://local/9', {'OPTIONS': {'CLIENT_CLASS': 'blogs.cache_backends.LocalRedis'}})
+        cache.clear()
+        cache.set('key', ('version', '<p>text</p>'))
+        self.assertEqual(cache.get('key'), ('version', '<p>text</p>'))
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertEqual(LocalRedis.from_url('redis://local/9').exists(':1:key'), 1)
+        cache.set('expired', 'value', timeout=0)
+        self.assertIsNone(cache.get('expired'))
+        cache.delete_many(['key'])
+        self.assertIsNone(cache.get('key'))
+
+
+class ConditionalGetTests(TestCase):
+
+    def test_detail_not_modified(self):
+        blog = BlogFactory(slug='sample-blog')
+        url = reverse('blogs:detail', kwargs={'slug': 'sample-blog'})
+        res = self.client.get(url)
+        self.assertIn('public', res['Cache-Control'])
+        self.assertIn('Last-Modified', res)
+        with self.assertNumQueries(1):
+            res_304 = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res_304.status_code, 304)
+        self.assertIn('max-age', res_304['Cache-Control'])
+        res_304 = self.client.get(url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res_304.status_code, 304)
+        blog.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag']).status_code, 200)
+
+    def test_list_etag_changes_on_delete(self):
+        blog_1 = BlogFactory(slug='first-blog')
+        blog_2 = BlogFactory(slug='second-blog')
+        res = self.client.get(reverse('blogs:index'))
+        with self.assertNumQueries(1):
+            res_304 = self.client.get(reverse('blogs:index'), HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res_304.status_code, 304)
+        blog_1.delete()
+        res_200 = self.client.get(reverse('blogs:index'), HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res_200.status_code, 200)
+
+    def test_list_etag_does_not_count(self):
+        BlogFactory(slug='first-blog')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('blogs:index'), HTTP_IF_NONE_MATCH='"other"')
+        self.assertNotIn('COUNT(', queries.captured_queries[0]['sql'])
+        caches['blogs'].delete(LIST_GENERATION_KEY)
+        res_200 = self.client.get(reverse('blogs:index'), HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res_200.status_code, 200)
+
+    def test_lists_have_no_last_modified(self):
+        blog_1 = BlogFactory(slug='first-blog')
+        blog_2 = BlogFactory(slug='second-blog')
+        if_modified_since = 'Thu, 01 Jan 2099 00:00:00 GMT'
+        for url in (reverse('blogs:index'), reverse('blogs:rss_feed'), reverse('blogs:atom_feed')):
+            res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=if_modified_since)
+            self.assertNotIn('Last-Modified', res)
+        blog_1.delete()
+        res = self.client.get(reverse('blogs:index'), HTTP_IF_MODIFIED_SINCE=if_modified_since)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, 'first-blog')
+
+    def test_list_etag_depends_on_query(self):
+        blog = BlogFactory()
+        res = self.client.get(reverse('blogs:index'))
+        res_search = self.client.get(reverse('blogs:index'), data={'keyword': 'blog'})
+        self.assertNotEqual(res['ETag'], res_search['ETag'])
+
+    def test_api_not_modified(self):
+        blog = BlogFactory(slug='sample-blog')
+        for url in (reverse('blogs:api_index'), reverse('blogs:api_detail', kwargs={'slug': 'sample-blog'})):
+            res = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertIn('Accept', res['Vary'])
+            res_304 = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=res['ETag'])
+            self.assertEqual(res_304.status_code, 304)
+            res_html = self.client.get(url, HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=res['ETag'])
+            self.assertEqual(res_html.status_code, 200)
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        caches['blogs'].clear()
+
+    def test_rss_feed(self):
+        blog = BlogFactory(title='フィード', slug='feed-blog', text='本文の抜粋')
+        url = reverse('blogs:rss_feed')
+        res = self.client.get(url)
+        self.assertEqual(res['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertContains(res, '<title>フィード</title>')
+        self.assertContains(res, '本文の抜粋')
+        self.assertContains(res, 'http://testserver/feed-blog/')
+        self.assertIn('public', res['Cache-Control'])
+        with self.assertNumQueries(1):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, res.content)
+        self.assertEqual(cached['Content-Type'], res['Content-Type'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag']).status_code, 304)
+        blog.title = '更新'
+        blog.save()
+        self.assertContains(self.client.get(url), '<title>更新</title>')
+
+    def test_atom_feed(self):
+        blog = BlogFactory(title='フィード', slug='feed-blog')
+        res = self.client.get(reverse('blogs:atom_feed'))
+        self.assertContains(res, 'xmlns="http://www.w3.org/2005/Atom"')
+        self.assertContains(res, '<updated>')
+
+
+@override_settings(BLOGS_SITEMAP_LIMIT=2)
+class SitemapTests(TestCase):
+
+    def setUp(self):
+        caches['blogs'].clear()
+        self.blogs = [BlogFactory(slug='blog-%d' % number) for number in range(5)]
+
+    def page(self, blog):
+        return (blog.pk - 1) // 2 + 1
+
+    def test_sitemap_index(self):
+        res = self.client.get(reverse('blogs:sitemap_index'))
+        url = 'http://testserver' + reverse('blogs:sitemap', args=['blogs'])
+        self.assertContains(res, '<loc>%s</loc>' % url)
+        last_page = self.page(self.blogs[-1])
+        self.assertContains(res, '<loc>%s?p=%d</loc>' % (url, last_page))
+        self.assertNotContains(res, '?p=%d' % (last_page + 1))
+        self.assertEqual(self.client.get(reverse('blogs:sitemap_index'), HTTP_IF_NONE_MATCH=res['ETag']).status_code, 304)
+
+    def test_sitemap_pages_change_independently(self):
+        url = reverse('blogs:sitemap', args=['blogs'])
+        first, last = self.blogs[0], self.blogs[-1]
+        res_first = self.client.get(url, {'p': self.page(first)})
+        res_last = self.client.get(url, {'p': self.page(last)})
+        self.assertContains(res_first, '<loc>http://testserver/blog-0/</loc>')
+        self.assertNotContains(res_first, 'blog-4')
+        self.assertContains(res_last, '<loc>http://testserver/blog-4/</loc>')
+        self.assertContains(res_last, '<lastmod>')
+        self.assertNotIn('Last-Modified', res_last)
+        first.save()
+        res = self.client.get(url, {'p': self.page(first)}, HTTP_IF_NONE_MATCH=res_first['ETag'])
+        self.assertEqual(res.status_code, 200)
+        with self.assertNumQueries(1):
+            res = self.client.get(url, {'p': self.page(last)})
+        self.assertEqual(res.content, res_last.content)
+        self.assertEqual(
+            self.client.get(url, {'p': self.page(last)}, HTTP_IF_NONE_MATCH=res_last['ETag']).status_code, 304,
+        )
+
+    def test_missing_sitemap(self):
+        url = reverse('blogs:sitemap', args=['blogs'])
+        self.assertEqual(self.client.get(url, {'p': 99}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'p': 'x'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('blogs:sitemap', args=['other'])).status_code, 404)
+
+
+@override_settings(BLOGS_PAGE_CACHE_TIMEOUT=10)
+class AnonymousPageCacheTests(TestCase):
+
+    def setUp(self):
+        caches['blogs'].clear()
+
+    def test_page_is_cached(self):
+        blog = BlogFactory(title='First blog')
+        res = self.client.get(reverse('blogs:index'), data={'keyword': 'first'})
+        self.assertEqual(res['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            res_hit = self.client.get(reverse('blogs:index'), data={'keyword': ' ＦＩＲＳＴ '})
+        self.assertEqual(res_hit['X-Page-Cache'], 'HIT')
+        self.assertEqual(res_hit.content, res.content)
+        # Its page links would carry the parameter the cache key leaves out.
+        res_extra = self.client.get(reverse('blogs:index'), data={'keyword': 'first', 'utm': 'x'})
+        self.assertNotIn('X-Page-Cache', res_extra)
+        res_304 = self.client.get(reverse('blogs:index'), data={'keyword': 'first'}, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res_304.status_code, 304)
+
+    def test_expired_page_is_served_stale(self):
+        blog = BlogFactory(title='First blog', slug='first-blog')
+        self.client.get(reverse('blogs:index'))
+        middleware = AnonymousPageCacheMiddleware(None)
+        key = middleware.make_key(RequestFactory().get(reverse('blogs:index')))
+        generation, expires, response = caches['blogs'].get(key)
+        caches['blogs'].set(key, (generation, 0, response))
+        # Another request is already rebuilding the page: the stale copy is served.
+        self.assertTrue(middleware.lock(key))
+        self.assertEqual(self.client.get(reverse('blogs:index'))['X-Page-Cache'], 'STALE')
+        caches['blogs'].delete(middleware.lock_key(key))
+        self.assertEqual(self.client.get(reverse('blogs:index'))['X-Page-Cache'], 'MISS')
+
+    @override_settings(BLOGS_PAGE_CACHE_LOCK_TIMEOUT=0)
+    def test_blog_change_is_never_served_stale(self):
+        blog = BlogFactory(title='First blog', slug='first-blog')
+        self.client.get(reverse('blogs:index'))
+        BlogFactory(title='Second blog', slug='second-blog')
+        middleware = AnonymousPageCacheMiddleware(None)
+        key = middleware.make_key(RequestFactory().get(reverse('blogs:index')))
+        # Another request is already rebuilding the page: this one renders
+        # its own rather than serve the copy from before the change.
+        self.assertTrue(middleware.lock(key))
+        res = self.client.get(reverse('blogs:index'))
+        self.assertEqual(res['X-Page-Cache'], 'MISS')
+        self.assertContains(res, 'Second blog')
+
+    def test_deleted_page_is_dropped(self):
+        blog = BlogFactory(slug='sample-blog')
+        url = reverse('blogs:detail', kwargs={'slug': 'sample-blog'})
+        self.client.get(url)
+        blog.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_session_bypasses_cache(self):
+        blog = BlogFactory()
+        self.client.get(reverse('blogs:index'))
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        res = self.client.get(reverse('blogs:index'))
+        self.assertNotIn('X-Page-Cache', res)
+
+
+@override_settings(BLOGS_COMPRESS=True, BLOGS_COMPRESS_MIN_SIZE=200)
+class CompressionTests(TestCase):
+
+    def test_negotiate(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip;q=0.5, identity')
+        self.assertEqual(compression.negotiate(request), 'gzip')
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip;q=0, *;q=0.1')
+        self.assertEqual(compression.negotiate(request, ['gzip']), None)
+        self.assertEqual(compression.negotiate(RequestFactory().get('/')), None)
+
+    def test_gzip_response(self):
+        blog = BlogFactory(slug='sample-blog', text='本文' * 200)
+        url = reverse('blogs:detail', kwargs={'slug': 'sample-blog'})
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertTrue(res['ETag'].startswith('W/"'))
+        self.assertIn('本文本文', gzip.decompress(res.content).decode())
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 304)
+        res = self.client.get(url)
+        self.assertNotIn('Content-Encoding', res)
+
+    @override_settings(BLOGS_COMPRESS_MIN_SIZE=100000)
+    def test_small_response(self):
+        blog = BlogFactory(slug='sample-blog')
+        res = self.client.get(reverse('blogs:detail', kwargs={'slug': 'sample-blog'}), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', res)
+
+    def test_streaming_response(self):
+        for number in range(10):
+            BlogFactory(slug='blog-%d' % number)
+        res = self.client.get(
+            reverse('blogs:api_index'), HTTP_ACCEPT='application/x-ndjson', HTTP_ACCEPT_ENCODING='br, gzip',
+        )
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(res.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 10)
+
+    @override_settings(BLOGS_PAGE_CACHE_TIMEOUT=60)
+    def test_page_cache_keeps_each_encoding(self):
+        caches['blogs'].clear()
+        blog = BlogFactory(text='本文' * 200)
+        url = reverse('blogs:index')
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res['X-Page-Cache'], 'HIT')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        res = self.client.get(url)
+        self.assertEqual(res['X-Page-Cache'], 'HIT')
+        self.assertNotIn('Content-Encoding', res)
+
+    def test_minify(self):
+        source = '<div>\n\n    <p>{{ text }}</p>\n  </div>\n<pre>\n  kept\n</pre>  '
+        self.assertEqual(minify(source), '<div>\n<p>{{ text }}</p>\n</div>\n<pre>\n  kept\n</pre>  ')
+
+    @override_settings(TEMPLATES=[dict(
+        settings.TEMPLATES[0], APP_DIRS=False,
+        OPTIONS=dict(settings.TEMPLATES[0]['OPTIONS'], loaders=[
+            ('blogs.template_loaders.MinifyingLoader', ['django.template.loaders.filesystem.Loader']),
+        ]),
+    )])
+    def test_minified_templates(self):
+        blog = BlogFactory()
+        res = self.client.get(reverse('blogs:index'))
+        self.assertContains(res, blog.title)
+        self.assertNotIn('\n ', res.content.decode())
+
+
+@override_settings(BLOGS_INSTRUMENTATION=True)
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        instrumentation.registry.clear()
+
+    def test_server_timing(self):
+        blog = BlogFactory(slug='sample-blog')
+        res = self.client.get(reverse('blogs:index'))
+        self.assertRegex(res['Server-Timing'], r'db;dur=[0-9.]+;desc="3 queries"')
+        self.assertIn('render;dur=', res['Server-Timing'])
+        res = self.client.get(reverse('blogs:api_detail', kwargs={'slug': 'sample-blog'}), HTTP_ACCEPT='application/json')
+        self.assertIn('serialize;dur=', res['Server-Timing'])
+
+    def test_metrics(self):
+        blog = BlogFactory(slug='sample-blog')
+        self.client.get(reverse('blogs:index'))
+        self.client.get(reverse('blogs:index'))
+        self.client.get(reverse('blogs:api_index'), HTTP_ACCEPT='application/json')
+        res = self.client.get(reverse('metrics'))
+        self.assertEqual(res['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertContains(res, 'blogs_request_duration_seconds_count{url_name="blogs:index"} 2')
+        self.assertContains(res, 'blogs_db_queries_bucket{url_name="blogs:index",le="3"} 2')
+        self.assertContains(res, 'blogs_serializer_duration_seconds_count{url_name="blogs:api_index"} 1')
+
+    @override_settings(BLOGS_INSTRUMENTATION=False)
+    def test_disabled(self):
+        res = self.client.get(reverse('blogs:index'))
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    def test_metrics_do_not_shadow_posts(self):
+        blog = BlogFactory(slug='metrics')
+        self.assertEqual(self.client.get(reverse('blogs:detail', kwargs={'slug': 'metrics'})).status_code, 200)
+
+
+@override_settings(BLOGS_EDGE_PURGER='blogs.edge.LocalPurger')
+class EdgeCacheTests(TestCase):
+
+    def test_surrogate_keys(self):
+        blog = BlogFactory(slug='sample-blog')
+        res = self.client.get(reverse('blogs:detail', kwargs={'slug': 'sample-blog'}))
+        self.assertEqual(res['Surrogate-Key'], 'post-sample-blog')
+        self.assertIn('s-maxage=86400', res['Cache-Control'])
+        self.assertIn('max-age=%d' % settings.BLOGS_CACHE_MAX_AGE, res['Cache-Control'])
+        self.assertEqual(res['X-Accel-Expires'], '86400')
+        res = self.client.get(reverse('blogs:api_index'), HTTP_ACCEPT='application/json')
+        self.assertEqual(res['Surrogate-Key'], 'list api')
+        res = self.client.get(reverse('blogs:index'), HTTP_IF_NONE_MATCH=self.client.get(reverse('blogs:index'))['ETag'])
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['Surrogate-Key'], 'list')
+
+    def test_unpurgeable_pages_are_short_lived(self):
+        blog = BlogFactory(title='First blog')
+        res = self.client.get(reverse('blogs:index'), data={'keyword': 'first'})
+        self.assertEqual(res['X-Accel-Expires'], str(settings.BLOGS_CACHE_MAX_AGE))
+        res = self.client.get(reverse('blogs:detail', kwargs={'slug': blog.slug}), data={'page': 1})
+        self.assertEqual(res['X-Accel-Expires'], str(settings.BLOGS_CACHE_MAX_AGE))
+        res = self.client.get(reverse('blogs:index'), data={'p': 1})
+        self.assertEqual(res['X-Accel-Expires'], str(settings.BLOGS_CACHE_MAX_AGE))
+        res = self.client.get(reverse('blogs:index'), data={'page': 1})
+        self.assertEqual(res['X-Accel-Expires'], str(settings.BLOGS_EDGE_MAX_AGE['blogs:index']))
+        res = self.client.get(reverse('blogs:api_batch'), data={'slugs': blog.slug})
+        self.assertNotIn('Surrogate-Key', res)
+        self.assertNotIn('X-Accel-Expires', res)
+
+    @override_settings(BLOGS_EDGE_PURGER='')
+    def test_disabled(self):
+        blog = BlogFactory(slug='sample-blog')
+        res = self.client.get(reverse('blogs:detail', kwargs={'slug': 'sample-blog'}))
+        self.assertNotIn('Surrogate-Key', res)
+        self.assertNotIn('s-maxage', res['Cache-Control'])
+
+    def test_key_paths(self):
+        for number in range(25):
+            BlogFactory(slug='blog-%d' % number)
+        paths = edge.key_paths(['post-blog-1', 'list'])
+        for path in (
+            '/blog-1/', '/api/posts/blog-1/', '/', '/?page=3', '/api/posts/?page=2',
+            '/feed/rss.xml', '/feed/atom.xml', '/sitemap.xml', '/sitemap-blogs.xml?p=1',
+        ):
+            self.assertIn(path, paths)
+        self.assertIn('/?page=4', paths)
+        self.assertNotIn('/?page=5', paths)
+        self.assertNotIn('/api/posts/blog-2/', paths)
+        self.assertIn('/api/posts/blog-2/', edge.key_paths(['api']))
+
+    @override_settings(BLOGS_EDGE_PURGE_PAGES=1)
+    def test_key_paths_are_bounded(self):
+        blogs = [BlogFactory(slug='blog-%d' % number) for number in range(60)]
+        paths = edge.key_paths(['list'])
+        self.assertIn('/', paths)
+        self.assertIn('/?page=6', paths)
+        self.assertIn('/?page=7', paths)
+        self.assertNotIn('/?page=3', paths)
+        # The 26th newest post, deleted: its page and the pages at the ends
+        position = edge.position_key(blogs[34])
+        blogs[34].delete()
+        paths = edge.key_paths(['list', position])
+        self.assertIn('/?page=3', paths)
+        self.assertIn('/api/posts/?page=2', paths)
+        self.assertNotIn('/?page=2', paths)
+        self.assertEqual(edge.key_paths([position]), {
+            '/?page=3', '/api/posts/?page=2', '/sitemap-blogs.xml?p=1', '/sitemap-blogs.xml',
+        })
+
+    def test_nginx_cache_purger(self):
+        blog = BlogFactory(slug='sample-blog')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            purger = edge.NginxCachePurger(cache_dir=cache_dir, origins=['http://localhost'], levels='1:2')
+            name = purger.cache_file('http://localhost/sample-blog/|html|gzip')
+            digest = os.path.basename(name)
+            self.assertEqual(name, os.path.join(cache_dir, digest[-1], digest[-3:-1], digest))
+            kept = purger.cache_file('http://localhost/other-blog/|html|gzip')
+            for path in (name, kept):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, 'wb').close()
+            self.assertEqual(purger.purge(['post-sample-blog']), 1)
+            self.assertFalse(os.path.exists(name))
+            self.assertTrue(os.path.exists(kept))
+
+    @override_settings(BLOGS_TASK_QUEUE=True)
+    def test_purge_is_queued(self):
+        edge.LocalPurger.reset()
+        blog = BlogFactory(slug='sample-blog')
+        keys = {'post-sample-blog', 'list', edge.position_key(blog)}
+        self.assertEqual(set(Task.objects.filter(name='blogs.purge_edge').values_list('key', flat=True)), keys)
+        tasks.Worker().run_pending()
+        self.assertEqual(set(edge.LocalPurger.purged_keys), keys)
+
+    def test_purge_edge_command(self):
+        edge.LocalPurger.reset()
+        call_command('purge_edge', 'api', stdout=StringIO())
+        self.assertEqual(edge.LocalPurger.purged_keys, ['api'])
+        with override_settings(BLOGS_EDGE_PURGER=''), self.assertRaises(CommandError):
+            call_command('purge_edge', 'api')
+
+
+@override_settings(BLOGS_EDGE_PURGER='blogs.edge.LocalPurger')
+class EdgePurgeOnCommitTests(TransactionTestCase):
+
+    def setUp(self):
+        edge.LocalPurger.reset()
+
+    def test_save_and_delete_purge_after_commit(self):
+        with transaction.atomic():
+            blog = BlogFactory(slug='sample-blog')
+            self.assertEqual(edge.LocalPurger.purged_keys, [])
+        position = edge.position_key(blog)
+        self.assertEqual(edge.LocalPurger.purged_keys, ['post-sample-blog', 'list', position])
+        self.assertIn('/sample-blog/', edge.LocalPurger.purged_paths)
+        edge.LocalPurger.reset()
+        blog.delete()
+        self.assertEqual(edge.LocalPurger.purged_keys, ['post-sample-blog', 'list', position])
+
+    def test_transaction_purges_once(self):
+        with transaction.atomic():
+            for number in range(3):
+                BlogFactory(slug='blog-%d' % number)
+            Blog.objects.all().delete()
+        self.assertEqual(len(edge.LocalPurger.purged_keys), len(set(edge.LocalPurger.purged_keys)))
+        self.assertIn('post-blog-2', edge.LocalPurger.purged_keys)
+
+    def test_rename_purges_old_slug(self):
+        BlogFactory(slug='old')
+        blog = Blog.objects.get(slug='old')
+        edge.LocalPurger.reset()
+        blog.slug = 'new'
+        blog.save()
+        position = edge.position_key(blog)
+        self.assertEqual(edge.LocalPurger.purged_keys, ['post-new', 'list', position, 'post-old'])
+        self.assertIn('/old/', edge.LocalPurger.purged_paths)
+        edge.LocalPurger.reset()
+        blog.save()
+        self.assertEqual(edge.LocalPurger.purged_keys, ['post-new', 'list', position])
+
+    def test_rollback_does_not_purge(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            BlogFactory(slug='sample-blog')
+            raise ValueError
+        self.assertEqual(edge.LocalPurger.purged_keys, [])
+        with transaction.atomic():
+            transaction.on_commit(lambda: None)
+            BlogFactory(slug='other-blog')
+        self.assertNotIn('post-sample-blog', edge.LocalPurger.purged_keys)
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    """Requests run in the handler's threads, which do not share a test transaction"""
+
+    def request(self, path, accept=b'application/json', messages=None):
+        messages = list(messages or [{'type': 'http.request', 'body': b''}])
+        sent = []
+
+        async def receive():
+            if not messages:
+                # A client that stays connected: nothing more to receive.
+                await asyncio.Event().wait()
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'accept', accept)],
+        }
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            asyncio.run(ASGIHandler(executor=executor)(scope, receive, send))
+        return sent
+
+    def test_get(self):
+        blog = BlogFactory(title='ASGI blog', slug='sample-blog')
+        sent = self.request(reverse('blogs:api_detail', kwargs={'slug': 'sample-blog'}))
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'application/json'), sent[0]['headers'])
+        self.assertEqual(json.loads(b''.join(message.get('body', b'') for message in sent[1:]))['title'], 'ASGI blog')
+        self.assertEqual(sent[-1], {'type': 'http.response.body', 'body': b''})
+
+    def test_repeated_headers(self):
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/',
+            'headers': [(b'cookie', b'a=1'), (b'accept', b'text/html'), (b'cookie', b'b=2'), (b'accept', b'*/*')],
+        }
+        environ = ASGIHandler(executor=None).get_environ(scope, StringIO())
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,*/*')
+
+    def test_streaming(self):
+        for number in range(3):
+            BlogFactory(slug='blog-%d' % number)
+        sent = self.request(reverse('blogs:api_index'), accept=b'application/x-ndjson')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(len([message for message in sent if message.get('more_body')]), 3)
+
+    def test_not_found(self):
+        self.assertEqual(self.request('/no-such-blog/')[0]['status'], 404)
+
+    def test_disconnect(self):
+        self.assertEqual(self.request('/', messages=[{'type': 'http.disconnect'}]), [])
+
+    def test_disconnect_while_responding(self):
+        for number in range(3):
+            BlogFactory(slug='blog-%d' % number)
+        sent = self.request(reverse('blogs:api_index'), accept=b'application/x-ndjson', messages=[
+            {'type': 'http.request', 'body': b''}, {'type': 'http.disconnect'},
+        ])
+        self.assertEqual(sent, [])
+
+
 class BlogListAPITests(APITestCase):
 
     def test_get_blogs_api(self):
@@ -191,6 +1551,75 @@ class BlogListAPITests(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(Blog.objects.count(), 2)
 
+    def test_get_blogs_api_paginated(self):
+        for i in range(1, 26):
+            BlogFactory(title='Blog %d' % i, slug='blog-%d' % i)
+        res = self.client.get(reverse('blogs:api_index'), format='json')
+        self.assertEqual(res.data['count'], 25)
+        self.assertEqual(len(res.data['results']), 20)
+        res = self.client.get(reverse('blogs:api_index'), data={'page_size': 500}, format='json')
+        self.assertEqual(len(res.data['results']), 25)
+
+    def test_get_blogs_api_sparse_fields(self):
+        blog = BlogFactory(title='First blog', slug='first-blog')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('blogs:api_index'), data={'fields': 'title,slug'}, format='json')
+        self.assertEqual(res.data['results'], [{'title': 'First blog', 'slug': 'first-blog'}])
+        self.assertNotIn('"updated_datetime"', queries.captured_queries[-1]['sql'])
+
+    def test_get_blogs_api_unknown_fields(self):
+        res = self.client.get(reverse('blogs:api_index'), data={'fields': 'title,text'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_blogs_api_ndjson(self):
+        blog_1 = BlogFactory(title='First blog', slug='first-blog')
+        blog_2 = BlogFactory(title='Second blog', slug='second-blog')
+        res = self.client.get(reverse('blogs:api_index'), data={'format': 'ndjson', 'fields': 'slug'})
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'slug': 'second-blog'}, {'slug': 'first-blog'}])
+
+    @override_settings(BLOGS_PAGINATION='cursor')
+    def test_get_blogs_api_with_cursor(self):
+        for i in range(1, 12):
+            BlogFactory(title='Blog %d' % i, slug='blog-%d' % i)
+        res = self.client.get(reverse('blogs:api_index'), data={'page_size': 10}, format='json')
+        self.assertEqual(len(res.data['results']), 10)
+        self.assertIsNone(res.data['previous'])
+        res = self.client.get(res.data['next'], format='json')
+        self.assertEqual([blog['slug'] for blog in res.data['results']], ['blog-1'])
+        self.assertIsNone(res.data['next'])
+        self.assertIsNotNone(res.data['previous'])
+
+    @override_settings(BLOGS_PAGINATION='cursor', REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, PAGE_SIZE=5))
+    def test_cursor_page_size_follows_settings(self):
+        for i in range(1, 8):
+            BlogFactory(title='Blog %d' % i, slug='blog-%d' % i)
+        res = self.client.get(reverse('blogs:api_index'), format='json')
+        self.assertEqual(len(res.data['results']), 5)
+        res = self.client.get(reverse('blogs:api_index'), data={'page_size': 0}, format='json')
+        self.assertEqual(len(res.data['results']), 5)
+        res = self.client.get(reverse('blogs:api_index'), data={'page_size': 6}, format='json')
+        self.assertEqual(len(res.data['results']), 6)
+
+    def test_fast_serializer_output_is_identical(self):
+        for i in range(1, 4):
+            BlogFactory(title='Blog %d' % i, slug='blog-%d' % i)
+        for data in ({}, {'fields': 'id,updated_datetime'}, {'format': 'ndjson'}):
+            res = self.client.get(reverse('blogs:api_index'), data=data)
+            with override_settings(BLOGS_FAST_SERIALIZERS=True):
+                res_fast = self.client.get(reverse('blogs:api_index'), data=data)
+            self.assertEqual(b''.join(res_fast), b''.join(res))
+
+    @override_settings(BLOGS_FAST_SERIALIZERS=True, BLOGS_PAGINATION='cursor')
+    def test_fast_serializer_with_cursor(self):
+        for i in range(1, 4):
+            BlogFactory(title='Blog %d' % i, slug='blog-%d' % i)
+        res = self.client.get(reverse('blogs:api_index'), data={'page_size': 2}, format='json')
+        res = self.client.get(res.data['next'], format='json')
+        self.assertEqual([blog['slug'] for blog in res.data['results']], ['blog-1'])
+
 
 class BlogRetrieveAPITests(APITestCase):
 
@@ -198,3 +1627,158 @@ class BlogRetrieveAPITests(APITestCase):
         blog = BlogFactory(title='Sample blog', slug='sample-blog')
         res = self.client.get(reverse('blogs:api_detail', kwargs={'slug': 'sample-blog'}), format='json')
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data), {'id', 'title', 'slug', 'text', 'created_datetime', 'updated_datetime'})
+        res = self.client.get(reverse('blogs:api_index'), format='json')
+        self.assertEqual(set(res.data['results'][0]), {'id', 'title', 'slug', 'created_datetime', 'updated_datetime'})
+
+    def test_fast_serializer_output_is_identical(self):
+        blog = BlogFactory(title='Sample blog', slug='sample-blog')
+        res = self.client.get(reverse('blogs:api_detail', kwargs={'slug': 'sample-blog'}))
+        with override_settings(BLOGS_FAST_SERIALIZERS=True):
+            res_fast = self.client.get(reverse('blogs:api_detail', kwargs={'slug': 'sample-blog'}))
+            res_missing = self.client.get(reverse('blogs:api_detail', kwargs={'slug': 'missing'}))
+        self.assertEqual(res_fast.content, res.content)
+        self.assertEqual(res_missing.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BlogBatchAPITests(APITestCase):
+
+    def setUp(self):
+        caches['blogs'].clear()
+        self.blogs = [BlogFactory(title='Blog %d' % number, slug='blog-%d' % number) for number in range(3)]
+
+    def test_get_by_slugs(self):
+        url = reverse('blogs:api_batch')
+        res = self.client.get(url, {'slugs': 'blog-2,missing,blog-0,blog-2'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['slug'] for item in res.data['results']], ['blog-2', 'blog-0'])
+        self.assertEqual(res.data['missing'], ['missing'])
+        detail = self.client.get(reverse('blogs:api_detail', kwargs={'slug': 'blog-2'}))
+        self.assertEqual(res.data['results'][0], detail.data)
+
+    def test_get_by_ids(self):
+        res = self.client.get(reverse('blogs:api_batch'), {'ids': '%d,0' % self.blogs[1].pk})
+        self.assertEqual([item['slug'] for item in res.data['results']], ['blog-1'])
+        self.assertEqual(res.data['missing'], [0])
+
+    def test_items_served_from_cache(self):
+        url = reverse('blogs:api_batch')
+        with self.assertNumQueries(2):
+            res = self.client.get(url, {'slugs': 'blog-0,blog-1'})
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, {'slugs': 'blog-1,blog-0'})
+        self.assertEqual(cached.data['results'], res.data['results'][::-1])
+        self.blogs[0].title = 'Edited'
+        self.blogs[0].save()
+        with self.assertNumQueries(2):
+            res = self.client.get(url, {'slugs': 'blog-0,blog-1'})
+        self.assertEqual(res.data['results'][0]['title'], 'Edited')
+
+    def test_fast_serializer_output_is_identical(self):
+        url = reverse('blogs:api_batch')
+        res = self.client.get(url, {'slugs': 'blog-0,blog-1'})
+        caches['blogs'].clear()
+        with override_settings(BLOGS_FAST_SERIALIZERS=True):
+            res_fast = self.client.get(url, {'slugs': 'blog-0,blog-1'})
+        self.assertEqual(res_fast.content, res.content)
+
+    @override_settings(BLOGS_BATCH_MAX_SIZE=2)
+    def test_invalid_lookups(self):
+        url = reverse('blogs:api_batch')
+        for params in ({}, {'slugs': 'blog-0', 'ids': '1'}, {'slugs': 'a,b,c'}, {'ids': 'x'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# Tests for the query budgets
+
+# Most queries a request to each URL of blogs/urls.py may run, whatever the
+# number of posts. Raise one only with a reason; a new URL needs an entry.
+QUERY_BUDGETS = {
+    'blogs:index': 3,  # validators, count, page
+    'blogs:rss_feed': 2,  # validators, posts
+    'blogs:atom_feed': 2,  # validators, posts
+    'blogs:sitemap_index': 2,  # validators, highest key
+    'blogs:sitemap': 3,  # validators, highest key, posts
+    'blogs:detail': 3,  # validators, post, render cache miss
+    'blogs:api_index': 3,  # validators, count, page
+    'blogs:api_detail': 2,  # validators, post
+    'blogs:api_batch': 2,  # versions, uncached posts
+}
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        caches['blogs'].clear()
+
+    def get_requests(self):
+        slugs = list(Blog.objects.values_list('slug', flat=True)[:10])
+        return {
+            'blogs:index': (reverse('blogs:index'), {}),
+            'blogs:rss_feed': (reverse('blogs:rss_feed'), {}),
+            'blogs:atom_feed': (reverse('blogs:atom_feed'), {}),
+            'blogs:sitemap_index': (reverse('blogs:sitemap_index'), {}),
+            'blogs:sitemap': (reverse('blogs:sitemap', args=['blogs']), {}),
+            'blogs:detail': (reverse('blogs:detail', args=[slugs[0]]), {}),
+            'blogs:api_index': (reverse('blogs:api_index'), {}),
+            'blogs:api_detail': (reverse('blogs:api_detail', args=[slugs[0]]), {}),
+            'blogs:api_batch': (reverse('blogs:api_batch'), {'slugs': ','.join(slugs)}),
+        }
+
+    def test_every_url_has_a_budget(self):
+        BlogFactory()
+        names = {'%s:%s' % (urls.app_name, pattern.name) for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+        self.assertEqual(set(self.get_requests()), set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        # The same budgets hold for 2 and for 25 posts: no query per post.
+        for count in (2, 25):
+            for number in range(Blog.objects.count(), count):
+                BlogFactory(slug='blog-%d' % number)
+            for name, (url, params) in self.get_requests().items():
+                with self.subTest(name=name, posts=count):
+                    caches['blogs'].clear()
+                    with query_budget(QUERY_BUDGETS[name]):
+                        res = self.client.get(url, params)
+                    self.assertEqual(res.status_code, 200)
+
+    def test_query_budget_exceeded(self):
+        BlogFactory()
+        with self.assertRaisesMessage(AssertionError, 'over the budget of 1'):
+            with query_budget(1):
+                Blog.objects.count()
+                Blog.objects.exists()
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT "a" FROM "t" WHERE "id" IN (%s, %s, %s) AND  "n" = \'x\' LIMIT 21'),
+            'SELECT "a" FROM "t" WHERE "id" IN (...) AND "n" = ? LIMIT ?',
+        )
+        self.assertEqual(normalize_sql('SELECT 1 WHERE "id" IN (%s)'), normalize_sql('SELECT 2 WHERE "id" IN (%s, %s)'))
+
+    def test_detect_repeated_queries(self):
+        for number in range(3):
+            BlogFactory(slug='blog-%d' % number)
+        with detect_repeated_queries(3) as detector:
+            for blog in Blog.objects.only('pk'):
+                Blog.objects.get(pk=blog.pk).title
+        self.assertEqual(list(detector.repeated.values()), [3])
+        self.assertIn('Blog.objects.get(pk=blog.pk)', detector.report())
+        with detect_repeated_queries(3) as detector:
+            list(Blog.objects.all())
+        self.assertEqual(detector.repeated, {})
+
+    @override_settings(BLOGS_QUERY_CHECK='raise')
+    def test_middleware_raises_on_repeated_queries(self):
+        for number in range(3):
+            BlogFactory(slug='blog-%d' % number)
+
+        def view(request):
+            pks = Blog.objects.values_list('pk', flat=True)
+            return HttpResponse(', '.join(Blog.objects.get(pk=pk).title for pk in pks))
+        middleware = RepeatedQueryMiddleware(view)
+        with self.assertRaisesMessage(RepeatedQueries, 'Query run 3 times'):
+            middleware(RequestFactory().get('/'))
+        with override_settings(BLOGS_QUERY_CHECK='warn'), self.assertLogs('blogs.queries', 'WARNING'):
+            RepeatedQueryMiddleware(view)(RequestFactory().get('/'))
@@ -16,13 +16,20 @@ Including another URLconf
 from django.urls import path
 
 from .views import (
-    BlogList, BlogDetail, BlogListAPI, BlogRetrieveAPI,
+    BlogList, BlogDetail, BlogListAPI, BlogRetrieveAPI, BlogBatchAPI,
+    atom_feed, rss_feed, sitemap, sitemap_index,
 )
 
 app_name = 'blogs'
 urlpatterns = [
     path('', BlogList.as_view(), name='index'),
+    path('feed/rss.xml', rss_feed, name='rss_feed'),
+    path('feed/atom.xml', atom_feed, name='atom_feed'),
+    path('sitemap.xml', sitemap_index, name='sitemap_index'),
+    path('sitemap-<section>.xml', sitemap, name='sitemap'),
     path('<slug:slug>/', BlogDetail.as_view(), name='detail'),
     path('api/posts/', BlogListAPI.as_view(), name='api_index'),
     path('api/posts/<slug:slug>/', BlogRetrieveAPI.as_view(), name='api_detail'),
+    # Not under api/posts/, where it would shadow a post with the slug 'batch'
+    path('api/batch/posts/', BlogBatchAPI.as_view(), name='api_batch'),
 ]
\ No newline at end of file
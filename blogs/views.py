@@ -1,47 +1,280 @@
+from django.conf import settings
+from django.contrib.sitemaps import views as sitemap_views
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.decorators import method_decorator
 from django.views.generic import (
     ListView, DetailView,
 )
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import (
-    ListAPIView, RetrieveAPIView,
+    GenericAPIView, ListAPIView, RetrieveAPIView,
 )
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from . import instrumentation
+from .cache import render_cache
+from .conditional import (
+    cached_content, conditional_view, detail_validators, list_validators,
+    sitemap_index_validators, sitemap_validators,
+)
+from .db import pool
+from .feeds import LatestBlogsAtomFeed, LatestBlogsFeed
 from .forms import BlogSearchForm
 from .models import Blog
+from .pagination import InvalidCursor, KeysetPaginator, KeysetPagination, WindowedPaginator
+from .renderers import NDJSONRenderer
 from .serializers import (
     BlogListSerializer, BlogRetrieveSerializer,
+    FastBlogListSerializer, FastBlogRetrieveSerializer,
 )
+from .sitemaps import sitemaps
+
+
+def render_text(blog):
+    """The HTML of the post body, from the render cache when it is current"""
+    return render_cache.get_or_set(
+        blog, 'text', lambda: render_to_string('blogs/includes/text.html', {'blog': blog}),
+    )
 
 
 # Create your views here.
 
+@method_decorator(conditional_view(list_validators), name='dispatch')
 class BlogList(ListView):
     model = Blog
     template_name = 'blogs/index.html'
     paginate_by = 10
+    paginator_class = WindowedPaginator
 
     def get_queryset(self):
         form = BlogSearchForm(self.request.GET)
-        queryset = super().get_queryset()
-        queryset = form.filter_blogs(queryset)
+        # The page shows the stored excerpt, so the full text is not loaded.
+        queryset = super().get_queryset().defer('text')
+        # Keyset pages filter and order the queryset themselves, so only
+        # numbered pages can be ranked or cut from cached search results.
+        numbered = settings.BLOGS_PAGINATION == 'page'
+        queryset = form.filter_blogs(
+            queryset,
+            ranked=settings.BLOGS_SEARCH_RANKED and numbered,
+            cached=bool(settings.BLOGS_SEARCH_CACHE_TIMEOUT) and numbered,
+        )
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        if settings.BLOGS_PAGINATION != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
     def get_context_data(self):
         context = super().get_context_data()
         context['search_form'] = BlogSearchForm(self.request.GET)
         return context
 
 
+@method_decorator(conditional_view(detail_validators), name='dispatch')
 class BlogDetail(DetailView):
     model = Blog
     template_name = 'blogs/detail.html'
 
+    def get_queryset(self):
+        # The text is only read when its rendering is not cached.
+        return super().get_queryset().defer('text')
+
+    def get(self, request, *args, **kwargs):
+        if not settings.BLOGS_RENDER_CACHE_PAGES:
+            return super().get(request, *args, **kwargs)
+        self.object = self.get_object()
+        content = render_cache.get(self.object, 'page')
+        if content is not None:
+            return HttpResponse(content)
+        response = self.render_to_response(self.get_context_data(object=self.object))
+        response.add_post_render_callback(
+            lambda response: render_cache.set(self.object, 'page', response.content)
+        )
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['text_html'] = render_text(self.object)
+        return context
+
 
+@method_decorator(conditional_view(list_validators, vary_accept=True), name='dispatch')
 class BlogListAPI(ListAPIView):
     queryset = Blog.objects.all()
     serializer_class = BlogListSerializer
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    @property
+    def pagination_class(self):
+        if settings.BLOGS_PAGINATION == 'cursor':
+            return KeysetPagination
+        return api_settings.DEFAULT_PAGINATION_CLASS
+
+    def get_sparse_fields(self):
+        """Return the field names of ?fields=a,b or None for all fields"""
+        param = self.request.query_params.get('fields')
+        if not param:
+            return None
+        fields = [name for name in param.split(',') if name]
+        unknown = set(fields) - set(self.serializer_class().fields)
+        if unknown:
+            raise ValidationError({'fields': 'Unknown fields: %s' % ', '.join(sorted(unknown))})
+        return fields
+
+    def get_serializer_class(self):
+        if settings.BLOGS_FAST_SERIALIZERS:
+            return FastBlogListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        # created_datetime is read by the ordering and by keyset cursors.
+        if settings.BLOGS_FAST_SERIALIZERS:
+            names = FastBlogListSerializer.get_field_names(fields)
+            queryset = queryset.values(*dict.fromkeys(['created_datetime', *names]))
+        elif fields:
+            queryset = queryset.only('created_datetime', *fields)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return self.export(request.accepted_renderer)
+        return super().list(request, *args, **kwargs)
+
+    def export(self, renderer):
+        """Stream every post as NDJSON in constant memory"""
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+
+        def rows():
+            for blog in queryset.iterator(chunk_size=settings.BLOGS_EXPORT_CHUNK_SIZE):
+                yield renderer.render_line(serializer.to_representation(blog))
+
+        return StreamingHttpResponse(rows(), content_type=renderer.media_type)
 
 
+@method_decorator(conditional_view(detail_validators, vary_accept=True), name='dispatch')
 class BlogRetrieveAPI(RetrieveAPIView):
     queryset = Blog.objects.all()
     serializer_class = BlogRetrieveSerializer
     lookup_field = 'slug'
+
+    def get_serializer_class(self):
+        if settings.BLOGS_FAST_SERIALIZERS:
+            return FastBlogRetrieveSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if settings.BLOGS_FAST_SERIALIZERS:
+            queryset = queryset.values(*FastBlogRetrieveSerializer.get_field_names())
+        return queryset
+
+
+class BlogBatchAPI(GenericAPIView):
+    """Many posts by ?slugs=a,b or ?ids=1,2 in one request, in that order
+
+    Each post is served from the render cache while it matches the post's
+    updated_datetime. So one light query finds the posts and their
+    versions, and only the posts missing from the cache are loaded and
+    serialized, with a second query.
+    """
+    queryset = Blog.objects.all()
+    serializer_class = BlogRetrieveSerializer
+    lookups = (('slugs', 'slug'), ('ids', 'pk'))
+
+    def get_serializer_class(self):
+        if settings.BLOGS_FAST_SERIALIZERS:
+            return FastBlogRetrieveSerializer
+        return super().get_serializer_class()
+
+    def get_lookup(self):
+        """Return the field looked up and the distinct keys, in request order"""
+        given = [(param, field) for param, field in self.lookups if self.request.query_params.get(param)]
+        if len(given) != 1:
+            raise ValidationError({'detail': 'Pass either slugs or ids.'})
+        param, field = given[0]
+        keys = list(dict.fromkeys(
+            key.strip() for key in self.request.query_params[param].split(',') if key.strip()
+        ))
+        if len(keys) > settings.BLOGS_BATCH_MAX_SIZE:
+            raise ValidationError({param: 'At most %d values.' % settings.BLOGS_BATCH_MAX_SIZE})
+        if field == 'pk':
+            try:
+                keys = list(dict.fromkeys(int(key) for key in keys))
+            except ValueError:
+                raise ValidationError({param: 'IDs must be integers.'})
+        return field, keys
+
+    def get(self, request, *args, **kwargs):
+        field, keys = self.get_lookup()
+        blogs = {
+            getattr(blog, field): blog
+            for blog in self.get_queryset().filter(**{field + '__in': keys}).only('slug', 'updated_datetime')
+        }
+        items = render_cache.get_many(blogs.values(), 'api')
+        uncached = [blog for blog in blogs.values() if blog.slug not in items]
+        if uncached:
+            queryset = self.get_queryset().filter(pk__in=[blog.pk for blog in uncached])
+            if settings.BLOGS_FAST_SERIALIZERS:
+                queryset = queryset.values(*FastBlogRetrieveSerializer.get_field_names())
+            fresh = {item['slug']: item for item in self.get_serializer(queryset, many=True).data}
+            render_cache.set_many([(blog, fresh[blog.slug]) for blog in uncached if blog.slug in fresh], 'api')
+            items.update(fresh)
+        results, missing = [], []
+        for key in keys:
+            blog = blogs.get(key)
+            # A post deleted between the two queries is reported missing too.
+            if blog is not None and blog.slug in items:
+                results.append(items[blog.slug])
+            else:
+                missing.append(key)
+        return Response({'results': results, 'missing': missing})
+
+
+@conditional_view(list_validators)
+@cached_content
+def rss_feed(request):
+    return LatestBlogsFeed()(request)
+
+
+@conditional_view(list_validators)
+@cached_content
+def atom_feed(request):
+    return LatestBlogsAtomFeed()(request)
+
+
+@conditional_view(sitemap_index_validators)
+@cached_content
+def sitemap_index(request):
+    return sitemap_views.index(request, sitemaps, sitemap_url_name='blogs:sitemap')
+
+
+@conditional_view(sitemap_validators)
+@cached_content
+def sitemap(request, section):
+    return sitemap_views.sitemap(request, sitemaps, section)
+
+
+def metrics(request):
+    """Request histograms of this worker in the Prometheus text format"""
+    if not settings.BLOGS_INSTRUMENTATION:
+        raise Http404
+    return HttpResponse(
+        instrumentation.registry.render() + pool.render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,24 @@
+"""
+ASGI config for config project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g.
+
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
+
+Django 2.2 has no ASGI handler of its own; see blogs.asgi.ASGIHandler.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+django.setup(set_prefix=False)
+
+from blogs.asgi import ASGIHandler  # noqa: E402
+from blogs.template_loaders import warm_up  # noqa: E402
+
+application = ASGIHandler()
+warm_up()
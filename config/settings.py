@@ -43,13 +43,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.sitemaps',
 
     'bootstrap4',
     'rest_framework',
 ]
 
 MIDDLEWARE = [
+    'blogs.middleware.InstrumentationMiddleware',
+    'blogs.middleware.RepeatedQueryMiddleware',
+    'blogs.middleware.EdgeCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blogs.middleware.ReplicaPinningMiddleware',
+    'blogs.middleware.AnonymousPageCacheMiddleware',
+    'blogs.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,9 +100,52 @@ DATABASES = {
         'PASSWORD': env.get_value('DATABASE_PASSWORD', default='root'),
         'HOST': env.get_value('DATABASE_HOST', default='localhost'),
         'PORT': env.get_value('DATABASE_PORT', default='5432'),
+        'CONN_MAX_AGE': env.int('DATABASE_CONN_MAX_AGE', default=0),
+        # Read by the pooled engines, blogs.db.backends.postgresql and .sqlite3
+        'POOL': {
+            'MAX_SIZE': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+            'IDLE_TIMEOUT': env.int('DATABASE_POOL_IDLE_TIMEOUT', default=300),
+            'TIMEOUT': env.int('DATABASE_POOL_TIMEOUT', default=10),
+        },
     }
 }
 
+# Persistent connections (DATABASE_CONN_MAX_AGE seconds, None for unlimited)
+# are pinged when a request starts and reopened if the server dropped them.
+# With a pooled engine, leave CONN_MAX_AGE at 0: each request borrows a
+# connection from the pool and gives it back when it finishes.
+BLOGS_DB_HEALTH_CHECKS = env.bool('BLOGS_DB_HEALTH_CHECKS', default=True)
+
+# Read replicas, e.g. DATABASE_REPLICAS=replica1,replica2. Each one is set up
+# like default by DATABASE_<NAME>_ENGINE, _DB, _USER, _PASSWORD, _HOST and
+# _PORT, which default to the primary's values, and gets a share of the reads
+# from DATABASE_<NAME>_WEIGHT. Locally, SQLite files refreshed by
+# `manage.py sync_replicas` can stand in for replicas.
+
+BLOGS_DATABASE_REPLICAS = {}
+for alias in env.list('DATABASE_REPLICAS', default=[]):
+    prefix = 'DATABASE_%s_' % alias.upper()
+    DATABASES[alias] = dict(DATABASES['default'], **{
+        key: env.get_value(prefix + name, default=DATABASES['default'][key])
+        for key, name in (
+            ('ENGINE', 'ENGINE'), ('NAME', 'DB'), ('USER', 'USER'),
+            ('PASSWORD', 'PASSWORD'), ('HOST', 'HOST'), ('PORT', 'PORT'),
+        )
+    })
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    BLOGS_DATABASE_REPLICAS[alias] = env.int(prefix + 'WEIGHT', default=1)
+
+DATABASE_ROUTERS = ['blogs.routers.ReplicaRouter']
+
+# Models read from the replicas
+BLOGS_REPLICA_MODELS = ['blogs.Blog', 'blogs.BlogSearchDocument']
+# Seconds between health checks of a replica, and the replication lag past
+# which it is skipped (PostgreSQL reports it; SQLite files never lag)
+BLOGS_REPLICA_CHECK_INTERVAL = env.int('BLOGS_REPLICA_CHECK_INTERVAL', default=10)
+BLOGS_REPLICA_MAX_LAG = env.int('BLOGS_REPLICA_MAX_LAG', default=5)
+# Seconds a client keeps reading from the primary after writing a post
+BLOGS_REPLICA_PIN_SECONDS = env.int('BLOGS_REPLICA_PIN_SECONDS', default=10)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -140,3 +190,186 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 # MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 AUTH_USER_MODEL = 'blogs.Author'
+
+
+# Blog search
+# 'auto' uses the full-text index of the database engine (sqlite or postgresql);
+# 'icontains' falls back to a sequential LIKE scan.
+
+BLOGS_SEARCH_BACKEND = env.get_value('BLOGS_SEARCH_BACKEND', default='auto')
+# Order search results by relevance; numbered pages only (BLOGS_PAGINATION)
+BLOGS_SEARCH_RANKED = env.bool('BLOGS_SEARCH_RANKED', default=False)
+
+# Seconds the IDs matching a keyword are kept in the 'blogs' cache, so that
+# later pages of a search are fetched by primary key; 0 disables it.
+BLOGS_SEARCH_CACHE_TIMEOUT = env.int('BLOGS_SEARCH_CACHE_TIMEOUT', default=0)
+
+
+# Blog pagination
+# 'page' shows numbered pages; 'cursor' pages by (created_datetime, id) without
+# counting rows, which keeps deep pages of large archives fast.
+
+BLOGS_PAGINATION = env.get_value('BLOGS_PAGINATION', default='page')
+
+# On PostgreSQL, numbered pages of the unfiltered list count the posts from
+# the table statistics instead of COUNT(*) once there are more than this
+# many; the number of the last page is then approximate. 0 always counts.
+BLOGS_ESTIMATED_COUNT_THRESHOLD = env.int('BLOGS_ESTIMATED_COUNT_THRESHOLD', default=0)
+
+
+# Feeds and sitemaps
+# Posts in the RSS and Atom feeds, and primary keys per sitemap file listed
+# by the sitemap index. A post only ever changes the file of its key range.
+
+BLOGS_FEED_SIZE = env.int('BLOGS_FEED_SIZE', default=20)
+BLOGS_SITEMAP_LIMIT = env.int('BLOGS_SITEMAP_LIMIT', default=5000)
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'blogs.pagination.BlogPageNumberPagination',
+    'PAGE_SIZE': env.int('API_PAGE_SIZE', default=20),
+}
+
+# Rows fetched per server-side cursor round trip by the NDJSON export
+BLOGS_EXPORT_CHUNK_SIZE = env.int('BLOGS_EXPORT_CHUNK_SIZE', default=2000)
+
+# Posts one request to the batch endpoint (/api/batch/posts/) may ask for
+BLOGS_BATCH_MAX_SIZE = env.int('BLOGS_BATCH_MAX_SIZE', default=50)
+
+# Serialize the posts API from .values() rows instead of model instances
+BLOGS_FAST_SERIALIZERS = env.bool('BLOGS_FAST_SERIALIZERS', default=False)
+
+# Where `manage.py build_static` writes the pre-rendered pages for nginx.
+# Saving or deleting a post removes its pages and the list pages from there,
+# so Django serves them until the next build (see BLOGS_STATIC_BUILD_DELAY).
+BLOGS_STATIC_BUILD_ROOT = env.get_value('BLOGS_STATIC_BUILD_ROOT', default=os.path.join(BASE_DIR, 'build'))
+
+# Background tasks (blogs.tasks), run by `manage.py run_tasks`
+# With the queue on, saving a post queues its search indexing and rendering
+# instead of doing them in the admin request, and, if
+# BLOGS_STATIC_BUILD_DELAY is set, one build_static that many seconds after
+# the first of a burst of edits. Failed tasks are retried after
+# BLOGS_TASK_RETRY_DELAY seconds, doubling each time; a task still running
+# after BLOGS_TASK_LOCK_TIMEOUT seconds is taken over by another worker.
+BLOGS_TASK_QUEUE = env.bool('BLOGS_TASK_QUEUE', default=False)
+BLOGS_STATIC_BUILD_DELAY = env.int('BLOGS_STATIC_BUILD_DELAY', default=0)
+BLOGS_TASK_MAX_ATTEMPTS = env.int('BLOGS_TASK_MAX_ATTEMPTS', default=5)
+BLOGS_TASK_RETRY_DELAY = env.int('BLOGS_TASK_RETRY_DELAY', default=10)
+BLOGS_TASK_LOCK_TIMEOUT = env.int('BLOGS_TASK_LOCK_TIMEOUT', default=600)
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# The 'blogs' cache holds rendered posts, and the generation that deletes
+# change to refresh the ETags of lists. Set BLOGS_CACHE_URL to e.g.
+# filecache:///var/tmp/blogs, or to redis://host:6379/1 together with
+# BLOGS_CACHE_BACKEND=blogs.cache_backends.RedisCache; with more than one
+# process serving or editing posts, it must be shared by all of them.
+
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+    'blogs': env.cache_url(
+        'BLOGS_CACHE_URL',
+        default='locmemcache://blogs?max_entries=1000&timeout=86400',
+        backend=env.get_value('BLOGS_CACHE_BACKEND', default=None),
+    ),
+}
+
+# Also cache the whole detail page, not only the rendered text
+BLOGS_RENDER_CACHE_PAGES = env.bool('BLOGS_RENDER_CACHE_PAGES', default=False)
+
+
+# HTTP caching
+# Seconds browsers and nginx may reuse a page before revalidating it with
+# If-None-Match / If-Modified-Since. Change BLOGS_ETAG_SALT on deploys that
+# alter templates or serializers so that clients drop their copies.
+
+BLOGS_CACHE_MAX_AGE = env.int('BLOGS_CACHE_MAX_AGE', default=60)
+BLOGS_ETAG_SALT = env.get_value('BLOGS_ETAG_SALT', default='')
+
+# Edge cache (nginx proxy_cache, see nginx/nginx.conf)
+# BLOGS_EDGE_PURGER invalidates the edge's pages when posts change, e.g.
+# 'blogs.edge.NginxCachePurger', which deletes the cache files nginx shares
+# in BLOGS_EDGE_CACHE_DIR. Unset, responses carry no surrogate keys and the
+# edge keeps pages for BLOGS_CACHE_MAX_AGE only. BLOGS_EDGE_ORIGINS are the
+# scheme://host the site is served under.
+BLOGS_EDGE_PURGER = env.get_value('BLOGS_EDGE_PURGER', default='')
+BLOGS_EDGE_CACHE_DIR = env.get_value('BLOGS_EDGE_CACHE_DIR', default=os.path.join(BASE_DIR, 'edge-cache'))
+BLOGS_EDGE_CACHE_LEVELS = '1:2'
+BLOGS_EDGE_ORIGINS = env.list('BLOGS_EDGE_ORIGINS', default=['http://localhost'])
+# Pages at the head of each list purged on every change. Deeper pages are
+# purged around the changed post only; the shift a new or deleted post causes
+# elsewhere lasts until their BLOGS_EDGE_MAX_AGE runs out.
+BLOGS_EDGE_PURGE_PAGES = env.int('BLOGS_EDGE_PURGE_PAGES', default=3)
+# Seconds the edge may keep the pages of each URL name until a purge
+BLOGS_EDGE_MAX_AGE = {
+    'blogs:index': 300,
+    'blogs:detail': 86400,
+    'blogs:api_index': 300,
+    'blogs:api_detail': 86400,
+    'blogs:rss_feed': 3600,
+    'blogs:atom_feed': 3600,
+    'blogs:sitemap_index': 3600,
+    'blogs:sitemap': 3600,
+}
+
+# Anonymous page cache (blogs.middleware.AnonymousPageCacheMiddleware)
+# 0 disables it. Pages are fresh for TIMEOUT seconds, then served stale for
+# up to STALE more while a single request rebuilds them; a change to a post
+# makes every page rebuild without serving it stale. Requests with query
+# parameters other than QUERY_PARAMS are not cached.
+BLOGS_PAGE_CACHE_TIMEOUT = env.int('BLOGS_PAGE_CACHE_TIMEOUT', default=0)
+BLOGS_PAGE_CACHE_STALE = env.int('BLOGS_PAGE_CACHE_STALE', default=60)
+BLOGS_PAGE_CACHE_LOCK_TIMEOUT = env.int('BLOGS_PAGE_CACHE_LOCK_TIMEOUT', default=5)
+BLOGS_PAGE_CACHE_URL_NAMES = ['blogs:index', 'blogs:detail']
+BLOGS_PAGE_CACHE_QUERY_PARAMS = ['keyword', 'page', 'cursor']
+
+# N+1 detection (blogs.middleware.RepeatedQueryMiddleware), for development
+# and tests: 'warn' logs, 'raise' fails, requests that run one query shape
+# BLOGS_QUERY_CHECK_THRESHOLD times or more.
+BLOGS_QUERY_CHECK = env.get_value('BLOGS_QUERY_CHECK', default='')
+BLOGS_QUERY_CHECK_THRESHOLD = env.int('BLOGS_QUERY_CHECK_THRESHOLD', default=3)
+
+# Per request SQL/render/serializer timings in Server-Timing headers and
+# Prometheus histograms at /api/metrics/ (each worker process reports its own)
+BLOGS_INSTRUMENTATION = env.bool('BLOGS_INSTRUMENTATION', default=False)
+
+# ASGI (config/asgi.py)
+# Threads running Django in each worker process, which also bounds its
+# database connections, and response chunks buffered per streaming request.
+BLOGS_ASGI_THREADS = env.int('BLOGS_ASGI_THREADS', default=8)
+BLOGS_ASGI_BUFFER = env.int('BLOGS_ASGI_BUFFER', default=16)
+
+
+# Response compression (blogs.middleware.CompressionMiddleware)
+# Brotli when the optional brotli package is installed and the client takes
+# it, gzip otherwise. Smaller responses are sent uncompressed.
+BLOGS_COMPRESS = env.bool('BLOGS_COMPRESS', default=False)
+BLOGS_COMPRESS_MIN_SIZE = env.int('BLOGS_COMPRESS_MIN_SIZE', default=1024)
+
+# Keep compiled templates in memory (Django's cached loader), and compile those
+# under BLOGS_WARM_TEMPLATE_PREFIXES when a worker starts instead of in its
+# first requests. Template edits then need a restart, so this follows DEBUG
+# by default. DEBUG above is read as a string, which kept Django from
+# choosing the cached loader by itself.
+BLOGS_CACHE_TEMPLATES = env.bool('BLOGS_CACHE_TEMPLATES', default=not env.bool('DEBUG', default=False))
+BLOGS_WARM_TEMPLATE_PREFIXES = ['blogs/']
+
+# Strip indentation and blank lines from templates when they are compiled
+# (blogs.template_loaders.MinifyingLoader). Minified templates are always
+# cached.
+BLOGS_MINIFY_TEMPLATES = env.bool('BLOGS_MINIFY_TEMPLATES', default=False)
+BLOGS_MINIFY_TEMPLATE_PREFIXES = ['blogs/']
+
+if BLOGS_CACHE_TEMPLATES or BLOGS_MINIFY_TEMPLATES:
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    if BLOGS_MINIFY_TEMPLATES:
+        loaders = [('blogs.template_loaders.MinifyingLoader', loaders)]
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', loaders)]
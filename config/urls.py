@@ -18,8 +18,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from blogs.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Not at metrics/, where it would shadow a post with the slug 'metrics'
+    path('api/metrics/', metrics, name='metrics'),
     path('', include('blogs.urls')),
 ]
 
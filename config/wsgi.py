@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Compile the cached templates before serving (with gunicorn --preload, once
+# for all workers).
+from blogs.template_loaders import warm_up  # noqa: E402
+
+warm_up()